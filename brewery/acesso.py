@@ -0,0 +1,72 @@
+"""
+Resolução e autorização da cervejaria de uma requisição
+
+As views com brewery_id na URL usam o decorator cervejaria_do_usuario: a
+cervejaria é carregada e autorizada (owner = usuário logado) em uma única
+consulta e fica em request.cervejaria.
+
+A autorização é sempre a consulta filtrada pelo dono; a lista de ids das
+cervejarias do usuário guardada na sessão nunca decide o acesso e só é
+ajustada depois dessa consulta (entra o id criado em outro dispositivo, sai
+o que deixou de ser do usuário). Quando a cervejaria não é do usuário, uma
+consulta de existência escolhe entre 404 e 403.
+"""
+import functools
+from django.http import Http404, HttpResponseForbidden
+
+from .models import Brewery
+
+
+_CHAVE_SESSAO = 'brewtab_cervejarias'
+
+
+def ids_cervejarias(request, recarregar=False):
+    """Ids das cervejarias do usuário logado, guardados na sessão"""
+    ids = request.session.get(_CHAVE_SESSAO)
+    if ids is None or recarregar:
+        ids = list(Brewery.objects.for_user(request.user).values_list('id', flat=True))
+        request.session[_CHAVE_SESSAO] = ids
+    return ids
+
+
+def esquecer_cervejarias(request):
+    """Descarta a lista da sessão (após criar ou excluir uma cervejaria)"""
+    request.session.pop(_CHAVE_SESSAO, None)
+
+
+def resolver_cervejaria(request, brewery_id):
+    """
+    Retorna a cervejaria se o usuário for o dono, None se for de outro
+    usuário; levanta Http404 se não existir.
+    """
+    brewery_id = int(brewery_id)
+    cervejaria = Brewery.objects.for_user(request.user).filter(id=brewery_id).first()
+    if cervejaria is not None:
+        if brewery_id not in ids_cervejarias(request):
+            # Criada em outro dispositivo depois que a lista foi guardada
+            ids_cervejarias(request, recarregar=True)
+        return cervejaria
+
+    if brewery_id in request.session.get(_CHAVE_SESSAO, ()):
+        # Excluída ou transferida desde que a lista foi guardada
+        esquecer_cervejarias(request)
+    if not Brewery.objects.filter(id=brewery_id).exists():
+        raise Http404('Cervejaria não encontrada.')
+    return None
+
+
+def cervejaria_do_usuario(view):
+    """
+    Decorator para views com brewery_id: resolve a cervejaria uma vez,
+    responde 403/404 e a disponibiliza em request.cervejaria. Deve vir
+    abaixo de login_required.
+    """
+    @functools.wraps(view)
+    def wrapper(request, brewery_id, *args, **kwargs):
+        cervejaria = resolver_cervejaria(request, brewery_id)
+        if cervejaria is None:
+            return HttpResponseForbidden('Você não tem permissão para acessar esta cervejaria.')
+        request.cervejaria = cervejaria
+        return view(request, brewery_id, *args, **kwargs)
+
+    return wrapper
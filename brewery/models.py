@@ -2,12 +2,20 @@ from django.db import models
 from django.contrib.auth.models import User
 
 
+class BreweryQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """Breweries owned by the user"""
+        return self.filter(owner=user)
+
+
 class Brewery(models.Model):
     name = models.CharField(max_length=255, unique=True)
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='breweries')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = BreweryQuerySet.as_manager()
+
     class Meta:
         verbose_name_plural = 'Breweries'
         ordering = ['-created_at']
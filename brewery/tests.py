@@ -1,3 +1,49 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from .acesso import _CHAVE_SESSAO
+from .models import Brewery
+
+
+class ResolucaoCervejariaTest(TestCase):
+    """A consulta filtrada pelo dono decide o acesso; a lista da sessão só a acompanha"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dono = User.objects.create_user('dono', password='senha-teste-123')
+        cls.outro = User.objects.create_user('outro', password='senha-teste-123')
+        cls.cervejaria = Brewery.objects.create(name='Cervejaria do Dono', owner=cls.dono)
+
+    def _url(self, brewery_id):
+        return reverse('process:list', kwargs={'brewery_id': brewery_id})
+
+    def _guardar_lista(self, ids):
+        sessao = self.client.session
+        sessao[_CHAVE_SESSAO] = ids
+        sessao.save()
+
+    def test_dono_com_lista_da_sessao_desatualizada(self):
+        self.client.force_login(self.dono)
+        # Lista guardada antes de a cervejaria ser criada (outro dispositivo)
+        self._guardar_lista([])
+
+        self.assertEqual(self.client.get(self._url(self.cervejaria.id)).status_code, 200)
+        self.assertEqual(self.client.session[_CHAVE_SESSAO], [self.cervejaria.id])
+
+        # Pedidos seguintes não voltam a recarregar a lista
+        self._guardar_lista([self.cervejaria.id, 999])
+        self.assertEqual(self.client.get(self._url(self.cervejaria.id)).status_code, 200)
+        self.assertEqual(self.client.session[_CHAVE_SESSAO], [self.cervejaria.id, 999])
+
+    def test_outro_usuario_recebe_403_mesmo_com_o_id_na_sessao(self):
+        self.client.force_login(self.outro)
+        self._guardar_lista([self.cervejaria.id])
+
+        self.assertEqual(self.client.get(self._url(self.cervejaria.id)).status_code, 403)
+        self.assertNotIn(_CHAVE_SESSAO, self.client.session)
+
+    def test_id_inexistente_recebe_404(self):
+        self.client.force_login(self.dono)
+        ultimo = Brewery.objects.order_by('-id').values_list('id', flat=True).first()
+        self.assertEqual(self.client.get(self._url(ultimo + 1)).status_code, 404)
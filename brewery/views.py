@@ -2,14 +2,15 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponseForbidden
 from django.contrib import messages
+from .acesso import esquecer_cervejarias
 from .models import Brewery
-from processes.models import PontoCriticoHACCP
+from processes.resumo_cervejarias import anotar_resumo
 
 
 @login_required(login_url='login')
 def brewery_list(request):
-    """List all breweries owned by the current user."""
-    breweries = Brewery.objects.filter(owner=request.user)
+    """List all breweries owned by the current user, with their operational summary."""
+    breweries = anotar_resumo(Brewery.objects.for_user(request.user))
     return render(request, 'brewery/brewery_list.html', {'breweries': breweries})
 
 
@@ -28,6 +29,7 @@ def brewery_create(request):
             return render(request, 'brewery/brewery_form.html')
         
         brewery = Brewery.objects.create(name=name, owner=request.user)
+        esquecer_cervejarias(request)
         messages.success(request, f'Brewery "{brewery.name}" created successfully.')
         return redirect('brewery:detail', brewery_id=brewery.id)
     
@@ -37,17 +39,15 @@ def brewery_create(request):
 @login_required(login_url='login')
 def brewery_detail(request, brewery_id):
     """View brewery details."""
-    brewery = get_object_or_404(Brewery, id=brewery_id)
+    # resumo (NCs ativas, execuções em andamento, pontos HACCP) na mesma consulta da cervejaria
+    brewery = get_object_or_404(anotar_resumo(Brewery.objects.select_related('owner')), id=brewery_id)
     
-    if brewery.owner != request.user:
+    if brewery.owner_id != request.user.id:
         return HttpResponseForbidden('You do not have permission to view this brewery.')
-    
-    # contar pontos críticos HACCP desta cervejaria para continuidade da etapa
-    total_pontos = PontoCriticoHACCP.objects.filter(processo__cervejaria=brewery).count()
 
     return render(request, 'brewery/brewery_detail.html', {
         'brewery': brewery,
-        'total_pontos': total_pontos
+        'total_pontos': brewery.total_pontos
     })
 
 
@@ -56,7 +56,7 @@ def brewery_edit(request, brewery_id):
     """Edit brewery details."""
     brewery = get_object_or_404(Brewery, id=brewery_id)
     
-    if brewery.owner != request.user:
+    if brewery.owner_id != request.user.id:
         return HttpResponseForbidden('You do not have permission to edit this brewery.')
     
     if request.method == 'POST':
@@ -83,12 +83,13 @@ def brewery_delete(request, brewery_id):
     """Delete a brewery."""
     brewery = get_object_or_404(Brewery, id=brewery_id)
     
-    if brewery.owner != request.user:
+    if brewery.owner_id != request.user.id:
         return HttpResponseForbidden('You do not have permission to delete this brewery.')
     
     if request.method == 'POST':
         brewery_name = brewery.name
         brewery.delete()
+        esquecer_cervejarias(request)
         messages.success(request, f'Brewery "{brewery_name}" deleted successfully.')
         return redirect('brewery:list')
     
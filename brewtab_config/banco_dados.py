@@ -0,0 +1,93 @@
+"""
+Ajustes do SQLite para produção (vários workers do gunicorn no mesmo arquivo)
+
+O backend brewtab_config.sqlite aplica os PRAGMAs do perfil escolhido a cada
+nova conexão e abre as transações no modo do perfil. Com CONN_MAX_AGE as
+conexões são reutilizadas entre requisições, então o custo dos PRAGMAs é
+pago uma vez por conexão.
+
+Perfis (variável SQLITE_PERFIL):
+- 'padrao' (padrão): comportamento padrão do SQLite/Django (rollback
+  journal, BEGIN adiado), usado em desenvolvimento e nos testes
+- 'producao': WAL, synchronous=NORMAL, busy_timeout, cache e mmap maiores e
+  transações BEGIN IMMEDIATE; deve ser ativado explicitamente no deploy
+
+Cada PRAGMA pode ser sobrescrito individualmente, ex.: SQLITE_SYNCHRONOUS=FULL,
+SQLITE_BUSY_TIMEOUT=10000 (um valor vazio remove o PRAGMA do perfil), assim
+como o modo de transação com SQLITE_TRANSACTION_MODE.
+"""
+import os
+import re
+
+
+PERFIS = {
+    'padrao': {},
+    'producao': {
+        # Leitores não bloqueiam o escritor (e vice-versa)
+        'journal_mode': 'WAL',
+        # Seguro com WAL: só perde a última transação em queda de energia
+        'synchronous': 'NORMAL',
+        # Espera (ms) pelo lock de escrita antes de "database is locked"
+        'busy_timeout': '5000',
+        # Valor negativo = KiB (aqui ~20 MB de cache de páginas por conexão)
+        'cache_size': '-20000',
+        # Leitura do arquivo via mmap (128 MB)
+        'mmap_size': '134217728',
+        'temp_store': 'MEMORY',
+    },
+}
+
+# Com BEGIN adiado, uma transação que lê e depois escreve recebe SQLITE_BUSY
+# imediatamente (sem respeitar o busy_timeout) se outro worker escreveu no
+# meio tempo. IMMEDIATE reserva a escrita no início e espera pelo lock.
+MODOS_TRANSACAO = {
+    'padrao': 'DEFERRED',
+    'producao': 'IMMEDIATE',
+}
+
+# Ordem de aplicação; journal_mode precisa vir antes de synchronous
+PRAGMAS_SUPORTADOS = ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size', 'temp_store')
+
+_VALOR_VALIDO = re.compile(r'^-?\w+$')
+
+
+def _perfil(ambiente):
+    nome_perfil = ambiente.get('SQLITE_PERFIL', 'padrao').lower()
+    if nome_perfil not in PERFIS:
+        raise ValueError(f"SQLITE_PERFIL inválido: '{nome_perfil}' (opções: {', '.join(PERFIS)})")
+    return nome_perfil
+
+
+def modo_transacao_do_ambiente(ambiente=None):
+    """Modo do BEGIN (DEFERRED, IMMEDIATE ou EXCLUSIVE) a partir do perfil ou de SQLITE_TRANSACTION_MODE"""
+    ambiente = os.environ if ambiente is None else ambiente
+    modo = ambiente.get('SQLITE_TRANSACTION_MODE') or MODOS_TRANSACAO[_perfil(ambiente)]
+    modo = modo.upper()
+    if modo not in ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE'):
+        raise ValueError(f"SQLITE_TRANSACTION_MODE inválido: '{modo}'")
+    return modo
+
+
+def pragmas_do_ambiente(ambiente=None):
+    """Monta o dicionário de PRAGMAs a partir de SQLITE_PERFIL e das variáveis SQLITE_<PRAGMA>"""
+    ambiente = os.environ if ambiente is None else ambiente
+    nome_perfil = _perfil(ambiente)
+
+    pragmas = dict(PERFIS[nome_perfil])
+    for nome in PRAGMAS_SUPORTADOS:
+        valor = ambiente.get(f'SQLITE_{nome.upper()}')
+        if valor is None:
+            continue
+        if valor == '':
+            pragmas.pop(nome, None)
+        elif _VALOR_VALIDO.match(valor):
+            pragmas[nome] = valor
+        else:
+            raise ValueError(f"Valor inválido para SQLITE_{nome.upper()}: '{valor}'")
+    return {nome: pragmas[nome] for nome in PRAGMAS_SUPORTADOS if nome in pragmas}
+
+
+def executar_pragmas(conexao, pragmas):
+    """Aplica os PRAGMAs em uma conexão sqlite3 (ou cursor)"""
+    for nome, valor in pragmas.items():
+        conexao.execute(f'PRAGMA {nome} = {valor}')
@@ -11,11 +11,18 @@ def dados_temporarios_context(request):
     }
     
     if context['dados_temporarios_ativo'] and request.user.is_authenticated:
+        from processes.atividade_sessao import obter_sessao
         from processes.dados_temporarios import GestorDadosTemporarios
         
-        context['tempo_sessao_restante'] = GestorDadosTemporarios.obter_tempo_sessao_restante(request.user)
-        context['sessao_expirando'] = GestorDadosTemporarios.sessao_vai_expirar_em_breve(request.user)
-        context['tamanho_database'] = GestorDadosTemporarios.obter_tamanho_database()
-        context['database_proxima_limite'] = GestorDadosTemporarios.database_proxima_limite()
+        # Reutiliza a sessão já carregada pelo middleware nesta requisição
+        sessao = obter_sessao(request)
+        tempo_restante = GestorDadosTemporarios.tempo_restante(sessao)
+        tamanho_database = GestorDadosTemporarios.obter_tamanho_database()
+        tamanho_max_mb = getattr(settings, 'DADOS_TEMPORARIOS_MAX_DB_SIZE_MB', 50)
+        
+        context['tempo_sessao_restante'] = tempo_restante
+        context['sessao_expirando'] = tempo_restante <= 5
+        context['tamanho_database'] = tamanho_database
+        context['database_proxima_limite'] = tamanho_database >= tamanho_max_mb * 0.80
     
     return context
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 import os
 from pathlib import Path
 
+from brewtab_config.banco_dados import modo_transacao_do_ambiente, pragmas_do_ambiente
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -84,11 +86,52 @@ WSGI_APPLICATION = 'brewtab_config.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # Backend sqlite3 do Django + PRAGMAs e modo de transação abaixo
+        'ENGINE': 'brewtab_config.sqlite',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Conexões persistentes (segundos); 0 fecha a conexão a cada requisição
+        'CONN_MAX_AGE': int(os.environ.get('DJANGO_DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# PRAGMAs aplicados a cada nova conexão SQLite (ver brewtab_config/banco_dados.py).
+# SQLITE_PERFIL=padrao (padrão) ou producao (WAL, synchronous=NORMAL, busy_timeout, BEGIN IMMEDIATE),
+# que o deploy deve definir explicitamente
+SQLITE_PRAGMAS = pragmas_do_ambiente()
+SQLITE_TRANSACTION_MODE = modo_transacao_do_ambiente()
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Padrão em memória local (por processo). Com vários workers do gunicorn,
+# configure um backend compartilhado (ex.: FileBasedCache ou Redis) via ambiente.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', 'brewtab'),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('DJANGO_CACHE_MAX_ENTRIES', '1000')),
+            'CULL_FREQUENCY': 3,
+        },
+    }
+}
+
+# Tempo (segundos) que um gráfico Plotly fica em cache; 0 desativa o cache de gráficos
+GRAFICOS_CACHE_TIMEOUT = int(os.environ.get('GRAFICOS_CACHE_TIMEOUT', '300'))
+
+# Tempo (segundos) que o catálogo de pontos críticos de uma cervejaria fica em cache
+# (páginas HACCP e limites na ingestão de leituras)
+HACCP_CATALOGO_CACHE_TTL = int(os.environ.get('HACCP_CATALOGO_CACHE_TTL', '30'))
+
+# NCs automáticas para leituras HACCP fora do limite: a fila é processada em uma
+# thread por worker, agrupando os desvios recebidos durante a janela (segundos).
+# False processa logo após o commit, na própria requisição
+HACCP_DESVIOS_EM_SEGUNDO_PLANO = os.environ.get('HACCP_DESVIOS_EM_SEGUNDO_PLANO', 'True').lower() == 'true'
+HACCP_DESVIOS_JANELA = float(os.environ.get('HACCP_DESVIOS_JANELA', '2'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -152,3 +195,17 @@ DADOS_TEMPORARIOS_TIMEOUT = int(os.environ.get('DADOS_TEMPORARIOS_TIMEOUT', '30'
 
 # Tamanho máximo do banco de dados em MB antes de limpeza forçada
 DADOS_TEMPORARIOS_MAX_DB_SIZE_MB = int(os.environ.get('DADOS_TEMPORARIOS_MAX_DB_SIZE_MB', '50'))
+
+# Intervalo mínimo em segundos entre gravações da última atividade de um usuário
+# (as atividades ficam em memória e são gravadas em lote)
+DADOS_TEMPORARIOS_INTERVALO_ATIVIDADE = int(os.environ.get('DADOS_TEMPORARIOS_INTERVALO_ATIVIDADE', '60'))
+
+# Intervalo em segundos entre limpezas de sessões expiradas (feitas em segundo plano)
+DADOS_TEMPORARIOS_INTERVALO_LIMPEZA = int(os.environ.get('DADOS_TEMPORARIOS_INTERVALO_LIMPEZA', '60'))
+
+# Executar a limpeza em uma thread dentro de cada worker. Desative (False) ao usar
+# `python manage.py limpar_dados_temporarios --daemon` como processo separado
+DADOS_TEMPORARIOS_LIMPEZA_EM_PROCESSO = os.environ.get('DADOS_TEMPORARIOS_LIMPEZA_EM_PROCESSO', 'True').lower() == 'true'
+
+# Arquivo de trava compartilhado entre workers (padrão: diretório temporário do sistema)
+DADOS_TEMPORARIOS_LOCK_FILE = os.environ.get('DADOS_TEMPORARIOS_LOCK_FILE', '')
@@ -0,0 +1,21 @@
+"""
+Backend SQLite do BrewTab: o backend padrão do Django com os PRAGMAs e o
+modo de transação de settings.SQLITE_PRAGMAS / SQLITE_TRANSACTION_MODE
+(ver brewtab_config/banco_dados.py)
+"""
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+from brewtab_config.banco_dados import executar_pragmas
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        conexao = super().get_new_connection(conn_params)
+        executar_pragmas(conexao, getattr(settings, 'SQLITE_PRAGMAS', {}))
+        return conexao
+
+    def _start_transaction_under_autocommit(self):
+        modo = getattr(settings, 'SQLITE_TRANSACTION_MODE', 'DEFERRED')
+        self.cursor().execute(f'BEGIN {modo}')
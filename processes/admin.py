@@ -2,7 +2,7 @@ from django.contrib import admin
 from .models import (
     Processo, EtapaProcesso, ExecutacaoProcesso, ExecucaoEtapa, 
     HistoricoExecucao, PontoCriticoHACCP, RegistroHACCP, NaoConformidade, 
-    AcaoCorretiva, KPIExercicio, SessaoTemporaria
+    AcaoCorretiva, KPIExercicio, KPIDiario, SessaoTemporaria
 )
 
 
@@ -58,10 +58,13 @@ class ExecucaoEtapaInline(admin.TabularInline):
 
 @admin.register(ExecutacaoProcesso)
 class ExecutacaoProcessoAdmin(admin.ModelAdmin):
-    list_display = ('processo', 'usuario', 'get_status', 'data_inicio', 'data_conclusao')
-    list_filter = ('status', 'processo__cervejaria', 'data_inicio')
+    list_display = ('processo', 'usuario', 'get_status', 'etapas_concluidas', 'total_etapas', 'data_inicio', 'ultima_atividade')
+    list_filter = ('status', 'cervejaria', 'data_inicio')
     search_fields = ('processo__nome', 'usuario__username')
-    readonly_fields = ('data_inicio', 'data_conclusao')
+    readonly_fields = (
+        'data_inicio', 'data_conclusao', 'total_etapas', 'etapas_concluidas',
+        'leituras_conformes', 'leituras_nao_conformes', 'ultima_atividade',
+    )
     inlines = [ExecucaoEtapaInline]
     
     def get_status(self, obj):
@@ -72,7 +75,7 @@ class ExecutacaoProcessoAdmin(admin.ModelAdmin):
 @admin.register(ExecucaoEtapa)
 class ExecucaoEtapaAdmin(admin.ModelAdmin):
     list_display = ('execucao', 'etapa', 'concluida', 'data_conclusao')
-    list_filter = ('concluida', 'execucao__processo__cervejaria')
+    list_filter = ('concluida', 'execucao__cervejaria')
     search_fields = ('etapa__nome', 'execucao__processo__nome')
     readonly_fields = ('data_conclusao',)
 
@@ -82,7 +85,7 @@ class ExecucaoEtapaAdmin(admin.ModelAdmin):
 @admin.register(HistoricoExecucao)
 class HistoricoExecucaoAdmin(admin.ModelAdmin):
     list_display = ('execucao', 'usuario', 'acao', 'data_hora')
-    list_filter = ('data_hora', 'execucao__processo__cervejaria')
+    list_filter = ('data_hora', 'execucao__cervejaria')
     search_fields = ('acao', 'usuario__username')
     readonly_fields = ('data_hora',)
     ordering = ('-data_hora',)
@@ -115,7 +118,7 @@ class PontoCriticoHACCPAdmin(admin.ModelAdmin):
 @admin.register(RegistroHACCP)
 class RegistroHACCPAdmin(admin.ModelAdmin):
     list_display = ('ponto_critico', 'valor_medido', 'conforme', 'usuario', 'data_hora')
-    list_filter = ('conforme', 'ponto_critico__processo__cervejaria', 'data_hora')
+    list_filter = ('conforme', 'cervejaria', 'data_hora')
     search_fields = ('ponto_critico__nome', 'usuario__username')
     readonly_fields = ('data_hora',)
     ordering = ('-data_hora',)
@@ -140,6 +143,9 @@ class NaoConformidadeAdmin(admin.ModelAdmin):
         ('Rastreamento', {
             'fields': ('usuario_criacao', 'data_criacao', 'data_fechamento')
         }),
+        ('Desvio HACCP', {
+            'fields': ('ponto_critico', 'leituras_fora_limite', 'ultimo_desvio')
+        }),
     )
 
 
@@ -211,6 +217,16 @@ class KPIExercicioAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(KPIDiario)
+class KPIDiarioAdmin(admin.ModelAdmin):
+    list_display = ('cervejaria', 'data', 'execucoes', 'haccp_nao_conformes', 'ncs_total', 'capas_total')
+    list_filter = ('cervejaria', 'data')
+    search_fields = ('cervejaria__name',)
+    readonly_fields = ('atualizado_em',)
+    date_hierarchy = 'data'
+    ordering = ('-data',)
+
+
 # ===== DADOS TEMPORÁRIOS =====
 
 @admin.register(SessaoTemporaria)
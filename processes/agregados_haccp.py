@@ -0,0 +1,212 @@
+"""
+Séries das leituras HACCP em resoluções reduzidas (minuto, hora, dia) e
+redução de pontos para gráficos de linha (LTTB)
+
+A cada gravação de leituras os agregados (quantidade, soma, mínimo, máximo
+e não conformes) dos intervalos atingidos são atualizados com um UPSERT
+(INSERT ... ON CONFLICT DO UPDATE) na mesma transação. Exclusões de
+leituras não são descontadas: use o comando reconstruir_agregados_haccp.
+
+Para o gráfico, serie_ponto_critico() escolhe a resolução mais fina que
+cabe no limite de pontos do intervalo pedido (leituras brutas, minuto, hora
+ou dia) e reduz com LTTB o que ainda passar do alvo, então qualquer
+intervalo é desenhado com até ~2 mil pontos.
+"""
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+from django.db import connection
+
+from .models import AgregadoHACCP, RegistroHACCP
+
+
+# Duração de cada intervalo, em segundos (alinhado em UTC)
+RESOLUCOES = {
+    'minuto': 60,
+    'hora': 3600,
+    'dia': 86400,
+}
+
+# Formato do strftime do SQLite que gera o início do intervalo, na reconstrução
+_FORMATOS_SQLITE = {
+    'minuto': '%Y-%m-%d %H:%M:00',
+    'hora': '%Y-%m-%d %H:00:00',
+    'dia': '%Y-%m-%d 00:00:00',
+}
+
+# Pontos desenhados sem redução
+MAX_PONTOS = 2000
+
+# Alvo do LTTB quando for preciso reduzir
+ALVO_LTTB = 1500
+
+# Mais pontos que isso não são lidos para o LTTB: passa para a resolução seguinte
+MAX_PONTOS_LTTB = 100000
+
+_TABELA = AgregadoHACCP._meta.db_table
+
+
+def inicio_intervalo(momento, resolucao):
+    segundos = RESOLUCOES[resolucao]
+    instante = int(momento.timestamp()) // segundos * segundos
+    return datetime.fromtimestamp(instante, tz=dt_timezone.utc)
+
+
+def atualizar_agregados(registros):
+    """Soma os registros (RegistroHACCP recém-gravados) aos agregados"""
+    acumulados = defaultdict(lambda: [0, 0.0, float('inf'), float('-inf'), 0])
+    for registro in registros:
+        instante = int(registro.data_hora.timestamp())
+        for resolucao, segundos in RESOLUCOES.items():
+            chave = (registro.ponto_critico_id, registro.cervejaria_id, resolucao, instante // segundos * segundos)
+            acumulado = acumulados[chave]
+            acumulado[0] += 1
+            acumulado[1] += registro.valor_medido
+            acumulado[2] = min(acumulado[2], registro.valor_medido)
+            acumulado[3] = max(acumulado[3], registro.valor_medido)
+            acumulado[4] += 0 if registro.conforme else 1
+
+    if not acumulados:
+        return 0
+
+    adaptar = connection.ops.adapt_datetimefield_value
+    linhas = [
+        (ponto_id, cervejaria_id, resolucao,
+         adaptar(datetime.fromtimestamp(instante, tz=dt_timezone.utc)), *acumulado)
+        for (ponto_id, cervejaria_id, resolucao, instante), acumulado in acumulados.items()
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {_TABELA} '
+            '(ponto_critico_id, cervejaria_id, resolucao, inicio, quantidade, soma, minimo, maximo, nao_conformes) '
+            'VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) '
+            'ON CONFLICT (ponto_critico_id, resolucao, inicio) DO UPDATE SET '
+            'quantidade = quantidade + excluded.quantidade, '
+            'soma = soma + excluded.soma, '
+            'minimo = MIN(minimo, excluded.minimo), '
+            'maximo = MAX(maximo, excluded.maximo), '
+            'nao_conformes = nao_conformes + excluded.nao_conformes',
+            linhas
+        )
+    return len(linhas)
+
+
+def reconstruir_agregados(cervejaria_id=None, conexao=None):
+    """
+    Recalcula os agregados a partir das leituras (de uma cervejaria ou de
+    todas) com um INSERT ... SELECT GROUP BY por resolução. Retorna
+    {resolucao: intervalos}.
+    """
+    conexao = conexao or connection
+    tabela_registros = RegistroHACCP._meta.db_table
+    filtro, parametros = '', []
+    if cervejaria_id is not None:
+        filtro, parametros = 'WHERE cervejaria_id = %s', [cervejaria_id]
+
+    totais = {}
+    with conexao.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {_TABELA} {filtro}', parametros)
+        for resolucao, formato in _FORMATOS_SQLITE.items():
+            # %% no SQL: os % do strftime não são parâmetros
+            formato = formato.replace('%', '%%')
+            cursor.execute(
+                f'INSERT INTO {_TABELA} '
+                '(ponto_critico_id, cervejaria_id, resolucao, inicio, quantidade, soma, minimo, maximo, nao_conformes) '
+                f"SELECT ponto_critico_id, cervejaria_id, %s, strftime('{formato}', data_hora), "
+                'COUNT(*), SUM(valor_medido), MIN(valor_medido), MAX(valor_medido), SUM(NOT conforme) '
+                f'FROM {tabela_registros} {filtro} '
+                f"GROUP BY ponto_critico_id, cervejaria_id, strftime('{formato}', data_hora)",
+                [resolucao, *parametros]
+            )
+            totais[resolucao] = cursor.rowcount
+    return totais
+
+
+def lttb(x, y, limite):
+    """
+    Largest-Triangle-Three-Buckets: índices de até `limite` pontos de (x, y)
+    que preservam a forma da linha (picos incluídos). x deve ser crescente.
+    """
+    total = len(x)
+    if limite >= total or limite < 3:
+        return list(range(total))
+
+    selecionados = [0]
+    tamanho = (total - 2) / (limite - 2)
+    anterior = 0
+    for balde in range(limite - 2):
+        inicio = int(balde * tamanho) + 1
+        fim = int((balde + 1) * tamanho) + 1
+
+        # Média do balde seguinte (o último ponto, no fim)
+        proximo_inicio, proximo_fim = fim, min(int((balde + 2) * tamanho) + 1, total)
+        if proximo_inicio >= proximo_fim:
+            media_x, media_y = x[-1], y[-1]
+        else:
+            quantidade = proximo_fim - proximo_inicio
+            media_x = sum(x[proximo_inicio:proximo_fim]) / quantidade
+            media_y = sum(y[proximo_inicio:proximo_fim]) / quantidade
+
+        ax, ay = x[anterior], y[anterior]
+        maior_area, escolhido = -1.0, inicio
+        for indice in range(inicio, fim):
+            area = abs((ax - media_x) * (y[indice] - ay) - (ax - x[indice]) * (media_y - ay))
+            if area > maior_area:
+                maior_area, escolhido = area, indice
+        selecionados.append(escolhido)
+        anterior = escolhido
+
+    selecionados.append(total - 1)
+    return selecionados
+
+
+def _contagem_limitada(queryset, limite):
+    """COUNT(*) que para de contar em limite + 1 (não percorre intervalos enormes)"""
+    return queryset.order_by()[:limite + 1].count()
+
+
+def serie_ponto_critico(ponto_critico_id, inicio, fim):
+    """
+    Série do ponto crítico em [inicio, fim) pronta para o gráfico. Retorna
+    dict com resolucao ('bruta', 'minuto', 'hora' ou 'dia'), x (datetimes),
+    y (valores ou médias) e, nas resoluções agregadas, minimo/maximo por ponto.
+    """
+    niveis = [('bruta', RegistroHACCP.objects.filter(
+        ponto_critico_id=ponto_critico_id, data_hora__gte=inicio, data_hora__lt=fim
+    ))]
+    for resolucao in RESOLUCOES:
+        niveis.append((resolucao, AgregadoHACCP.objects.filter(
+            ponto_critico_id=ponto_critico_id, resolucao=resolucao,
+            inicio__gte=inicio_intervalo(inicio, resolucao), inicio__lt=fim,
+        )))
+
+    for posicao, (resolucao, queryset) in enumerate(niveis):
+        ultimo = posicao == len(niveis) - 1
+        quantidade = _contagem_limitada(queryset, MAX_PONTOS_LTTB)
+        if quantidade > MAX_PONTOS and not ultimo:
+            # Usa LTTB neste nível só se o seguinte ficar grosseiro demais
+            seguinte = _contagem_limitada(niveis[posicao + 1][1], ALVO_LTTB)
+            if quantidade > MAX_PONTOS_LTTB or seguinte >= ALVO_LTTB:
+                continue
+        break
+
+    if resolucao == 'bruta':
+        linhas = list(queryset.order_by('data_hora').values_list('data_hora', 'valor_medido')[:MAX_PONTOS_LTTB])
+        x = [linha[0] for linha in linhas]
+        y = [linha[1] for linha in linhas]
+        minimos = maximos = None
+    else:
+        linhas = list(queryset.order_by('inicio').values_list('inicio', 'soma', 'quantidade', 'minimo', 'maximo')[:MAX_PONTOS_LTTB])
+        x = [linha[0] for linha in linhas]
+        y = [linha[1] / linha[2] for linha in linhas]
+        minimos = [linha[3] for linha in linhas]
+        maximos = [linha[4] for linha in linhas]
+
+    if len(x) > MAX_PONTOS:
+        indices = lttb([momento.timestamp() for momento in x], y, ALVO_LTTB)
+        x = [x[i] for i in indices]
+        y = [y[i] for i in indices]
+        if minimos is not None:
+            minimos = [minimos[i] for i in indices]
+            maximos = [maximos[i] for i in indices]
+
+    return {'resolucao': resolucao, 'x': x, 'y': y, 'minimo': minimos, 'maximo': maximos}
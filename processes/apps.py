@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate, pre_migrate
 
 
 class ProcessesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'processes'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .busca import garantir_estrutura_pos_migracao, remover_triggers_pre_migracao
+        pre_migrate.connect(remover_triggers_pre_migracao, sender=self)
+        post_migrate.connect(garantir_estrutura_pos_migracao, sender=self)
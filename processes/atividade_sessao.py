@@ -0,0 +1,106 @@
+"""
+Rastreamento de atividade das sessões temporárias com escrita agrupada
+
+A última atividade de cada usuário fica em um buffer em memória e só é
+gravada no banco (um único UPDATE para todos os usuários pendentes)
+quando o valor gravado tem mais de DADOS_TEMPORARIOS_INTERVALO_ATIVIDADE
+segundos. A maioria das requisições faz apenas a leitura da sessão, que
+fica em cache no próprio request para o context processor.
+"""
+import threading
+from django.conf import settings
+from django.db.models import Case, DateTimeField, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from processes.models import SessaoTemporaria
+
+
+_pendentes = {}
+_pendentes_lock = threading.Lock()
+
+
+def intervalo_atividade():
+    """Intervalo mínimo em segundos entre duas gravações da atividade de um usuário"""
+    return getattr(settings, 'DADOS_TEMPORARIOS_INTERVALO_ATIVIDADE', 60)
+
+
+def obter_sessao(request):
+    """SessaoTemporaria do usuário, consultada uma vez por requisição"""
+    if not hasattr(request, '_sessao_temporaria'):
+        request._sessao_temporaria = SessaoTemporaria.objects.filter(usuario=request.user).first()
+    return request._sessao_temporaria
+
+
+def registrar_atividade(request):
+    """
+    Registra a atividade da requisição atual. Grava imediatamente apenas
+    quando a sessão é nova ou mudou de chave/cervejaria; nos
+    demais casos a atividade é acumulada e descarregada por intervalo.
+    """
+    session_key = request.session.session_key
+    if not session_key:
+        request.session.create()
+        session_key = request.session.session_key
+
+    agora = timezone.now()
+    sessao = obter_sessao(request)
+    cervejaria_id = request.session.get('brewery_id')
+
+    if sessao is None:
+        sessao = SessaoTemporaria.objects.create(
+            usuario=request.user,
+            chave_sessao=session_key,
+            cervejaria_id=_cervejaria_existente(cervejaria_id),
+        )
+        request._sessao_temporaria = sessao
+        return sessao
+
+    mudou_cervejaria = cervejaria_id is not None and cervejaria_id != sessao.cervejaria_id
+    if sessao.chave_sessao != session_key or mudou_cervejaria:
+        sessao.chave_sessao = session_key
+        if mudou_cervejaria and _cervejaria_existente(cervejaria_id):
+            sessao.cervejaria_id = cervejaria_id
+        sessao.save()
+        _descartar_pendente(sessao.pk)
+        return sessao
+
+    gravada = sessao.ultima_atividade
+    sessao.ultima_atividade = agora
+    with _pendentes_lock:
+        _pendentes[sessao.pk] = agora
+
+    if (agora - gravada).total_seconds() >= intervalo_atividade():
+        descarregar_atividades()
+    return sessao
+
+
+def descarregar_atividades():
+    """Grava em lote as atividades acumuladas. Retorna o nº de sessões atualizadas"""
+    global _pendentes
+    with _pendentes_lock:
+        pendentes, _pendentes = _pendentes, {}
+    if not pendentes:
+        return 0
+
+    # Um único UPDATE com CASE; Greatest evita que o buffer de outro worker
+    # sobrescreva uma atividade mais recente
+    novo_valor = Case(
+        *[When(pk=pk, then=Value(momento)) for pk, momento in pendentes.items()],
+        output_field=DateTimeField(),
+    )
+    return SessaoTemporaria.objects.filter(pk__in=list(pendentes)).update(
+        ultima_atividade=Greatest('ultima_atividade', novo_valor)
+    )
+
+
+def _descartar_pendente(sessao_id):
+    with _pendentes_lock:
+        _pendentes.pop(sessao_id, None)
+
+
+def _cervejaria_existente(cervejaria_id):
+    from brewery.models import Brewery
+
+    if cervejaria_id is None:
+        return None
+    return cervejaria_id if Brewery.objects.filter(id=cervejaria_id).exists() else None
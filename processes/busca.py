@@ -0,0 +1,286 @@
+"""
+Busca textual (SQLite FTS5) em NCs, ações corretivas, histórico de execuções
+e observações das etapas
+
+Todos os textos ficam em uma tabela virtual FTS5 (processes_busca), mantida
+por triggers no próprio banco: inserções, bulk_create/bulk_update e os
+DELETEs da purga também atualizam o índice, sem depender de sinais.
+
+O rowid de cada documento é id * 4 + código do tipo, então os triggers
+removem/atualizam a linha pelo rowid sem varrer a tabela.
+
+Os triggers consultam outras tabelas (a NC da CAPA, a execução do
+histórico), o que impede o SQLite de refazer essas tabelas nas migrações.
+Quando o plano tem migrações do processes que alteram essas tabelas (ou
+rodam código/SQL), eles são removidos no pre_migrate e recriados no
+post_migrate, que também reconstrói o índice.
+"""
+from datetime import timezone as dt_timezone
+from django.db import connection, connections, migrations
+from django.utils.dateparse import parse_datetime
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.timezone import is_naive, make_aware
+
+
+TABELA = 'processes_busca'
+
+TIPOS = {
+    'nc': 0,
+    'capa': 1,
+    'historico': 2,
+    'etapa': 3,
+}
+
+ROTULOS = {
+    'nc': 'Não Conformidade',
+    'capa': 'Ação Corretiva',
+    'historico': 'Histórico de Execução',
+    'etapa': 'Observação de Etapa',
+}
+
+LIMITE_PADRAO = 50
+
+# Marcadores do snippet; o texto é escapado antes de virarem <mark>
+_INICIO_DESTAQUE, _FIM_DESTAQUE = '\x02', '\x03'
+
+# Pesos do bm25 por coluna (titulo, conteudo); as demais não são indexadas
+_PESOS = '0, 0, 0, 0, 5.0, 1.0'
+
+# Para cada tipo: tabela de origem, colunas que disparam a atualização,
+# campos do documento (sobre a linha "{t}": NEW/OLD nos triggers ou a própria
+# tabela na reconstrução), tabelas auxiliares e condição de junção.
+# Campos: rowid, cervejaria_id, tipo, destino_id (NC ou execução do link),
+# data, titulo, conteudo
+_DOCUMENTOS = {
+    'nc': (
+        'processes_naoconformidade',
+        ('titulo', 'descricao'),
+        "{t}.id * 4 + 0, {t}.cervejaria_id, 'nc', {t}.id, {t}.data_criacao, {t}.titulo, {t}.descricao",
+        (),
+        '',
+    ),
+    'capa': (
+        'processes_acaocorretiva',
+        ('descricao', 'resultado'),
+        "{t}.id * 4 + 1, nc.cervejaria_id, 'capa', {t}.nc_id, {t}.data_criacao, "
+        "'CAPA ' || {t}.tipo, {t}.descricao || ' ' || {t}.resultado",
+        ('processes_naoconformidade nc',),
+        'nc.id = {t}.nc_id',
+    ),
+    'historico': (
+        'processes_historicoexecucao',
+        ('acao', 'descricao'),
+        "{t}.id * 4 + 2, ex.cervejaria_id, 'historico', {t}.execucao_id, {t}.data_hora, {t}.acao, {t}.descricao",
+        ('processes_executacaoprocesso ex',),
+        'ex.id = {t}.execucao_id',
+    ),
+    'etapa': (
+        'processes_execucaoetapa',
+        ('observacoes',),
+        "{t}.id * 4 + 3, ex.cervejaria_id, 'etapa', {t}.execucao_id, {t}.data_conclusao, et.nome, {t}.observacoes",
+        ('processes_executacaoprocesso ex', 'processes_etapaprocesso et'),
+        "ex.id = {t}.execucao_id AND et.id = {t}.etapa_id AND {t}.observacoes <> ''",
+    ),
+}
+
+_COLUNAS = '(rowid, cervejaria_id, tipo, destino_id, data, titulo, conteudo)'
+
+# Modelos (nome em minúsculas) cujas tabelas os triggers leem
+_MODELOS_INDEXADOS = {
+    tabela.split()[0].removeprefix('processes_')
+    for origem, _, _, auxiliares, _ in _DOCUMENTOS.values()
+    for tabela in (origem, *auxiliares)
+}
+
+
+def _select(tipo, linha, origem=None):
+    """SELECT do documento para a linha NEW (trigger) ou para toda a tabela de origem"""
+    _, _, campos, auxiliares, condicao = _DOCUMENTOS[tipo]
+    tabelas = ([f'{origem} {linha}'] if origem else []) + list(auxiliares)
+    sql = f'SELECT {campos.format(t=linha)}'
+    if tabelas:
+        sql += f' FROM {", ".join(tabelas)}'
+    if condicao:
+        sql += f' WHERE {condicao.format(t=linha)}'
+    return sql
+
+
+def _sql_estrutura():
+    # remove_diacritics: "temperatura alta" encontra "Temperátura ALTA"
+    comandos = [
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA} USING fts5('
+        'cervejaria_id UNINDEXED, tipo UNINDEXED, destino_id UNINDEXED, data UNINDEXED, titulo, conteudo, '
+        "tokenize = 'unicode61 remove_diacritics 2')"
+    ]
+    for tipo, (origem, colunas, *_) in _DOCUMENTOS.items():
+        codigo = TIPOS[tipo]
+        inserir = f'INSERT INTO {TABELA} {_COLUNAS} {_select(tipo, "NEW")};'
+        remover = f'DELETE FROM {TABELA} WHERE rowid = OLD.id * 4 + {codigo};'
+        comandos += [
+            f'CREATE TRIGGER IF NOT EXISTS {TABELA}_{tipo}_ai AFTER INSERT ON {origem} BEGIN {inserir} END',
+            f'CREATE TRIGGER IF NOT EXISTS {TABELA}_{tipo}_au AFTER UPDATE OF {", ".join(colunas)} ON {origem} '
+            f'BEGIN {remover} {inserir} END',
+            f'CREATE TRIGGER IF NOT EXISTS {TABELA}_{tipo}_ad AFTER DELETE ON {origem} BEGIN {remover} END',
+        ]
+    return comandos
+
+
+def garantir_estrutura(conexao=None):
+    """Cria a tabela FTS5 e os triggers que ainda não existirem"""
+    conexao = conexao or connection
+    if conexao.vendor != 'sqlite':
+        return
+    with conexao.cursor() as cursor:
+        for comando in _sql_estrutura():
+            cursor.execute(comando)
+
+
+def _remover_triggers(cursor):
+    for tipo in _DOCUMENTOS:
+        for sufixo in ('ai', 'au', 'ad'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {TABELA}_{tipo}_{sufixo}')
+
+
+def remover_estrutura(conexao=None):
+    conexao = conexao or connection
+    if conexao.vendor != 'sqlite':
+        return
+    with conexao.cursor() as cursor:
+        _remover_triggers(cursor)
+        cursor.execute(f'DROP TABLE IF EXISTS {TABELA}')
+
+
+def _indice_instalado(conexao):
+    with conexao.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [TABELA])
+        return cursor.fetchone() is not None
+
+
+def _afeta_indice(operacao):
+    if isinstance(operacao, (migrations.RunPython, migrations.RunSQL)):
+        return True
+    if hasattr(operacao, 'model_name_lower'):
+        # Operações de campo e de índice (nelas, `name` não é o modelo)
+        modelos = {operacao.model_name_lower}
+    else:
+        modelos = {getattr(operacao, atributo, None) for atributo in ('name_lower', 'old_name_lower', 'new_name_lower')}
+    return bool(modelos & _MODELOS_INDEXADOS)
+
+
+def _plano_afeta_indice(plano):
+    """O plano tem migração do processes que altera as tabelas indexadas ou roda código/SQL?"""
+    return any(
+        migracao.app_label == 'processes' and any(_afeta_indice(op) for op in migracao.operations)
+        for migracao, _ in plano or ()
+    )
+
+
+def remover_triggers_pre_migracao(using='default', plan=None, **kwargs):
+    """Receptor do pre_migrate: libera as tabelas de origem para as migrações que as alteram"""
+    conexao = connections[using]
+    if conexao.vendor == 'sqlite' and _plano_afeta_indice(plan):
+        with conexao.cursor() as cursor:
+            _remover_triggers(cursor)
+
+
+def garantir_estrutura_pos_migracao(using='default', plan=None, **kwargs):
+    """
+    Receptor do post_migrate: recria os triggers e, se o plano os removeu
+    (dados podem ter mudado sem eles), reconstrói o índice
+    """
+    conexao = connections[using]
+    if conexao.vendor != 'sqlite' or not _indice_instalado(conexao):
+        return
+    if _plano_afeta_indice(plan):
+        reconstruir_indice(conexao)
+    else:
+        garantir_estrutura(conexao)
+
+
+def reconstruir_indice(conexao=None):
+    """
+    Refaz o índice a partir das tabelas de origem (após importações diretas
+    no banco ou mudança de tokenizador). Retorna {tipo: documentos}.
+    """
+    conexao = conexao or connection
+    if conexao.vendor != 'sqlite':
+        return {}
+    garantir_estrutura(conexao)
+    totais = {}
+    with conexao.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABELA}')
+        for tipo, (origem, *_) in _DOCUMENTOS.items():
+            cursor.execute(f'INSERT INTO {TABELA} {_COLUNAS} {_select(tipo, "o", origem)}')
+            totais[tipo] = cursor.rowcount
+        # Junta os segmentos do índice em um só (consultas mais rápidas)
+        cursor.execute(f"INSERT INTO {TABELA} ({TABELA}) VALUES ('optimize')")
+    return totais
+
+
+def montar_consulta(termo):
+    """
+    Converte o texto digitado em uma expressão FTS5 segura: cada palavra vira
+    uma string entre aspas (sem operadores do usuário) e a última aceita
+    prefixo, para buscar enquanto se digita. Retorna '' se não houver palavras.
+    """
+    palavras = [palavra.replace('"', '""') for palavra in termo.split()]
+    palavras = [palavra for palavra in palavras if palavra.strip('"')]
+    if not palavras:
+        return ''
+    termos = [f'"{palavra}"' for palavra in palavras]
+    termos[-1] += '*'
+    return ' '.join(termos)
+
+
+def _data(valor):
+    # O índice guarda o texto da coluna de origem (UTC, como o Django grava)
+    momento = parse_datetime(valor) if valor else None
+    if momento is not None and is_naive(momento):
+        momento = make_aware(momento, dt_timezone.utc)
+    return momento
+
+
+def _destacar(trecho):
+    html = escape(trecho or '')
+    return mark_safe(html.replace(_INICIO_DESTAQUE, '<mark>').replace(_FIM_DESTAQUE, '</mark>'))
+
+
+def buscar(cervejaria_id, termo, tipos=None, limite=LIMITE_PADRAO):
+    """
+    Busca na cervejaria, ordenado por relevância (bm25, título com peso maior).
+    Retorna uma lista de dicts com tipo, rotulo, destino_id, data, titulo e
+    trecho (com os termos destacados entre <mark>).
+    """
+    consulta = montar_consulta(termo)
+    if not consulta:
+        return []
+
+    filtro_tipo = ''
+    parametros = [consulta, cervejaria_id]
+    if tipos:
+        filtro_tipo = f' AND tipo IN ({", ".join(["%s"] * len(tipos))})'
+        parametros += list(tipos)
+    parametros.append(limite)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT tipo, destino_id, data, titulo, "
+            f"snippet({TABELA}, 5, '{_INICIO_DESTAQUE}', '{_FIM_DESTAQUE}', '…', 16) "
+            f'FROM {TABELA} WHERE {TABELA} MATCH %s AND cervejaria_id = %s{filtro_tipo} '
+            f'ORDER BY bm25({TABELA}, {_PESOS}) LIMIT %s',
+            parametros
+        )
+        linhas = cursor.fetchall()
+
+    return [
+        {
+            'tipo': tipo,
+            'rotulo': ROTULOS[tipo],
+            'destino_id': destino_id,
+            'data': _data(data),
+            'titulo': titulo,
+            'trecho': _destacar(trecho),
+        }
+        for tipo, destino_id, data, titulo, trecho in linhas
+    ]
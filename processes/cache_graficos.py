@@ -0,0 +1,94 @@
+"""
+Cache dos gráficos Plotly por cervejaria
+
+Cada cervejaria tem uma versão de dados no cache do Django. Os sinais em
+signals.py incrementam a versão quando Metas, NCs, CAPAs, execuções ou
+registros HACCP são gravados/excluídos, invalidando todos os gráficos
+da cervejaria de uma vez (as entradas antigas expiram sozinhas).
+"""
+import functools
+import time
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+
+def _chave_versao(cervejaria_id):
+    return f'brewtab:graficos:versao:{cervejaria_id}'
+
+
+def _agora_ms():
+    return int(time.time() * 1000)
+
+
+def versao_dados(cervejaria_id):
+    """
+    Retorna a versão atual dos dados da cervejaria: o instante (em ms) da
+    última alteração. Na ausência (primeiro acesso ou descarte pelo cache)
+    inicia a partir do relógio, para nunca reaproveitar uma versão antiga.
+    """
+    chave = _chave_versao(cervejaria_id)
+    versao = cache.get(chave)
+    if versao is None:
+        cache.add(chave, _agora_ms(), timeout=None)
+        versao = cache.get(chave)
+    return versao
+
+
+def incrementar_versao(cervejaria_id):
+    """Invalida os gráficos em cache da cervejaria"""
+    versao = versao_dados(cervejaria_id)
+    cache.set(_chave_versao(cervejaria_id), max(versao + 1, _agora_ms()), timeout=None)
+
+
+def ultima_modificacao(cervejaria_id):
+    """
+    Data/hora da última alteração conhecida dos dados da cervejaria.
+    Nunca anterior ao início do dia local, pois os gráficos de tendência
+    mudam na virada do dia mesmo sem gravações.
+    """
+    alteracao = datetime.fromtimestamp(versao_dados(cervejaria_id) / 1000, tz=dt_timezone.utc)
+    inicio_do_dia = timezone.make_aware(datetime.combine(timezone.localdate(), datetime.min.time()))
+    return max(alteracao, inicio_do_dia)
+
+
+def agendar_invalidacao(cervejaria_id):
+    """Incrementa a versão após o commit, para não expor dados não confirmados"""
+    if cervejaria_id is None:
+        return
+    transaction.on_commit(lambda: incrementar_versao(cervejaria_id))
+
+
+def grafico_em_cache(funcao):
+    """
+    Decorator para os gerar_grafico_*(cervejaria, ...) do plotly_utils.
+    O argumento nomeado `metricas` não faz parte da chave.
+    """
+    @functools.wraps(funcao)
+    def wrapper(cervejaria, *args, **kwargs):
+        timeout = getattr(settings, 'GRAFICOS_CACHE_TIMEOUT', 300)
+        if not timeout:
+            return funcao(cervejaria, *args, **kwargs)
+
+        parametros = [str(arg) for arg in args]
+        parametros += [f'{nome}={valor}' for nome, valor in sorted(kwargs.items()) if nome != 'metricas']
+        chave = ':'.join([
+            'brewtab:grafico', funcao.__name__, str(cervejaria.id),
+            str(versao_dados(cervejaria.id)), timezone.localdate().isoformat(),
+            *parametros
+        ])
+
+        grafico = cache.get(chave)
+        if grafico is None:
+            grafico = funcao(cervejaria, *args, **kwargs)
+            cache.set(chave, grafico, timeout)
+        return grafico
+
+    return wrapper
+
+
+def etag_grafico(cervejaria_id, nome):
+    """ETag de um gráfico: muda com a versão dos dados e com o dia"""
+    return f'{nome}-{cervejaria_id}-{versao_dados(cervejaria_id)}-{timezone.localdate().isoformat()}'
@@ -0,0 +1,83 @@
+"""
+Catálogo dos pontos críticos (CCP) de cada cervejaria
+
+Os pontos críticos da cervejaria, com o processo e a etapa, são lidos com
+uma única consulta ordenada (processo, ordem da etapa) e guardados no cache
+do Django como uma lista de dicts. As listagens HACCP e os limites usados na
+ingestão de leituras partem deste catálogo.
+
+Os sinais em signals.py descartam o catálogo quando um ponto crítico,
+processo ou etapa é gravado/excluído. Com o cache em memória local (padrão),
+os demais workers só o recarregam quando a entrada expira, em
+HACCP_CATALOGO_CACHE_TTL segundos.
+"""
+from itertools import groupby
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .models import PontoCriticoHACCP, Processo
+
+
+def _chave(cervejaria_id):
+    return f'brewtab:catalogo_ccp:{cervejaria_id}'
+
+
+def _carregar(cervejaria_id):
+    categorias = dict(Processo.CATEGORIAS)
+    tipos = dict(PontoCriticoHACCP.TIPO_CHOICES)
+    pontos = PontoCriticoHACCP.objects.filter(processo__cervejaria_id=cervejaria_id).order_by(
+        'processo__nome', 'processo_id', 'etapa__ordem', 'id'
+    ).values(
+        'id', 'nome', 'tipo', 'limite_minimo', 'limite_maximo', 'unidade', 'acao_preventiva', 'acao_corretiva',
+        'processo_id', 'etapa_id',
+        processo_nome=F('processo__nome'), processo_categoria=F('processo__categoria'),
+        etapa_nome=F('etapa__nome'), etapa_ordem=F('etapa__ordem'),
+    )
+    catalogo = []
+    for ponto in pontos:
+        ponto['tipo_display'] = tipos.get(ponto['tipo'], ponto['tipo'])
+        ponto['processo_categoria_display'] = categorias.get(ponto['processo_categoria'], ponto['processo_categoria'])
+        catalogo.append(ponto)
+    return catalogo
+
+
+def catalogo_pontos(cervejaria_id):
+    """Lista (dicts) dos pontos críticos da cervejaria, por processo e ordem da etapa"""
+    chave = _chave(cervejaria_id)
+    catalogo = cache.get(chave)
+    if catalogo is None:
+        catalogo = _carregar(cervejaria_id)
+        cache.set(chave, catalogo, getattr(settings, 'HACCP_CATALOGO_CACHE_TTL', 30))
+    return catalogo
+
+
+def invalidar_catalogo(cervejaria_id):
+    """
+    Descarta o catálogo já (a própria transação passa a ver os dados novos)
+    e de novo após o commit, pois outra requisição pode tê-lo recarregado
+    com os dados antigos nesse meio-tempo.
+    """
+    if cervejaria_id is None:
+        return
+    chave = _chave(cervejaria_id)
+    cache.delete(chave)
+    transaction.on_commit(lambda: cache.delete(chave))
+
+
+def agrupar_por_processo(pontos):
+    """
+    Agrupa pontos do catálogo (já ordenados por processo) em uma lista de
+    dicts {'id', 'nome', 'categoria_display', 'pontos'}.
+    """
+    processos = []
+    for processo_id, grupo in groupby(pontos, key=lambda ponto: ponto['processo_id']):
+        itens = list(grupo)
+        processos.append({
+            'id': processo_id,
+            'nome': itens[0]['processo_nome'],
+            'categoria_display': itens[0]['processo_categoria_display'],
+            'pontos': itens,
+        })
+    return processos
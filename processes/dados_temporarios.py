@@ -2,6 +2,7 @@
 Serviço para gerenciamento de dados temporários
 """
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
 from processes.models import SessaoTemporaria
@@ -60,16 +61,22 @@ class GestorDadosTemporarios:
         
         try:
             sessao = SessaoTemporaria.objects.get(usuario=usuario, dados_limpis=False)
-            timeout_minutos = getattr(settings, 'DADOS_TEMPORARIOS_TIMEOUT', 30)
-            tempo_decorrido = (timezone.now() - sessao.ultima_atividade).total_seconds() / 60
-            tempo_restante = max(0, timeout_minutos - tempo_decorrido)
-            return int(tempo_restante)
+            return GestorDadosTemporarios.tempo_restante(sessao)
         except SessaoTemporaria.DoesNotExist:
             return 0
         except Exception as e:
             print(f"Erro ao calcular tempo de sessão: {e}")
             return None
     
+    @staticmethod
+    def tempo_restante(sessao):
+        """Minutos restantes para limpeza de uma sessão já carregada (0 se ausente ou limpa)"""
+        if sessao is None or sessao.dados_limpis:
+            return 0
+        timeout_minutos = getattr(settings, 'DADOS_TEMPORARIOS_TIMEOUT', 30)
+        tempo_decorrido = (timezone.now() - sessao.ultima_atividade).total_seconds() / 60
+        return int(max(0, timeout_minutos - tempo_decorrido))
+    
     @staticmethod
     def sessao_vai_expirar_em_breve(usuario, minutos=5):
         """Verifica se a sessão vai expirar nos próximos N minutos"""
@@ -108,35 +115,51 @@ class GestorDadosTemporarios:
     
     @staticmethod
     def limpar_dados_usuario(usuario):
-        """Limpa todos os dados de um usuário"""
-        from brewery.models import Brewery
-        from processes.models import (
-            Processo, PontoCriticoHaccp, RegistroHaccp, Meta
-        )
+        """
+        Limpa todos os dados de um usuário e marca sua sessão como limpa.
+        Retorna {tabela: linhas excluídas}, ou None em caso de erro
+        """
+        from processes.purga_dados import purgar_usuario
         
         try:
-            cervejarias = Brewery.objects.filter(owner=usuario)
-            
-            for cervejaria in cervejarias:
-                Processo.objects.filter(cervejaria=cervejaria).delete()
-                PontoCriticoHaccp.objects.filter(cervejaria=cervejaria).delete()
-                RegistroHaccp.objects.filter(cervejaria=cervejaria).delete()
-                Meta.objects.filter(cervejaria=cervejaria).delete()
-            
-            cervejarias.delete()
-            
-            # Marcar sessão como limpa
-            try:
-                sessao = SessaoTemporaria.objects.get(usuario=usuario)
-                sessao.dados_limpis = True
-                sessao.save()
-            except SessaoTemporaria.DoesNotExist:
-                pass
-            
-            return True
+            totais = purgar_usuario(usuario)
+            SessaoTemporaria.objects.filter(usuario=usuario).update(dados_limpis=True)
+            return totais
         except Exception as e:
             print(f"Erro ao limpar dados do usuário: {e}")
-            return False
+            return None
+    
+    @staticmethod
+    def limpar_usuarios(ids_usuarios):
+        """
+        Limpa os dados de vários usuários em uma única exclusão em massa e
+        marca suas sessões como limpas. Retorna {tabela: linhas excluídas}
+        """
+        from brewery.models import Brewery
+        from processes.purga_dados import purgar_cervejarias
+        
+        ids_usuarios = list(ids_usuarios)
+        with transaction.atomic():
+            ids_cervejarias = Brewery.objects.filter(owner_id__in=ids_usuarios).values_list('id', flat=True)
+            totais = purgar_cervejarias(ids_cervejarias)
+            SessaoTemporaria.objects.filter(usuario_id__in=ids_usuarios).update(dados_limpis=True)
+        return totais
+    
+    @staticmethod
+    def limpar_todos_dados():
+        """
+        Limpa todos os dados de todos os usuários (exceto superusuários).
+        Retorna {tabela: linhas excluídas}, ou None em caso de erro
+        """
+        from processes.purga_dados import purgar_tudo
+        
+        try:
+            totais = purgar_tudo()
+            print("Limpeza completa do banco de dados foi realizada.")
+            return totais
+        except Exception as e:
+            print(f"Erro ao fazer limpeza completa: {e}")
+            return None
     
     @staticmethod
     def obter_informacoes_sessao(usuario):
@@ -0,0 +1,236 @@
+"""
+Abertura automática de não conformidades a partir de leituras HACCP fora
+do limite
+
+A gravação das leituras só agrega os desvios por (execução, ponto crítico)
+e os coloca em uma fila após o commit. Uma thread por worker consome a
+fila, junta o que chegar durante HACCP_DESVIOS_JANELA segundos e grava
+o lote (uma transação curta por par), fora do caminho da requisição.
+
+Para cada par (execução, ponto crítico) existe no máximo uma NC aberta: os
+desvios seguintes são somados a ela (leituras_fora_limite, ultimo_desvio).
+Uma nova NC só é aberta depois que a anterior for fechada e se houver desvio
+posterior ao fechamento, então uma rajada de 1.000 leituras ruins gera uma
+única NC.
+
+A fila fica só na memória do worker: ao encerrar normalmente ele a
+descarrega (atexit), mas se o processo for morto os desvios ainda na janela
+se perdem. As leituras continuam gravadas em RegistroHACCP (conforme=False),
+apenas a NC correspondente deixa de ser aberta/atualizada.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import ExecutacaoProcesso, NaoConformidade, PontoCriticoHACCP
+
+
+logger = logging.getLogger(__name__)
+
+_fila = queue.Queue()
+
+
+def _janela():
+    return getattr(settings, 'HACCP_DESVIOS_JANELA', 2)
+
+
+def agregar_desvios(registros):
+    """
+    Resume os registros não conformes por (execução, ponto crítico):
+    quantidade, primeiro/último horário e menor/maior valor medido.
+    """
+    desvios = {}
+    for registro in registros:
+        if registro.conforme:
+            continue
+        chave = (registro.execucao_id, registro.ponto_critico_id)
+        desvio = desvios.get(chave)
+        if desvio is None:
+            desvios[chave] = {
+                'execucao_id': registro.execucao_id,
+                'ponto_critico_id': registro.ponto_critico_id,
+                'cervejaria_id': registro.cervejaria_id,
+                'usuario_id': registro.usuario_id,
+                'quantidade': 1,
+                'primeiro': registro.data_hora,
+                'ultimo': registro.data_hora,
+                'minimo': registro.valor_medido,
+                'maximo': registro.valor_medido,
+            }
+        else:
+            _somar(desvio, registro.data_hora, registro.data_hora, registro.valor_medido, registro.valor_medido, 1)
+    return list(desvios.values())
+
+
+def _somar(desvio, primeiro, ultimo, minimo, maximo, quantidade):
+    desvio['quantidade'] += quantidade
+    desvio['primeiro'] = min(desvio['primeiro'], primeiro)
+    desvio['ultimo'] = max(desvio['ultimo'], ultimo)
+    desvio['minimo'] = min(desvio['minimo'], minimo)
+    desvio['maximo'] = max(desvio['maximo'], maximo)
+
+
+def notificar_desvios(registros):
+    """
+    Agenda o tratamento dos desvios de `registros` para depois do commit
+    (leituras de uma transação desfeita não abrem NC).
+    """
+    desvios = agregar_desvios(registros)
+    if not desvios:
+        return
+
+    if getattr(settings, 'HACCP_DESVIOS_EM_SEGUNDO_PLANO', True):
+        transaction.on_commit(lambda: _enfileirar(desvios))
+    else:
+        transaction.on_commit(lambda: processar_desvios(desvios))
+
+
+def _enfileirar(desvios):
+    iniciar_detector()
+    _fila.put(desvios)
+
+
+def processar_desvios(desvios):
+    """
+    Abre ou atualiza as NCs dos desvios (lista no formato de agregar_desvios,
+    pode repetir pares). Cada par é gravado em sua própria transação: pares
+    cuja execução ou ponto crítico foi excluído depois do enfileiramento são
+    ignorados sem desfazer os demais. Retorna (ncs_abertas, ncs_atualizadas).
+    """
+    por_par = {}
+    for desvio in desvios:
+        chave = (desvio['execucao_id'], desvio['ponto_critico_id'])
+        if chave in por_par:
+            _somar(por_par[chave], desvio['primeiro'], desvio['ultimo'], desvio['minimo'], desvio['maximo'], desvio['quantidade'])
+        else:
+            por_par[chave] = dict(desvio)
+
+    pontos = PontoCriticoHACCP.objects.in_bulk({ponto_id for _, ponto_id in por_par})
+    execucoes = set(ExecutacaoProcesso.objects.filter(
+        id__in={execucao_id for execucao_id, _ in por_par}
+    ).values_list('id', flat=True))
+    abertas, atualizadas = 0, 0
+    for (execucao_id, ponto_id), desvio in por_par.items():
+        ponto = pontos.get(ponto_id)
+        if ponto is None or execucao_id not in execucoes:
+            continue
+        try:
+            # Transação por par: o SQLite só confere as chaves estrangeiras no commit
+            with transaction.atomic():
+                aberta = _registrar_desvio(execucao_id, ponto, desvio)
+        except IntegrityError:
+            # Execução ou ponto excluído entre a consulta acima e a gravação
+            logger.warning('Desvio HACCP ignorado (execução %s, ponto %s)', execucao_id, ponto_id, exc_info=True)
+            continue
+        if aberta is True:
+            abertas += 1
+        elif aberta is False:
+            atualizadas += 1
+    return abertas, atualizadas
+
+
+def _registrar_desvio(execucao_id, ponto, desvio):
+    """
+    Soma o desvio à NC aberta do par ou abre uma nova. Retorna True se abriu,
+    False se atualizou e None se a histerese descartou o desvio.
+    """
+    ncs = NaoConformidade.objects.filter(execucao_id=execucao_id, ponto_critico=ponto)
+    aberta = ncs.exclude(status='fechada').order_by('-id').values_list('id', flat=True).first()
+    if aberta is not None:
+        # update() direto: não muda contagens de KPIs nem gráficos
+        NaoConformidade.objects.filter(id=aberta).update(
+            leituras_fora_limite=F('leituras_fora_limite') + desvio['quantidade'],
+            ultimo_desvio=Greatest(Coalesce(F('ultimo_desvio'), desvio['ultimo']), desvio['ultimo']),
+        )
+        return False
+
+    # Histerese: leituras anteriores ao fechamento da última NC não a reabrem
+    fechamento = ncs.filter(status='fechada').order_by('-data_fechamento').values_list(
+        'data_fechamento', flat=True
+    ).first()
+    if fechamento is not None and desvio['ultimo'] <= fechamento:
+        return None
+
+    NaoConformidade.objects.create(
+        cervejaria_id=desvio['cervejaria_id'],
+        execucao_id=execucao_id,
+        ponto_critico=ponto,
+        titulo=f'Desvio HACCP: {ponto.nome} fora do limite',
+        descricao=(
+            f'Leituras de {ponto.nome} fora do limite '
+            f'({ponto.limite_minimo} a {ponto.limite_maximo} {ponto.unidade}) '
+            f'na execução #{execucao_id}: valores entre {desvio["minimo"]} e {desvio["maximo"]} {ponto.unidade}.\n'
+            f'Ação corretiva prevista: {ponto.acao_corretiva}'
+        ),
+        severidade='alta',
+        usuario_criacao_id=desvio['usuario_id'],
+        leituras_fora_limite=desvio['quantidade'],
+        ultimo_desvio=desvio['ultimo'],
+    )
+    return True
+
+
+def descarregar_fila():
+    """Processa (na thread atual) tudo o que estiver na fila"""
+    lote = []
+    while True:
+        try:
+            lote.extend(_fila.get_nowait())
+        except queue.Empty:
+            break
+    if lote:
+        processar_desvios(lote)
+
+
+class DetectorDesvios(threading.Thread):
+    """Thread daemon que consome a fila de desvios em lotes"""
+
+    def __init__(self):
+        super().__init__(name='brewtab-desvios-haccp', daemon=True)
+
+    def run(self):
+        while True:
+            lote = _fila.get()
+            # Debounce: junta o que chegar durante a janela em um único lote
+            time.sleep(_janela())
+            while True:
+                try:
+                    lote.extend(_fila.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                close_old_connections()
+                processar_desvios(lote)
+            except Exception:
+                logger.exception('Erro ao abrir NCs de desvios HACCP (%d desvio(s) perdido(s))', len(lote))
+            finally:
+                connection.close()
+
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def iniciar_detector():
+    """Inicia (uma vez por processo) a thread que consome a fila"""
+    global _detector
+    with _detector_lock:
+        if _detector is None or not _detector.is_alive():
+            _detector = DetectorDesvios()
+            _detector.start()
+    return _detector
+
+
+@atexit.register
+def _descarregar_ao_encerrar():
+    # Desvios ainda na janela quando o worker é encerrado
+    try:
+        descarregar_fila()
+    except Exception:
+        logger.exception('Erro ao descarregar a fila de desvios HACCP')
@@ -0,0 +1,262 @@
+"""
+Criação de execuções de processo e conclusão de etapas do checklist
+
+Todas as linhas (execuções, etapas e histórico) são gravadas com
+bulk_create/bulk_update dentro de uma transação: o número de consultas não
+depende da quantidade de etapas nem de execuções (até o limite de lote do
+banco).
+
+Os contadores da execução (etapas, leituras HACCP, última atividade) são
+somados com F() na mesma transação; recontar_execucoes() os recalcula.
+"""
+from datetime import timezone as dt_timezone
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .cache_graficos import agendar_invalidacao
+from .kpi_diario import agendar_recalculo
+from .models import ExecutacaoProcesso, ExecucaoEtapa, HistoricoExecucao, PontoCriticoHACCP, RegistroHACCP
+
+
+# Limite de execuções por clique (dia de brassagem com várias bateladas)
+MAX_EXECUCOES_POR_LOTE = 50
+
+# Limite de etapas concluídas em uma única requisição do checklist
+MAX_ETAPAS_POR_REQUISICAO = 200
+
+
+def iniciar_execucoes(processo, usuario, quantidade=1):
+    """
+    Inicia `quantidade` execuções do processo, cada uma com uma ExecucaoEtapa
+    por etapa e o registro "Execução Iniciada" no histórico.
+    Retorna a lista de execuções criadas.
+    """
+    if not 1 <= quantidade <= MAX_EXECUCOES_POR_LOTE:
+        raise ValueError(f'A quantidade de execuções deve estar entre 1 e {MAX_EXECUCOES_POR_LOTE}')
+
+    agora = timezone.now()
+    with transaction.atomic():
+        etapas = list(processo.etapas.values_list('id', flat=True))
+
+        # bulk_create não chama save(): a cervejaria denormalizada é preenchida aqui
+        execucoes = ExecutacaoProcesso.objects.bulk_create([
+            ExecutacaoProcesso(
+                processo=processo,
+                cervejaria_id=processo.cervejaria_id,
+                usuario=usuario,
+                status='em_progresso',
+                total_etapas=len(etapas),
+                ultima_atividade=agora,
+            )
+            for _ in range(quantidade)
+        ])
+
+        ExecucaoEtapa.objects.bulk_create([
+            ExecucaoEtapa(execucao=execucao, etapa_id=etapa_id)
+            for execucao in execucoes
+            for etapa_id in etapas
+        ])
+
+        descricao = f'Usuário {usuario.username} iniciou a execução do processo'
+        if quantidade > 1:
+            descricao += f' (lote de {quantidade} execuções)'
+        HistoricoExecucao.objects.bulk_create([
+            HistoricoExecucao(
+                execucao=execucao,
+                usuario=usuario,
+                acao='Execução Iniciada',
+                descricao=descricao,
+            )
+            for execucao in execucoes
+        ])
+
+        # bulk_create não dispara post_save: KPIs e gráficos são atualizados aqui
+        agendar_recalculo(processo.cervejaria_id, agora)
+        agendar_invalidacao(processo.cervejaria_id)
+
+    return execucoes
+
+
+def iniciar_execucao(processo, usuario):
+    """Inicia uma única execução do processo"""
+    return iniciar_execucoes(processo, usuario, 1)[0]
+
+
+def interpretar_momento(valor, minimo, agora):
+    """
+    Horário ISO 8601 enviado pelo cliente (checklist, sondas HACCP), limitado
+    a [minimo, agora]. Sem fuso = UTC. Levanta ValueError se não for uma
+    data/hora válida.
+    """
+    try:
+        momento = parse_datetime(valor)
+    except TypeError:
+        momento = None
+    if momento is None:
+        raise ValueError(f'data/hora inválida: {valor!r}')
+    if timezone.is_naive(momento):
+        momento = timezone.make_aware(momento, dt_timezone.utc)
+    return min(max(momento, minimo), agora)
+
+
+def _momento_cliente(valor, minimo, agora):
+    """Horário de conclusão enviado pelo cliente; ausente ou inválido = agora"""
+    try:
+        return interpretar_momento(valor, minimo, agora)
+    except ValueError:
+        return agora
+
+
+def concluir_etapas(execucao, usuario, itens):
+    """
+    Marca várias etapas da execução como concluídas de uma vez.
+
+    `itens` é uma lista de dicts {'id': <ExecucaoEtapa>, 'observacoes': str,
+    'concluida_em': ISO 8601 opcional (horário do cliente)}. Etapas de outra
+    execução ou já concluídas são ignoradas. Tudo é gravado com um
+    bulk_update, um bulk_create do histórico e um UPDATE do contador da
+    execução, em uma transação.
+    Retorna (ids_atualizados, ids_ignorados).
+    """
+    agora = timezone.now()
+    por_id = {}
+    for item in itens:
+        por_id[int(item['id'])] = item
+
+    with transaction.atomic():
+        etapas = list(
+            execucao.etapas_executadas
+            .select_for_update()
+            .select_related('etapa')
+            .filter(id__in=por_id, concluida=False)
+        )
+
+        historicos = []
+        for etapa_exec in etapas:
+            item = por_id[etapa_exec.id]
+            etapa_exec.concluida = True
+            etapa_exec.data_conclusao = _momento_cliente(item.get('concluida_em'), execucao.data_inicio, agora)
+            etapa_exec.observacoes = str(item.get('observacoes') or '')
+            historicos.append(HistoricoExecucao(
+                execucao=execucao,
+                usuario=usuario,
+                acao='Etapa Concluída',
+                descricao=f'Etapa "{etapa_exec.etapa.nome}" (ordem {etapa_exec.etapa.ordem}) foi marcada como concluída'
+            ))
+
+        ExecucaoEtapa.objects.bulk_update(etapas, ['concluida', 'data_conclusao', 'observacoes'])
+        HistoricoExecucao.objects.bulk_create(historicos)
+        if etapas:
+            somar_contadores(execucao.id, agora, etapas_concluidas=len(etapas))
+
+    atualizados = [etapa_exec.id for etapa_exec in etapas]
+    ignorados = sorted(set(por_id) - set(atualizados))
+    return atualizados, ignorados
+
+
+def somar_contadores(execucao_id, agora=None, atividade=True, **incrementos):
+    """
+    Soma os incrementos (total_etapas, etapas_concluidas, leituras_conformes,
+    leituras_nao_conformes) aos contadores da execução com F(), sem ler a
+    linha, e marca a última atividade (exceto com atividade=False). Chamar
+    dentro da transação da gravação.
+    """
+    campos = {campo: F(campo) + valor for campo, valor in incrementos.items() if valor}
+    if atividade:
+        campos['ultima_atividade'] = agora or timezone.now()
+    if campos:
+        ExecutacaoProcesso.objects.filter(id=execucao_id).update(**campos)
+
+
+def _contagem(modelo, filtro=None):
+    """Subconsulta correlacionada COUNT(*) das linhas de `modelo` da execução"""
+    linhas = (
+        modelo.objects
+        .filter(execucao=OuterRef('pk'))
+        .order_by()
+        .values('execucao')
+        .annotate(total=Count('id', filter=filtro))
+        .values('total')
+    )
+    return Coalesce(Subquery(linhas, output_field=IntegerField()), 0)
+
+
+def recontar_execucoes(execucoes=None, etapas=True, leituras=True):
+    """
+    Recalcula os contadores de progresso e de leituras HACCP a partir das
+    etapas e registros, em um único UPDATE com subconsultas. `execucoes` é
+    um queryset (padrão: todas). Retorna o número de execuções atualizadas.
+    """
+    campos = {}
+    if etapas:
+        campos['total_etapas'] = _contagem(ExecucaoEtapa)
+        campos['etapas_concluidas'] = _contagem(ExecucaoEtapa, Q(concluida=True))
+    if leituras:
+        campos['leituras_conformes'] = _contagem(RegistroHACCP, Q(conforme=True))
+        campos['leituras_nao_conformes'] = _contagem(RegistroHACCP, Q(conforme=False))
+    if etapas and leituras:
+        # Mais recente entre início, conclusão, etapas concluídas e leituras
+        ultima_etapa = ExecucaoEtapa.objects.filter(execucao=OuterRef('pk')).order_by().values('execucao').annotate(
+            ultima=Max('data_conclusao')
+        ).values('ultima')
+        ultima_leitura = RegistroHACCP.objects.filter(execucao=OuterRef('pk')).order_by().values('execucao').annotate(
+            ultima=Max('data_hora')
+        ).values('ultima')
+        # Greatest do SQLite devolve NULL se algum argumento for NULL
+        campos['ultima_atividade'] = Greatest(
+            'data_inicio',
+            Coalesce('data_conclusao', 'data_inicio'),
+            Coalesce(Subquery(ultima_etapa), 'data_inicio'),
+            Coalesce(Subquery(ultima_leitura), 'data_inicio'),
+        )
+    if execucoes is None:
+        execucoes = ExecutacaoProcesso.objects.all()
+    return execucoes.order_by().update(**campos)
+
+
+def etapas_checklist(execucao):
+    """
+    Etapas da execução para o checklist, com a etapa (select_related) e os
+    pontos críticos de cada etapa em etapa.pontos, carregados em uma única
+    consulta extra e anotados com a última leitura desta execução
+    (ultimo_valor, ultimo_conforme, ultima_leitura). São duas consultas,
+    qualquer que seja o número de etapas ou de pontos críticos.
+    """
+    ultima = RegistroHACCP.objects.filter(
+        execucao=execucao, ponto_critico=OuterRef('pk')
+    ).order_by('-data_hora', '-id')
+    pontos = PontoCriticoHACCP.objects.annotate(
+        ultimo_valor=Subquery(ultima.values('valor_medido')[:1]),
+        ultimo_conforme=Subquery(ultima.values('conforme')[:1]),
+        ultima_leitura=Subquery(ultima.values('data_hora')[:1]),
+    ).order_by('id')
+    return list(
+        execucao.etapas_executadas
+        .select_related('etapa')
+        .prefetch_related(Prefetch('etapa__pontos_criticos', queryset=pontos, to_attr='pontos'))
+    )
+
+
+def estado_checklist(execucao):
+    """Estado do checklist em formato serializável (para respostas JSON)"""
+    etapas = [
+        {
+            'id': etapa_exec.id,
+            'ordem': etapa_exec.etapa.ordem,
+            'nome': etapa_exec.etapa.nome,
+            'concluida': etapa_exec.concluida,
+            'data_conclusao': etapa_exec.data_conclusao.isoformat() if etapa_exec.data_conclusao else None,
+            'observacoes': etapa_exec.observacoes,
+        }
+        for etapa_exec in execucao.etapas_executadas.select_related('etapa')
+    ]
+    return {
+        'execucao': execucao.id,
+        'status': execucao.status,
+        'total_etapas': len(etapas),
+        'etapas_concluidas': sum(1 for etapa in etapas if etapa['concluida']),
+        'etapas': etapas,
+    }
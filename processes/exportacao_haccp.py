@@ -0,0 +1,115 @@
+"""
+Exportação dos registros HACCP de um período (auditorias), em CSV ou CSV
+compactado com gzip
+
+As linhas são lidas com values_list().iterator(), em blocos, e escritas à
+medida que são geradas: o uso de memória não depende do tamanho do período,
+tanto no endpoint (StreamingHttpResponse) quanto no comando exportar_haccp.
+"""
+import csv
+import zlib
+from datetime import datetime, timedelta
+from django.utils import timezone
+
+from .models import RegistroHACCP
+
+
+# Linhas lidas do banco por vez
+TAMANHO_BLOCO = 2000
+
+# Linhas de CSV agrupadas em cada pedaço enviado
+LINHAS_POR_PEDACO = 500
+
+CABECALHO = [
+    'Data/Hora', 'Execução', 'Processo', 'Ponto Crítico', 'Tipo', 'Valor Medido', 'Unidade',
+    'Limite Mínimo', 'Limite Máximo', 'Conforme', 'Usuário', 'Observações',
+]
+
+_CAMPOS = (
+    'data_hora', 'execucao_id', 'execucao__processo__nome', 'ponto_critico__nome', 'ponto_critico__tipo',
+    'valor_medido', 'ponto_critico__unidade', 'ponto_critico__limite_minimo', 'ponto_critico__limite_maximo',
+    'conforme', 'usuario__username', 'observacoes',
+)
+
+
+def consulta_registros(cervejaria_id, data_inicio=None, data_fim=None):
+    """
+    Registros da cervejaria entre as datas locais (inclusive), em ordem
+    cronológica. Os limites são os atuais do ponto crítico.
+    """
+    registros = RegistroHACCP.objects.filter(cervejaria_id=cervejaria_id)
+    # Limites do período como datetimes, para usar o índice (cervejaria, data_hora)
+    if data_inicio:
+        registros = registros.filter(
+            data_hora__gte=timezone.make_aware(datetime.combine(data_inicio, datetime.min.time()))
+        )
+    if data_fim:
+        registros = registros.filter(
+            data_hora__lt=timezone.make_aware(datetime.combine(data_fim + timedelta(days=1), datetime.min.time()))
+        )
+    return registros.order_by('data_hora', 'id').values_list(*_CAMPOS)
+
+
+# Início de célula que o Excel/LibreOffice interpretam como fórmula
+_INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _celula(valor):
+    """Texto livre (nomes, observações) com aspa na frente se parecer fórmula"""
+    if isinstance(valor, str) and valor.startswith(_INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+class _Eco:
+    """Arquivo falso para o csv.writer: write() só devolve a linha"""
+
+    def write(self, valor):
+        return valor
+
+
+def linhas_csv(registros):
+    """
+    Gera o CSV (texto, com BOM para o Excel) em pedaços de várias linhas.
+    Textos que começam com =, +, -, @ são prefixados com aspa simples, para
+    não virarem fórmulas na planilha do auditor.
+    """
+    escritor = csv.writer(_Eco())
+    fuso = timezone.get_current_timezone()
+    yield '\ufeff' + escritor.writerow(CABECALHO)
+
+    pedaco = []
+    for data_hora, *meio, conforme, usuario, observacoes in registros.iterator(chunk_size=TAMANHO_BLOCO):
+        pedaco.append(escritor.writerow([
+            data_hora.astimezone(fuso).isoformat(timespec='seconds'),
+            *map(_celula, meio),
+            'sim' if conforme else 'não',
+            _celula(usuario),
+            _celula(observacoes),
+        ]))
+        if len(pedaco) >= LINHAS_POR_PEDACO:
+            yield ''.join(pedaco)
+            pedaco = []
+    if pedaco:
+        yield ''.join(pedaco)
+
+
+def bytes_csv(registros, compactar=False):
+    """CSV em UTF-8, opcionalmente compactado (formato gzip) em fluxo"""
+    if not compactar:
+        for texto in linhas_csv(registros):
+            yield texto.encode('utf-8')
+        return
+
+    # wbits=31: cabeçalho e rodapé gzip (compatível com gunzip/7-Zip)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for texto in linhas_csv(registros):
+        dados = compressor.compress(texto.encode('utf-8'))
+        if dados:
+            yield dados
+    yield compressor.flush()
+
+
+def nome_arquivo(cervejaria_id, data_inicio=None, data_fim=None, compactar=False):
+    periodo = '_'.join(data.isoformat() for data in (data_inicio, data_fim) if data) or 'completo'
+    return f'haccp_cervejaria{cervejaria_id}_{periodo}.csv' + ('.gz' if compactar else '')
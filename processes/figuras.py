@@ -0,0 +1,94 @@
+"""
+Montagem de figuras Plotly como dicionários simples
+
+Gera o mesmo JSON que go.Figure(...).to_dict() para os tipos de gráfico
+usados no BrewTab (bar, pie, scatter, indicator), sem a validação do
+plotly.graph_objects e sem importar o plotly no processo web.
+
+O template 'plotly_white' fica em plotly_templates/plotly_white.json,
+exportado de plotly.io.templates (versão em requirements.txt).
+"""
+import functools
+import json
+from pathlib import Path
+
+
+DIRETORIO_TEMPLATES = Path(__file__).resolve().parent / 'plotly_templates'
+
+# Prefixos aceitos na notação "magic underscore" do plotly (ex.: marker_color)
+PREFIXOS_ANINHADOS = ('marker', 'line', 'xaxis', 'yaxis')
+
+
+@functools.lru_cache(maxsize=None)
+def carregar_template(nome):
+    """Carrega (uma vez por processo) o JSON de um template Plotly"""
+    with open(DIRETORIO_TEMPLATES / f'{nome}.json', encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+def _titulo(valor):
+    """O plotly normaliza títulos em texto para {'text': ...}"""
+    if isinstance(valor, str):
+        return {'text': valor}
+    return valor
+
+
+def _expandir(propriedades):
+    """Converte marker_color=... em marker={'color': ...} e normaliza títulos"""
+    resultado = {}
+    for chave, valor in propriedades.items():
+        prefixo, _, resto = chave.partition('_')
+        if resto and prefixo in PREFIXOS_ANINHADOS:
+            resultado.setdefault(prefixo, {})[resto] = valor
+        elif isinstance(valor, dict) and isinstance(resultado.get(chave), dict):
+            resultado[chave] = {**resultado[chave], **valor}
+        elif isinstance(valor, dict):
+            # Cópia: marker_color=... seguinte não pode alterar o dict de quem chamou
+            resultado[chave] = dict(valor)
+        else:
+            resultado[chave] = valor
+
+    if 'title' in resultado:
+        resultado['title'] = _titulo(resultado['title'])
+    for eixo in ('xaxis', 'yaxis'):
+        if 'title' in resultado.get(eixo, {}):
+            resultado[eixo] = {**resultado[eixo], 'title': _titulo(resultado[eixo]['title'])}
+    return resultado
+
+
+def _trace(tipo, propriedades):
+    trace = _expandir(propriedades)
+    trace['type'] = tipo
+    return trace
+
+
+def barra(**propriedades):
+    return _trace('bar', propriedades)
+
+
+def pizza(**propriedades):
+    return _trace('pie', propriedades)
+
+
+def dispersao(**propriedades):
+    return _trace('scatter', propriedades)
+
+
+def indicador(**propriedades):
+    return _trace('indicator', propriedades)
+
+
+def figura(dados, **layout):
+    """
+    Monta a figura {'data': [...], 'layout': {...}}.
+    Um template nomeado em `layout['template']` é expandido como no plotly.
+    """
+    layout = _expandir(layout)
+    if isinstance(layout.get('template'), str):
+        layout['template'] = carregar_template(layout['template'])
+    return {'data': list(dados), 'layout': layout}
+
+
+def figura_json(dados, **layout):
+    """Atalho para json.dumps(figura(...))"""
+    return json.dumps(figura(dados, **layout))
@@ -0,0 +1,155 @@
+"""
+Ingestão em lote de leituras HACCP (sondas de temperatura, pH, CIP...)
+
+Os limites dos pontos críticos vêm do catálogo da cervejaria em cache
+(catalogo_haccp.py), compartilhado com as páginas HACCP: um lote não
+consulta os pontos críticos no banco enquanto o catálogo estiver válido.
+
+Cada lote é validado e classificado (conforme/não conforme) em uma única
+passada e gravado com bulk_create, em uma transação, junto com os
+agregados por minuto/hora/dia (agregados_haccp.py) e os contadores de
+leituras da execução. Os desvios seguem para
+a fila de desvios_haccp.py após o commit.
+"""
+import math
+from django.db import transaction
+from django.utils import timezone
+
+from .agregados_haccp import atualizar_agregados
+from .cache_graficos import agendar_invalidacao
+from .catalogo_haccp import catalogo_pontos
+from .desvios_haccp import notificar_desvios
+from .execucoes import interpretar_momento, somar_contadores
+from .kpi_diario import agendar_recalculo
+from .models import RegistroHACCP
+
+
+# Limite de leituras por requisição
+MAX_LEITURAS_POR_LOTE = 10000
+
+# Quantidade máxima de erros descritos na resposta
+MAX_ERROS_RELATADOS = 20
+
+
+class LoteInvalido(ValueError):
+    """Lote com leituras inválidas; `erros` descreve as primeiras"""
+
+    def __init__(self, erros):
+        super().__init__('; '.join(erros))
+        self.erros = erros
+
+
+def preparar_registros(execucao, usuario, leituras):
+    """
+    Valida as leituras e monta os RegistroHACCP (sem gravar).
+
+    Cada leitura é um dict {'ponto_critico': id, 'valor': número,
+    'data_hora': ISO 8601 opcional, 'observacoes': texto opcional}. O ponto
+    crítico precisa ser do processo da execução. O horário é limitado ao
+    intervalo entre o início da execução e agora, o que também limita os dias
+    de KPI recalculados por lote. Levanta LoteInvalido se
+    alguma leitura for inválida (o lote é aceito ou recusado por inteiro).
+    """
+    if not isinstance(leituras, list) or not 1 <= len(leituras) <= MAX_LEITURAS_POR_LOTE:
+        raise LoteInvalido([f'Envie de 1 a {MAX_LEITURAS_POR_LOTE} leituras.'])
+
+    try:
+        for leitura in leituras:
+            int(leitura['ponto_critico'])
+    except (KeyError, TypeError, ValueError):
+        raise LoteInvalido(['Toda leitura precisa de "ponto_critico" (id numérico).'])
+
+    limites = {
+        ponto['id']: (ponto['limite_minimo'], ponto['limite_maximo'])
+        for ponto in catalogo_pontos(execucao.cervejaria_id)
+        if ponto['processo_id'] == execucao.processo_id
+    }
+
+    agora = timezone.now()
+    registros, erros = [], []
+    for posicao, leitura in enumerate(leituras):
+        ponto_id = int(leitura['ponto_critico'])
+        faixa = limites.get(ponto_id)
+        try:
+            if faixa is None:
+                raise ValueError(f'ponto crítico {ponto_id} não pertence ao processo')
+            valor = leitura.get('valor')
+            if isinstance(valor, bool) or not isinstance(valor, (int, float)) or not math.isfinite(valor):
+                raise ValueError('"valor" deve ser um número finito')
+            try:
+                momento = agora if leitura.get('data_hora') is None else interpretar_momento(
+                    leitura['data_hora'], execucao.data_inicio, agora
+                )
+            except ValueError:
+                raise ValueError('"data_hora" deve estar em ISO 8601')
+        except (AttributeError, ValueError) as e:
+            erros.append(f'leitura {posicao}: {e}')
+            if len(erros) >= MAX_ERROS_RELATADOS:
+                break
+            continue
+
+        registros.append(RegistroHACCP(
+            execucao_id=execucao.id,
+            ponto_critico_id=ponto_id,
+            # bulk_create não chama save(): a cervejaria denormalizada é preenchida aqui
+            cervejaria_id=execucao.cervejaria_id,
+            valor_medido=float(valor),
+            conforme=faixa[0] <= valor <= faixa[1],
+            usuario=usuario,
+            data_hora=momento,
+            observacoes=str(leitura.get('observacoes') or ''),
+        ))
+
+    if erros:
+        raise LoteInvalido(erros)
+    return registros
+
+
+def leituras_do_formulario(dados, prefixo='leitura_'):
+    """
+    Leituras preenchidas em um formulário (campos <prefixo><ponto_id>, vírgula
+    ou ponto decimal); campos vazios são ignorados. Levanta LoteInvalido se
+    algum valor não for numérico.
+    """
+    leituras, erros = [], []
+    for campo, texto in dados.items():
+        if not campo.startswith(prefixo) or not texto.strip():
+            continue
+        ponto_id = campo[len(prefixo):]
+        try:
+            valor = float(texto.strip().replace(',', '.'))
+            # isdigit() aceitaria '²', que int() recusa
+            if not (ponto_id.isascii() and ponto_id.isdecimal()) or not math.isfinite(valor):
+                raise ValueError
+        except ValueError:
+            erros.append(f'valor inválido: "{texto}"')
+            continue
+        leituras.append({'ponto_critico': int(ponto_id), 'valor': valor})
+
+    if erros:
+        raise LoteInvalido(erros[:MAX_ERROS_RELATADOS])
+    return leituras
+
+
+def registrar_leituras(execucao, usuario, leituras):
+    """Valida e grava um lote de leituras. Retorna a lista de RegistroHACCP criados"""
+    registros = preparar_registros(execucao, usuario, leituras)
+
+    with transaction.atomic():
+        RegistroHACCP.objects.bulk_create(registros)
+        atualizar_agregados(registros)
+        conformes = sum(1 for registro in registros if registro.conforme)
+        somar_contadores(execucao.id, leituras_conformes=conformes, leituras_nao_conformes=len(registros) - conformes)
+
+        # bulk_create não dispara post_save: KPIs (um recálculo por dia) e gráficos
+        dias = {}
+        for registro in registros:
+            dias.setdefault(timezone.localdate(registro.data_hora), registro.data_hora)
+        for momento in dias.values():
+            agendar_recalculo(execucao.cervejaria_id, momento)
+        agendar_invalidacao(execucao.cervejaria_id)
+
+        # Leituras fora do limite abrem/atualizam NCs em segundo plano
+        notificar_desvios(registros)
+
+    return registros
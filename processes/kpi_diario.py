@@ -0,0 +1,214 @@
+"""
+Consolidação diária de KPIs por cervejaria (tabela KPIDiario)
+
+Cada linha guarda os contadores de um dia (no fuso de TIME_ZONE). As linhas
+são recalculadas ao gravar/excluir execuções, registros HACCP, NCs e CAPAs
+(ver signals.py) e podem ser reconstruídas pelo comando recalcular_kpis.
+"""
+import itertools
+import threading
+from datetime import datetime, time, timedelta
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+CAMPOS_KPI = [
+    'execucoes', 'execucoes_sem_nc',
+    'haccp_conformes', 'haccp_nao_conformes',
+    'ncs_total', 'ncs_baixa', 'ncs_media', 'ncs_alta', 'ncs_criticas',
+    'ncs_abertas', 'ncs_em_analise', 'ncs_em_correcao', 'ncs_fechadas',
+    'capas_total', 'capas_concluidas',
+]
+
+_contador = itertools.count()
+_estado = threading.local()
+
+
+def data_local(momento):
+    """Converte um datetime para a data local usada como chave da consolidação"""
+    return timezone.localdate(momento)
+
+
+def limites_do_dia(data):
+    """Retorna o intervalo [início, fim) de um dia local como datetimes com fuso"""
+    inicio = timezone.make_aware(datetime.combine(data, time.min))
+    fim = timezone.make_aware(datetime.combine(data + timedelta(days=1), time.min))
+    return inicio, fim
+
+
+def _por_dia(linhas, campo_data, inicio, fim, **contagens):
+    """Agrega `linhas` do intervalo [inicio, fim) por dia local: {data: {contagem: valor}}"""
+    dias = (
+        linhas
+        .filter(**{f'{campo_data}__gte': inicio, f'{campo_data}__lt': fim})
+        .annotate(dia=TruncDate(campo_data, tzinfo=timezone.get_current_timezone()))
+        .order_by()
+        .values('dia')
+        .annotate(**contagens)
+    )
+    return {linha.pop('dia'): linha for linha in dias}
+
+
+def calcular_kpis_periodo(cervejaria_id, data_inicio, data_fim):
+    """
+    Calcula os contadores de cada dia de um intervalo (inclusive) diretamente
+    das tabelas de origem, com uma consulta agrupada por dia para cada tabela.
+    Retorna {data: valores}, só com os dias com movimento.
+    """
+    from .models import ExecutacaoProcesso, RegistroHACCP, NaoConformidade, AcaoCorretiva
+
+    inicio, _ = limites_do_dia(data_inicio)
+    _, fim = limites_do_dia(data_fim)
+
+    tabelas = [
+        _por_dia(
+            ExecutacaoProcesso.objects.filter(cervejaria_id=cervejaria_id), 'data_inicio', inicio, fim,
+            execucoes=Count('id', distinct=True),
+            execucoes_sem_nc=Count('id', distinct=True, filter=Q(nc_geradas__isnull=True)),
+        ),
+        _por_dia(
+            RegistroHACCP.objects.filter(cervejaria_id=cervejaria_id), 'data_hora', inicio, fim,
+            haccp_conformes=Count('id', filter=Q(conforme=True)),
+            haccp_nao_conformes=Count('id', filter=Q(conforme=False)),
+        ),
+        _por_dia(
+            NaoConformidade.objects.filter(cervejaria_id=cervejaria_id), 'data_criacao', inicio, fim,
+            ncs_total=Count('id'),
+            ncs_baixa=Count('id', filter=Q(severidade='baixa')),
+            ncs_media=Count('id', filter=Q(severidade='media')),
+            ncs_alta=Count('id', filter=Q(severidade='alta')),
+            ncs_criticas=Count('id', filter=Q(severidade='critica')),
+            ncs_abertas=Count('id', filter=Q(status='aberta')),
+            ncs_em_analise=Count('id', filter=Q(status='em_analise')),
+            ncs_em_correcao=Count('id', filter=Q(status='em_correcao')),
+            ncs_fechadas=Count('id', filter=Q(status='fechada')),
+        ),
+        _por_dia(
+            AcaoCorretiva.objects.filter(nc__cervejaria_id=cervejaria_id), 'data_criacao', inicio, fim,
+            capas_total=Count('id'),
+            capas_concluidas=Count('id', filter=Q(status='concluida')),
+        ),
+    ]
+
+    kpis = {}
+    for tabela in tabelas:
+        for dia, valores in tabela.items():
+            kpis.setdefault(dia, dict.fromkeys(CAMPOS_KPI, 0)).update(valores)
+    return {dia: valores for dia, valores in kpis.items() if any(valores.values())}
+
+
+def calcular_kpi_dia(cervejaria_id, data):
+    """Calcula os contadores de um dia diretamente das tabelas de origem"""
+    return calcular_kpis_periodo(cervejaria_id, data, data).get(data, dict.fromkeys(CAMPOS_KPI, 0))
+
+
+def recalcular_kpi_diario(cervejaria_id, data):
+    """
+    Recalcula e grava a linha KPIDiario de um dia.
+    Dias sem movimento não ocupam linha na tabela.
+    """
+    from brewery.models import Brewery
+    from .models import KPIDiario
+
+    if not Brewery.objects.filter(id=cervejaria_id).exists():
+        return None
+
+    valores = calcular_kpi_dia(cervejaria_id, data)
+
+    if not any(valores.values()):
+        KPIDiario.objects.filter(cervejaria_id=cervejaria_id, data=data).delete()
+        return None
+
+    kpi, _ = KPIDiario.objects.update_or_create(
+        cervejaria_id=cervejaria_id,
+        data=data,
+        defaults=valores
+    )
+    return kpi
+
+
+def agendar_recalculo(cervejaria_id, momento):
+    """
+    Agenda o recálculo do dia de `momento` para depois do commit.
+    Vários agendamentos da mesma chave na mesma transação (ex.: exclusão em
+    cascata) resultam em um único recálculo.
+    """
+    if cervejaria_id is None or momento is None:
+        return
+
+    chave = (cervejaria_id, data_local(momento))
+    marca = next(_contador)
+
+    def executar():
+        recalculados = getattr(_estado, 'recalculados', None)
+        if recalculados is None or len(recalculados) > 1024:
+            recalculados = _estado.recalculados = {}
+        if recalculados.get(chave, -1) > marca:
+            return
+        recalculados[chave] = next(_contador)
+        recalcular_kpi_diario(*chave)
+
+    transaction.on_commit(executar)
+
+
+def reconstruir_kpis(cervejaria_id, data_inicio, data_fim):
+    """
+    Refaz as linhas KPIDiario de um intervalo (inclusive) com as consultas
+    agrupadas de calcular_kpis_periodo, qualquer que seja o nº de dias.
+    Retorna o nº de dias com movimento.
+    """
+    from .models import KPIDiario
+
+    kpis = calcular_kpis_periodo(cervejaria_id, data_inicio, data_fim)
+    with transaction.atomic():
+        KPIDiario.objects.filter(cervejaria_id=cervejaria_id, data__gte=data_inicio, data__lte=data_fim).delete()
+        KPIDiario.objects.bulk_create([
+            KPIDiario(cervejaria_id=cervejaria_id, data=dia, **valores) for dia, valores in kpis.items()
+        ])
+    return len(kpis)
+
+
+def somar_kpis(cervejaria, data_inicio, data_fim=None):
+    """Soma as linhas KPIDiario de um período (no máximo uma linha por dia)"""
+    from .models import KPIDiario
+
+    filtro = Q(cervejaria=cervejaria, data__gte=data_inicio)
+    if data_fim is not None:
+        filtro &= Q(data__lte=data_fim)
+
+    totais = KPIDiario.objects.filter(filtro).aggregate(
+        **{campo: Sum(campo) for campo in CAMPOS_KPI}
+    )
+    return {campo: valor or 0 for campo, valor in totais.items()}
+
+
+def atualizar_kpi_exercicio(cervejaria, data_inicio, data_fim):
+    """Preenche o KPIExercicio da cervejaria a partir da consolidação diária"""
+    from .models import KPIExercicio
+
+    totais = somar_kpis(cervejaria, data_inicio, data_fim)
+
+    taxa_conformidade = 0
+    if totais['execucoes'] > 0:
+        taxa_conformidade = (totais['execucoes_sem_nc'] / totais['execucoes']) * 100
+
+    kpi, _ = KPIExercicio.objects.update_or_create(
+        cervejaria=cervejaria,
+        defaults={
+            'data_inicio': data_inicio,
+            'data_fim': data_fim,
+            'total_processos_executados': totais['execucoes'],
+            'processos_sem_nc': totais['execucoes_sem_nc'],
+            'taxa_conformidade': round(taxa_conformidade, 2),
+            'registros_haccp_conformes': totais['haccp_conformes'],
+            'registros_haccp_nao_conformes': totais['haccp_nao_conformes'],
+            'total_ncs': totais['ncs_total'],
+            'ncs_fechadas': totais['ncs_fechadas'],
+            'ncs_criticas': totais['ncs_criticas'],
+            'total_capasscii': totais['capas_total'],
+            'capas_concluidas': totais['capas_concluidas'],
+        }
+    )
+    return kpi
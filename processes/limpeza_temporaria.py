@@ -0,0 +1,154 @@
+"""
+Limpeza periódica de dados temporários, fora do ciclo de requisição
+
+A limpeza (sessões expiradas + tamanho do banco) roda em uma thread de
+segundo plano por processo, ou no comando `limpar_dados_temporarios --daemon`.
+Um arquivo de trava garante que, com vários workers, apenas um execute a
+limpeza a cada intervalo.
+"""
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+from processes.atividade_sessao import descarregar_atividades
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def intervalo_limpeza():
+    """Intervalo em segundos entre duas limpezas"""
+    return getattr(settings, 'DADOS_TEMPORARIOS_INTERVALO_LIMPEZA', 60)
+
+
+def caminho_trava():
+    padrao = os.path.join(tempfile.gettempdir(), 'brewtab_limpeza_dados_temporarios.lock')
+    return getattr(settings, 'DADOS_TEMPORARIOS_LOCK_FILE', None) or padrao
+
+
+def limpar_sessoes_expiradas():
+    """Limpa os dados de usuários com sessão expirada. Retorna o nº de sessões limpas"""
+    from processes.dados_temporarios import GestorDadosTemporarios
+    from processes.models import SessaoTemporaria
+
+    timeout_minutos = getattr(settings, 'DADOS_TEMPORARIOS_TIMEOUT', 30)
+    limite_tempo = timezone.now() - timedelta(minutes=timeout_minutos)
+
+    usuarios_expirados = list(SessaoTemporaria.objects.filter(
+        ultima_atividade__lt=limite_tempo,
+        dados_limpis=False
+    ).values_list('usuario_id', flat=True))
+
+    if usuarios_expirados:
+        GestorDadosTemporarios.limpar_usuarios(usuarios_expirados)
+    return len(usuarios_expirados)
+
+
+def verificar_tamanho_database():
+    """Faz a limpeza completa se o banco excedeu o tamanho máximo. Retorna True se limpou"""
+    from processes.dados_temporarios import GestorDadosTemporarios
+
+    tamanho_max_mb = getattr(settings, 'DADOS_TEMPORARIOS_MAX_DB_SIZE_MB', 50)
+    tamanho_mb = GestorDadosTemporarios.obter_tamanho_database()
+
+    if tamanho_mb > tamanho_max_mb:
+        print(f"Banco de dados excedeu tamanho máximo ({tamanho_mb:.2f}MB > {tamanho_max_mb}MB)")
+        GestorDadosTemporarios.limpar_todos_dados()
+        return True
+    return False
+
+
+def _travar(arquivo):
+    """Tenta obter a trava exclusiva sem bloquear"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            arquivo.seek(0)
+            msvcrt.locking(arquivo.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _destravar(arquivo):
+    if fcntl is not None:
+        fcntl.flock(arquivo.fileno(), fcntl.LOCK_UN)
+    else:
+        arquivo.seek(0)
+        msvcrt.locking(arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def executar_limpeza(forcar=False, intervalo=None):
+    """
+    Executa a limpeza se nenhum processo a executou nos últimos `intervalo`
+    segundos (padrão: DADOS_TEMPORARIOS_INTERVALO_LIMPEZA). O instante da
+    última execução fica gravado no próprio arquivo de trava.
+    Retorna o nº de sessões limpas, ou None se a execução foi pulada.
+    """
+    with open(caminho_trava(), 'a+') as arquivo:
+        if not _travar(arquivo):
+            return None
+        try:
+            arquivo.seek(0)
+            conteudo = arquivo.read().strip()
+            ultima_execucao = float(conteudo) if conteudo else 0
+            if not forcar and time.time() - ultima_execucao < (intervalo or intervalo_limpeza()):
+                return None
+
+            total = limpar_sessoes_expiradas()
+            verificar_tamanho_database()
+
+            arquivo.seek(0)
+            arquivo.truncate()
+            arquivo.write(str(time.time()))
+            arquivo.flush()
+            return total
+        finally:
+            _destravar(arquivo)
+
+
+class AgendadorLimpeza(threading.Thread):
+    """Thread daemon que chama executar_limpeza() a cada intervalo"""
+
+    def __init__(self, intervalo=None):
+        super().__init__(name='brewtab-limpeza-dados-temporarios', daemon=True)
+        self.intervalo = intervalo or intervalo_limpeza()
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                close_old_connections()
+                descarregar_atividades()
+                total = executar_limpeza(intervalo=self.intervalo)
+                if total:
+                    print(f"{total} sessão(ões) temporária(s) expirada(s) foram limpas.")
+            except Exception as e:
+                print(f"Erro na limpeza periódica de dados temporários: {e}")
+            finally:
+                connection.close()
+
+    def parar(self):
+        self._parar.set()
+
+
+_agendador = None
+_agendador_lock = threading.Lock()
+
+
+def iniciar_agendador():
+    """Inicia (uma vez por processo) a thread de limpeza periódica"""
+    global _agendador
+    with _agendador_lock:
+        if _agendador is None or not _agendador.is_alive():
+            _agendador = AgendadorLimpeza()
+            _agendador.start()
+    return _agendador
@@ -0,0 +1,58 @@
+"""
+Comando de gerenciamento que compara o custo de montar gráficos com
+plotly.graph_objects e com o montador leve de processes/figuras.py
+"""
+import json
+import time
+from django.core.management.base import BaseCommand
+from processes.figuras import figura, barra, pizza, dispersao, indicador
+
+
+class Command(BaseCommand):
+    help = 'Mede o tempo médio por gráfico: plotly.graph_objects vs processes.figuras'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeticoes',
+            type=int,
+            default=200,
+            help='Quantidade de gráficos montados por tipo (padrão: 200)',
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        import plotly.graph_objects as go
+        tempo_import = time.perf_counter() - inicio
+        self.stdout.write(f'Import de plotly.graph_objects: {tempo_import * 1000:.1f} ms')
+
+        layout = dict(
+            title='Benchmark', xaxis_title='X', yaxis_title='Y', hovermode='x unified',
+            template='plotly_white', height=400, margin=dict(l=50, r=50, t=60, b=50)
+        )
+        rotulos = [f'{dia:02d}/10' for dia in range(1, 31)]
+        valores = list(range(30))
+        casos = {
+            'bar': (go.Bar, barra, dict(name='Barras', x=rotulos, y=valores, marker_color='#2ecc71')),
+            'pie': (go.Pie, pizza, dict(labels=rotulos[:4], values=valores[:4], marker=dict(colors=['#dc3545'] * 4))),
+            'scatter': (go.Scatter, dispersao, dict(x=rotulos, y=valores, mode='lines+markers', line=dict(color='#e74c3c', width=2))),
+            'indicator': (go.Indicator, indicador, dict(mode='number+gauge', value=87.5, title={'text': 'HACCP'}, gauge={'axis': {'range': [0, 100]}})),
+        }
+
+        repeticoes = options['repeticoes']
+        for nome, (trace_go, trace_leve, props) in casos.items():
+            inicio = time.perf_counter()
+            for _ in range(repeticoes):
+                fig = go.Figure(data=[trace_go(**props)])
+                fig.update_layout(**layout)
+                json.dumps(fig.to_dict())
+            tempo_go = (time.perf_counter() - inicio) / repeticoes
+
+            inicio = time.perf_counter()
+            for _ in range(repeticoes):
+                json.dumps(figura([trace_leve(**props)], **layout))
+            tempo_leve = (time.perf_counter() - inicio) / repeticoes
+
+            self.stdout.write(
+                f'{nome:<10} go.Figure: {tempo_go * 1000:7.3f} ms | figuras: {tempo_leve * 1000:7.3f} ms '
+                f'({tempo_go / tempo_leve:.0f}x)'
+            )
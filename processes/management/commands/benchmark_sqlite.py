@@ -0,0 +1,151 @@
+"""
+Comando de gerenciamento que mede a concorrência no SQLite com os perfis
+de brewtab_config/banco_dados.py
+
+Vários processos (como os workers do gunicorn) atualizam o checklist de
+execuções no mesmo arquivo enquanto outros leem o progresso. As escritas
+seguem o formato de um transaction.atomic() do Django (BEGIN no modo do
+perfil, leitura, escrita, COMMIT); as leituras rodam em autocommit. Para
+cada perfil são mostrados escritas/s, leituras/s, erros "database is
+locked" e latências de escrita.
+"""
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from django.core.management.base import BaseCommand, CommandError
+from brewtab_config.banco_dados import MODOS_TRANSACAO, PERFIS, executar_pragmas
+
+
+EXECUCOES = 200
+ETAPAS_POR_EXECUCAO = 10
+
+
+def _criar_banco(caminho, pragmas):
+    conexao = sqlite3.connect(caminho, isolation_level=None)
+    executar_pragmas(conexao, pragmas)
+    conexao.executescript('''
+        CREATE TABLE etapa (
+            id INTEGER PRIMARY KEY, execucao_id INTEGER NOT NULL,
+            concluida INTEGER NOT NULL DEFAULT 0, observacoes TEXT, data_conclusao TEXT
+        );
+        CREATE INDEX etapa_execucao ON etapa (execucao_id);
+        CREATE TABLE historico (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, execucao_id INTEGER NOT NULL,
+            acao TEXT NOT NULL, descricao TEXT, data_hora TEXT NOT NULL
+        );
+        CREATE INDEX historico_execucao ON historico (execucao_id, data_hora);
+    ''')
+    conexao.executemany(
+        'INSERT INTO etapa (execucao_id) VALUES (?)',
+        [(execucao,) for execucao in range(EXECUCOES) for _ in range(ETAPAS_POR_EXECUCAO)]
+    )
+    conexao.close()
+
+
+def _trabalhador(caminho, pragmas, modo, tipo, duracao, semente, resultados):
+    """Executa transações até o fim da duração e devolve as contagens pela fila"""
+    random.seed(semente)
+    # timeout=5 é o padrão do sqlite3/Django; o perfil pode sobrescrever com busy_timeout
+    conexao = sqlite3.connect(caminho, timeout=5, isolation_level=None)
+    executar_pragmas(conexao, pragmas)
+    ok, travados, latencias = 0, 0, []
+    fim = time.monotonic() + duracao
+
+    while time.monotonic() < fim:
+        execucao = random.randrange(EXECUCOES)
+        inicio = time.perf_counter()
+        try:
+            if tipo == 'escrita':
+                conexao.execute(f'BEGIN {modo}')
+                etapas = conexao.execute(
+                    'SELECT id FROM etapa WHERE execucao_id = ? AND concluida = 0', (execucao,)
+                ).fetchall() or conexao.execute(
+                    'SELECT id FROM etapa WHERE execucao_id = ?', (execucao,)
+                ).fetchall()
+                conexao.execute(
+                    "UPDATE etapa SET concluida = 1 - concluida, observacoes = ?, data_conclusao = datetime('now') "
+                    'WHERE id = ?', ('ok', random.choice(etapas)[0])
+                )
+                conexao.execute(
+                    "INSERT INTO historico (execucao_id, acao, descricao, data_hora) VALUES (?, 'etapa_concluida', ?, datetime('now'))",
+                    (execucao, 'Etapa concluída')
+                )
+                conexao.execute('COMMIT')
+            else:
+                conexao.execute(
+                    'SELECT execucao_id, COUNT(*), SUM(concluida) FROM etapa GROUP BY execucao_id'
+                ).fetchall()
+                conexao.execute(
+                    'SELECT * FROM historico WHERE execucao_id = ? ORDER BY data_hora DESC LIMIT 50', (execucao,)
+                ).fetchall()
+            ok += 1
+            latencias.append(time.perf_counter() - inicio)
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e) and 'busy' not in str(e):
+                raise
+            travados += 1
+            if conexao.in_transaction:
+                conexao.execute('ROLLBACK')
+
+    conexao.close()
+    resultados.put((tipo, ok, travados, latencias))
+
+
+class Command(BaseCommand):
+    help = 'Compara a concorrência de escrita no SQLite entre os perfis de PRAGMAs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escritores', type=int, default=4, help='Processos que atualizam checklists (padrão: 4)')
+        parser.add_argument('--leitores', type=int, default=4, help='Processos que leem o progresso (padrão: 4)')
+        parser.add_argument('--duracao', type=float, default=5, help='Segundos por perfil (padrão: 5)')
+        parser.add_argument(
+            '--perfis', nargs='+', default=list(PERFIS), choices=list(PERFIS),
+            help='Perfis comparados (padrão: todos)'
+        )
+
+    def handle(self, *args, **options):
+        if options['escritores'] < 1:
+            raise CommandError('--escritores deve ser pelo menos 1')
+
+        contexto = multiprocessing.get_context('spawn')
+        with tempfile.TemporaryDirectory() as diretorio:
+            for nome in options['perfis']:
+                pragmas, modo = PERFIS[nome], MODOS_TRANSACAO[nome]
+                caminho = os.path.join(diretorio, f'{nome}.sqlite3')
+                _criar_banco(caminho, pragmas)
+
+                resultados = contexto.Queue()
+                tipos = ['escrita'] * options['escritores'] + ['leitura'] * options['leitores']
+                processos = [
+                    contexto.Process(
+                        target=_trabalhador,
+                        args=(caminho, pragmas, modo, tipo, options['duracao'], semente, resultados)
+                    )
+                    for semente, tipo in enumerate(tipos)
+                ]
+                for processo in processos:
+                    processo.start()
+                coletados = [resultados.get() for _ in processos]
+                for processo in processos:
+                    processo.join()
+
+                self._relatar(nome, pragmas, modo, coletados, options['duracao'])
+
+    def _relatar(self, nome, pragmas, modo, coletados, duracao):
+        escritas = sum(ok for tipo, ok, _, _ in coletados if tipo == 'escrita')
+        leituras = sum(ok for tipo, ok, _, _ in coletados if tipo == 'leitura')
+        travados = sum(travados for _, _, travados, _ in coletados)
+        latencias = sorted(lat for tipo, _, _, lats in coletados if tipo == 'escrita' for lat in lats)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Perfil {nome}: {pragmas or "padrão do SQLite"}, BEGIN {modo}'))
+        self.stdout.write(f'  escritas/s: {escritas / duracao:9.1f}   leituras/s: {leituras / duracao:9.1f}')
+        self.stdout.write(f'  erros "database is locked": {travados}')
+        if latencias:
+            p95 = latencias[int(len(latencias) * 0.95) - 1] if len(latencias) >= 20 else latencias[-1]
+            self.stdout.write(
+                f'  latência de escrita: mediana {statistics.median(latencias) * 1000:.1f} ms | p95 {p95 * 1000:.1f} ms'
+            )
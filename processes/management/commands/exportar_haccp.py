@@ -0,0 +1,55 @@
+"""
+Comando de gerenciamento para exportar os registros HACCP de uma cervejaria
+em CSV (opcionalmente gzip), sem carregar o período inteiro em memória
+"""
+import argparse
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from brewery.models import Brewery
+from processes.exportacao_haccp import bytes_csv, consulta_registros, nome_arquivo
+
+
+def _data(valor):
+    try:
+        data = parse_date(valor)
+    except ValueError:
+        data = None
+    if data is None:
+        raise argparse.ArgumentTypeError(f"data inválida: '{valor}' (use AAAA-MM-DD)")
+    return data
+
+
+class Command(BaseCommand):
+    help = 'Exporta os registros HACCP de uma cervejaria em CSV (ou CSV.gz) para auditoria'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cervejaria', type=int, required=True, help='ID da cervejaria')
+        parser.add_argument('--de', type=_data, help='Data inicial (AAAA-MM-DD, inclusive)')
+        parser.add_argument('--ate', type=_data, help='Data final (AAAA-MM-DD, inclusive)')
+        parser.add_argument('--gzip', action='store_true', help='Compacta a saída com gzip')
+        parser.add_argument(
+            '--saida',
+            help='Arquivo de saída ("-" para a saída padrão; padrão: nome gerado no diretório atual)',
+        )
+
+    def handle(self, *args, **options):
+        if not Brewery.objects.filter(id=options['cervejaria']).exists():
+            raise CommandError(f"Cervejaria {options['cervejaria']} não encontrada")
+
+        registros = consulta_registros(options['cervejaria'], options['de'], options['ate'])
+        pedacos = bytes_csv(registros, options['gzip'])
+
+        if options['saida'] == '-':
+            for pedaco in pedacos:
+                sys.stdout.buffer.write(pedaco)
+            sys.stdout.buffer.flush()
+            return
+
+        caminho = options['saida'] or nome_arquivo(options['cervejaria'], options['de'], options['ate'], options['gzip'])
+        total = 0
+        with open(caminho, 'wb') as arquivo:
+            for pedaco in pedacos:
+                arquivo.write(pedaco)
+                total += len(pedaco)
+        self.stdout.write(self.style.SUCCESS(f'✓ Registros exportados para {caminho} ({total / 1024:.1f} KiB)'))
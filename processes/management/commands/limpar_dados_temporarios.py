@@ -5,7 +5,11 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
+import time
+from django.db import close_old_connections
+from processes.dados_temporarios import GestorDadosTemporarios
 from processes.models import SessaoTemporaria
+from processes.limpeza_temporaria import executar_limpeza, intervalo_limpeza
 
 
 class Command(BaseCommand):
@@ -22,6 +26,16 @@ class Command(BaseCommand):
             type=str,
             help='Limpa dados apenas de um usuário específico',
         )
+        parser.add_argument(
+            '--daemon',
+            action='store_true',
+            help='Executa continuamente, limpando sessões expiradas a cada intervalo',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=int,
+            help='Intervalo em segundos entre limpezas no modo --daemon (padrão: DADOS_TEMPORARIOS_INTERVALO_LIMPEZA)',
+        )
 
     def handle(self, *args, **options):
         dados_temporarios_ativo = getattr(settings, 'DADOS_TEMPORARIOS', False)
@@ -30,7 +44,9 @@ class Command(BaseCommand):
             self.stdout.write(self.style.WARNING('DADOS_TEMPORARIOS não está ativado'))
             return
         
-        if options['force']:
+        if options['daemon']:
+            self._executar_daemon(options['intervalo'] or intervalo_limpeza())
+        elif options['force']:
             self._limpar_todos_dados()
         elif options['user']:
             self._limpar_usuario_especifico(options['user'])
@@ -38,27 +54,41 @@ class Command(BaseCommand):
             self._limpar_sessoes_expiradas()
             self._verificar_tamanho_database()
 
+    def _executar_daemon(self, intervalo):
+        """Loop de limpeza periódica (alternativa à thread dentro dos workers)"""
+        self.stdout.write(f'Limpeza de dados temporários a cada {intervalo}s (Ctrl+C para sair)')
+        try:
+            while True:
+                try:
+                    total = executar_limpeza(intervalo=intervalo)
+                    if total:
+                        self.stdout.write(self.style.SUCCESS(f'✓ {total} sessão(ões) expirada(s) foram limpas'))
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f'Erro durante limpeza periódica: {e}'))
+                finally:
+                    close_old_connections()
+                time.sleep(intervalo)
+        except KeyboardInterrupt:
+            self.stdout.write('Limpeza periódica encerrada')
+
     def _limpar_sessoes_expiradas(self):
         """Limpa sessões que expiraram"""
         timeout_minutos = getattr(settings, 'DADOS_TEMPORARIOS_TIMEOUT', 30)
         limite_tempo = timezone.now() - timedelta(minutes=timeout_minutos)
         
-        sessoes_expiradas = SessaoTemporaria.objects.filter(
+        usuarios_expirados = list(SessaoTemporaria.objects.filter(
             ultima_atividade__lt=limite_tempo,
             dados_limpis=False
-        )
-        
-        count = sessoes_expiradas.count()
+        ).values_list('usuario_id', flat=True))
         
-        for sessao in sessoes_expiradas:
-            self._limpar_dados_usuario(sessao.usuario)
-            sessao.dados_limpis = True
-            sessao.save()
+        count = len(usuarios_expirados)
         
         if count > 0:
+            totais = GestorDadosTemporarios.limpar_usuarios(usuarios_expirados)
             self.stdout.write(
                 self.style.SUCCESS(f'✓ {count} sessão(ões) expirada(s) foram limpas')
             )
+            self._relatar(totais)
         else:
             self.stdout.write('Nenhuma sessão expirada encontrada')
 
@@ -84,30 +114,24 @@ class Command(BaseCommand):
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'Erro ao verificar tamanho: {e}'))
 
+    def _relatar(self, totais):
+        """Mostra as linhas excluídas por tabela"""
+        for tabela, linhas in totais.items():
+            if linhas:
+                self.stdout.write(f'  {tabela}: {linhas}')
+
     def _limpar_dados_usuario(self, usuario):
         """Limpa todos os dados de um usuário específico"""
-        from brewery.models import Brewery
-        from processes.models import (
-            Processo, PontoCriticoHaccp, RegistroHaccp, Meta
-        )
+        totais = GestorDadosTemporarios.limpar_dados_usuario(usuario)
         
-        try:
-            cervejarias = Brewery.objects.filter(owner=usuario)
-            
-            for cervejaria in cervejarias:
-                Processo.objects.filter(cervejaria=cervejaria).delete()
-                PontoCriticoHaccp.objects.filter(cervejaria=cervejaria).delete()
-                RegistroHaccp.objects.filter(cervejaria=cervejaria).delete()
-                Meta.objects.filter(cervejaria=cervejaria).delete()
-            
-            cervejarias.delete()
-            
-            self.stdout.write(
-                self.style.SUCCESS(f"✓ Dados do usuário '{usuario.username}' foram limpos")
-            )
+        if totais is None:
+            self.stdout.write(self.style.ERROR(f"Erro ao limpar usuário '{usuario.username}'"))
+            return
         
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f"Erro ao limpar usuário '{usuario.username}': {e}"))
+        self.stdout.write(
+            self.style.SUCCESS(f"✓ Dados do usuário '{usuario.username}' foram limpos")
+        )
+        self._relatar(totais)
 
     def _limpar_usuario_especifico(self, username):
         """Limpa dados de um usuário específico"""
@@ -121,16 +145,11 @@ class Command(BaseCommand):
 
     def _limpar_todos_dados(self):
         """Limpa todos os dados de todos os usuários"""
-        from django.contrib.auth.models import User
+        totais = GestorDadosTemporarios.limpar_todos_dados()
         
-        try:
-            SessaoTemporaria.objects.all().delete()
-            
-            usuarios = User.objects.filter(is_superuser=False)
-            for usuario in usuarios:
-                self._limpar_dados_usuario(usuario)
-            
-            self.stdout.write(self.style.SUCCESS('✓ Limpeza completa realizada com sucesso'))
+        if totais is None:
+            self.stdout.write(self.style.ERROR('Erro durante limpeza completa'))
+            return
         
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Erro durante limpeza completa: {e}'))
+        self.stdout.write(self.style.SUCCESS('✓ Limpeza completa realizada com sucesso'))
+        self._relatar(totais)
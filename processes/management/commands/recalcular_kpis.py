@@ -0,0 +1,43 @@
+"""
+Comando de gerenciamento para reconstruir a consolidação diária de KPIs
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from brewery.models import Brewery
+from processes.kpi_diario import reconstruir_kpis, atualizar_kpi_exercicio
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói a tabela KPIDiario (e o KPIExercicio) a partir dos dados de origem'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cervejaria',
+            type=int,
+            help='Reconstrói apenas a cervejaria com este ID',
+        )
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=365,
+            help='Quantidade de dias a reconstruir, contando a partir de hoje (padrão: 365)',
+        )
+
+    def handle(self, *args, **options):
+        cervejarias = Brewery.objects.all()
+        if options['cervejaria']:
+            cervejarias = cervejarias.filter(id=options['cervejaria'])
+            if not cervejarias.exists():
+                self.stdout.write(self.style.ERROR(f"Cervejaria {options['cervejaria']} não encontrada"))
+                return
+
+        data_fim = timezone.localdate()
+        data_inicio = data_fim - timedelta(days=options['dias'])
+
+        for cervejaria in cervejarias:
+            dias = reconstruir_kpis(cervejaria.id, data_inicio, data_fim)
+            atualizar_kpi_exercicio(cervejaria, data_inicio, data_fim)
+            self.stdout.write(
+                self.style.SUCCESS(f"✓ {cervejaria.name}: {dias} dia(s) com movimento consolidados")
+            )
@@ -0,0 +1,31 @@
+"""
+Comando de gerenciamento para recalcular os agregados (minuto/hora/dia) das
+leituras HACCP, ex.: após excluir ou corrigir leituras
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from brewery.models import Brewery
+from processes.agregados_haccp import reconstruir_agregados
+
+
+class Command(BaseCommand):
+    help = 'Recalcula a tabela AgregadoHACCP a partir dos registros HACCP'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cervejaria',
+            type=int,
+            help='Recalcula apenas a cervejaria com este ID',
+        )
+
+    def handle(self, *args, **options):
+        if options['cervejaria'] and not Brewery.objects.filter(id=options['cervejaria']).exists():
+            self.stdout.write(self.style.ERROR(f"Cervejaria {options['cervejaria']} não encontrada"))
+            return
+
+        with transaction.atomic():
+            totais = reconstruir_agregados(options['cervejaria'])
+
+        for resolucao, total in totais.items():
+            self.stdout.write(f'  {resolucao}: {total} intervalo(s)')
+        self.stdout.write(self.style.SUCCESS('✓ Agregados HACCP recalculados'))
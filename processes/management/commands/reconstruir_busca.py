@@ -0,0 +1,22 @@
+"""
+Comando de gerenciamento para reconstruir o índice de busca textual (FTS5)
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from processes.busca import ROTULOS, reconstruir_indice
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice FTS5 de NCs, ações corretivas, histórico e observações de etapas'
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stdout.write(self.style.WARNING('A busca textual só está disponível no SQLite'))
+            return
+
+        with transaction.atomic():
+            totais = reconstruir_indice()
+
+        for tipo, total in totais.items():
+            self.stdout.write(f'  {ROTULOS[tipo]}: {total}')
+        self.stdout.write(self.style.SUCCESS(f'✓ Índice de busca reconstruído ({sum(totais.values())} documento(s))'))
@@ -0,0 +1,34 @@
+"""
+Comando de gerenciamento para recalcular os contadores das execuções
+(etapas, leituras HACCP e última atividade), corrigindo desvios
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from brewery.models import Brewery
+from processes.execucoes import recontar_execucoes
+from processes.models import ExecutacaoProcesso
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os contadores de progresso e de leituras HACCP das execuções'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cervejaria',
+            type=int,
+            help='Recalcula apenas as execuções da cervejaria com este ID',
+        )
+
+    def handle(self, *args, **options):
+        execucoes = ExecutacaoProcesso.objects.all()
+        if options['cervejaria']:
+            cervejaria = Brewery.objects.filter(id=options['cervejaria']).first()
+            if cervejaria is None:
+                self.stdout.write(self.style.ERROR(f"Cervejaria {options['cervejaria']} não encontrada"))
+                return
+            execucoes = ExecutacaoProcesso.objects.for_brewery(cervejaria)
+
+        with transaction.atomic():
+            total = recontar_execucoes(execucoes)
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Contadores de {total} execução(ões) recalculados'))
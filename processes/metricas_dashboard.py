@@ -0,0 +1,204 @@
+"""
+Serviço de métricas do dashboard: calcula todos os KPIs de uma cervejaria
+com poucas consultas de agregação condicional
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+
+STATUS_NC_ATIVAS = ['aberta', 'em_analise', 'em_correcao']
+STATUS_CAPA_PENDENTES = ['planejada', 'em_execucao']
+
+
+class MetricasDashboard:
+    """
+    Conjunto de KPIs de uma cervejaria compartilhado entre a view do
+    dashboard e os geradores de gráficos do plotly_utils.
+
+    Cada modelo é agregado em uma única consulta usando
+    Count(..., filter=Q(...)), totalizando cinco consultas.
+    """
+
+    def __init__(self, cervejaria, agora=None):
+        from .models import (
+            Processo, ExecutacaoProcesso, RegistroHACCP,
+            NaoConformidade, AcaoCorretiva
+        )
+
+        self.cervejaria = cervejaria
+        self.agora = agora or timezone.now()
+
+        periodo_7 = self.agora - timedelta(days=7)
+        periodo_14 = self.agora - timedelta(days=14)
+        periodo_30 = self.agora - timedelta(days=30)
+
+        # Processos
+        self.total_processos = Processo.objects.filter(cervejaria=cervejaria).count()
+
+        # Execuções (total e por status)
+        execucoes = ExecutacaoProcesso.objects.filter(
+            cervejaria=cervejaria
+        ).aggregate(
+            total=Count('id'),
+            nao_iniciada=Count('id', filter=Q(status='nao_iniciada')),
+            em_progresso=Count('id', filter=Q(status='em_progresso')),
+            concluida=Count('id', filter=Q(status='concluida')),
+            cancelada=Count('id', filter=Q(status='cancelada')),
+            # Progresso das execuções em andamento, direto dos contadores da linha
+            etapas_concluidas_em_progresso=Sum('etapas_concluidas', filter=Q(status='em_progresso')),
+            total_etapas_em_progresso=Sum('total_etapas', filter=Q(status='em_progresso')),
+        )
+        self.total_execucoes = execucoes.pop('total')
+        self.etapas_concluidas_em_progresso = execucoes.pop('etapas_concluidas_em_progresso') or 0
+        self.total_etapas_em_progresso = execucoes.pop('total_etapas_em_progresso') or 0
+        self.execucoes_por_status = execucoes
+        self.execucoes_concluidas = execucoes['concluida']
+
+        # Não conformidades (status, severidade e janelas de tendência)
+        ativas = Q(status__in=STATUS_NC_ATIVAS)
+        ncs = NaoConformidade.objects.filter(
+            cervejaria=cervejaria
+        ).aggregate(
+            ativas=Count('id', filter=ativas),
+            criticas_ativas=Count('id', filter=ativas & Q(severidade='critica')),
+            critica=Count('id', filter=Q(severidade='critica')),
+            alta=Count('id', filter=Q(severidade='alta')),
+            media=Count('id', filter=Q(severidade='media')),
+            baixa=Count('id', filter=Q(severidade='baixa')),
+            dias_7=Count('id', filter=Q(data_criacao__gte=periodo_7)),
+            dias_14=Count('id', filter=Q(data_criacao__gte=periodo_14, data_criacao__lt=periodo_7)),
+            dias_30=Count('id', filter=Q(data_criacao__gte=periodo_30, data_criacao__lt=periodo_14)),
+        )
+        self.ncs_ativas = ncs['ativas']
+        self.ncs_criticas_ativas = ncs['criticas_ativas']
+        self.ncs_por_severidade = {
+            'critica': ncs['critica'],
+            'alta': ncs['alta'],
+            'media': ncs['media'],
+            'baixa': ncs['baixa'],
+        }
+        self.ncs_7_dias = ncs['dias_7']
+        self.ncs_14_dias = ncs['dias_14']
+        self.ncs_30_dias = ncs['dias_30']
+
+        # HACCP (conformidade e desvios por janela)
+        nao_conforme = Q(conforme=False)
+        haccp = RegistroHACCP.objects.filter(
+            cervejaria=cervejaria
+        ).aggregate(
+            total=Count('id'),
+            nao_conformes=Count('id', filter=nao_conforme),
+            desvios_7=Count('id', filter=nao_conforme & Q(data_hora__gte=periodo_7)),
+            desvios_14=Count('id', filter=nao_conforme & Q(data_hora__gte=periodo_14, data_hora__lt=periodo_7)),
+            desvios_30=Count('id', filter=nao_conforme & Q(data_hora__gte=periodo_30, data_hora__lt=periodo_14)),
+        )
+        self.total_registros_haccp = haccp['total']
+        self.registros_nao_conformes = haccp['nao_conformes']
+        self.registros_conformes = haccp['total'] - haccp['nao_conformes']
+        self.desvios_7_dias = haccp['desvios_7']
+        self.desvios_14_dias = haccp['desvios_14']
+        self.desvios_30_dias = haccp['desvios_30']
+
+        # Ações corretivas (CAPA)
+        capas = AcaoCorretiva.objects.filter(
+            nc__cervejaria=cervejaria
+        ).aggregate(
+            pendentes=Count('id', filter=Q(status__in=STATUS_CAPA_PENDENTES)),
+            concluidas=Count('id', filter=Q(status='concluida')),
+        )
+        self.capas_pendentes = capas['pendentes']
+        self.capas_concluidas = capas['concluidas']
+
+    @property
+    def tendencia_nc(self):
+        """Compara os últimos 7 dias com os 7 dias anteriores"""
+        if self.ncs_7_dias > self.ncs_14_dias:
+            return 'crescente'
+        if self.ncs_7_dias < self.ncs_14_dias:
+            return 'decrescente'
+        return 'estável'
+
+    @property
+    def tendencia_haccp(self):
+        """Compara desvios HACCP dos últimos 7 dias com os 7 dias anteriores"""
+        if self.desvios_7_dias > self.desvios_14_dias:
+            return 'piorando'
+        if self.desvios_7_dias < self.desvios_14_dias:
+            return 'melhorando'
+        return 'estável'
+
+    @property
+    def taxa_conformidade_haccp(self):
+        """Percentual de registros HACCP dentro dos limites"""
+        if self.total_registros_haccp == 0:
+            return 0
+        return (self.registros_conformes / self.total_registros_haccp) * 100
+
+    @property
+    def progresso_em_andamento(self):
+        """Percentual das etapas concluídas nas execuções em progresso"""
+        if self.total_etapas_em_progresso == 0:
+            return 0
+        return (self.etapas_concluidas_em_progresso / self.total_etapas_em_progresso) * 100
+
+    @property
+    def taxa_conformidade_geral(self):
+        """Percentual de execuções sem NC ativa"""
+        if self.total_execucoes == 0:
+            return 0
+        return ((self.total_execucoes - self.ncs_ativas) / self.total_execucoes) * 100
+
+    def como_contexto(self):
+        """Retorna as métricas com os nomes usados no template do dashboard"""
+        return {
+            'total_processos': self.total_processos,
+            'total_execucoes': self.total_execucoes,
+            'execucoes_concluidas': self.execucoes_concluidas,
+            'execucoes_em_progresso': self.execucoes_por_status['em_progresso'],
+            'progresso_em_andamento': self.progresso_em_andamento,
+            'processos_com_nc': self.ncs_ativas,
+            'total_registros_haccp': self.total_registros_haccp,
+            'registros_nao_conformes': self.registros_nao_conformes,
+            'ncs_ativas': self.ncs_ativas,
+            'ncs_criticas_ativas': self.ncs_criticas_ativas,
+            'capas_pendentes': self.capas_pendentes,
+            'capas_concluidas': self.capas_concluidas,
+            # Tendências
+            'ncs_7_dias': self.ncs_7_dias,
+            'ncs_14_dias': self.ncs_14_dias,
+            'ncs_30_dias': self.ncs_30_dias,
+            'tendencia_nc': self.tendencia_nc,
+            'ncs_critica': self.ncs_por_severidade['critica'],
+            'ncs_alta': self.ncs_por_severidade['alta'],
+            'ncs_media': self.ncs_por_severidade['media'],
+            'ncs_baixa': self.ncs_por_severidade['baixa'],
+            'desvios_7_dias': self.desvios_7_dias,
+            'desvios_14_dias': self.desvios_14_dias,
+            'desvios_30_dias': self.desvios_30_dias,
+            'tendencia_haccp': self.tendencia_haccp,
+            'taxa_conformidade_haccp': self.taxa_conformidade_haccp,
+            'taxa_conformidade_geral': self.taxa_conformidade_geral,
+        }
+
+
+def calcular_metricas_dashboard(cervejaria):
+    """
+    Métricas do dashboard de uma cervejaria, em cache por versão dos dados e
+    dia (como os gráficos): a página e os gráficos carregados depois dela
+    (um endpoint por gráfico) compartilham um único cálculo.
+    """
+    from .cache_graficos import versao_dados
+
+    timeout = getattr(settings, 'GRAFICOS_CACHE_TIMEOUT', 300)
+    if not timeout:
+        return MetricasDashboard(cervejaria)
+
+    chave = f'brewtab:metricas:{cervejaria.id}:{versao_dados(cervejaria.id)}:{timezone.localdate().isoformat()}'
+    metricas = cache.get(chave)
+    if metricas is None:
+        metricas = MetricasDashboard(cervejaria)
+        cache.set(chave, metricas, timeout)
+    return metricas
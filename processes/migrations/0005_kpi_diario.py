@@ -0,0 +1,107 @@
+# Generated by Django 4.2 on 2026-10-18 00:54
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def preencher_kpis(apps, schema_editor):
+    """
+    Consolida o histórico existente: uma consulta agrupada por (cervejaria,
+    dia local) para cada tabela de origem
+    """
+    ExecutacaoProcesso = apps.get_model('processes', 'ExecutacaoProcesso')
+    RegistroHACCP = apps.get_model('processes', 'RegistroHACCP')
+    NaoConformidade = apps.get_model('processes', 'NaoConformidade')
+    AcaoCorretiva = apps.get_model('processes', 'AcaoCorretiva')
+    KPIDiario = apps.get_model('processes', 'KPIDiario')
+    fuso = timezone.get_current_timezone()
+
+    def por_dia(linhas, campo_cervejaria, campo_data, **contagens):
+        linhas = linhas.annotate(dia=TruncDate(campo_data, tzinfo=fuso)).order_by().values(
+            campo_cervejaria, 'dia'
+        ).annotate(**contagens)
+        return [(linha.pop(campo_cervejaria), linha.pop('dia'), linha) for linha in linhas]
+
+    consultas = [
+        por_dia(
+            ExecutacaoProcesso.objects.all(), 'processo__cervejaria_id', 'data_inicio',
+            execucoes=Count('id', distinct=True),
+            execucoes_sem_nc=Count('id', distinct=True, filter=Q(nc_geradas__isnull=True)),
+        ),
+        por_dia(
+            RegistroHACCP.objects.all(), 'execucao__processo__cervejaria_id', 'data_hora',
+            haccp_conformes=Count('id', filter=Q(conforme=True)),
+            haccp_nao_conformes=Count('id', filter=Q(conforme=False)),
+        ),
+        por_dia(
+            NaoConformidade.objects.all(), 'cervejaria_id', 'data_criacao',
+            ncs_total=Count('id'),
+            ncs_baixa=Count('id', filter=Q(severidade='baixa')),
+            ncs_media=Count('id', filter=Q(severidade='media')),
+            ncs_alta=Count('id', filter=Q(severidade='alta')),
+            ncs_criticas=Count('id', filter=Q(severidade='critica')),
+            ncs_abertas=Count('id', filter=Q(status='aberta')),
+            ncs_em_analise=Count('id', filter=Q(status='em_analise')),
+            ncs_em_correcao=Count('id', filter=Q(status='em_correcao')),
+            ncs_fechadas=Count('id', filter=Q(status='fechada')),
+        ),
+        por_dia(
+            AcaoCorretiva.objects.all(), 'nc__cervejaria_id', 'data_criacao',
+            capas_total=Count('id'),
+            capas_concluidas=Count('id', filter=Q(status='concluida')),
+        ),
+    ]
+
+    linhas = {}
+    for consulta in consultas:
+        for cervejaria_id, dia, valores in consulta:
+            linhas.setdefault((cervejaria_id, dia), {}).update(valores)
+    KPIDiario.objects.bulk_create([
+        KPIDiario(cervejaria_id=cervejaria_id, data=dia, **valores)
+        for (cervejaria_id, dia), valores in linhas.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('brewery', '0001_initial'),
+        ('processes', '0004_sessao_temporaria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KPIDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField(verbose_name='Data')),
+                ('execucoes', models.IntegerField(default=0, verbose_name='Execuções')),
+                ('execucoes_sem_nc', models.IntegerField(default=0, verbose_name='Execuções sem NC')),
+                ('haccp_conformes', models.IntegerField(default=0, verbose_name='Registros HACCP Conformes')),
+                ('haccp_nao_conformes', models.IntegerField(default=0, verbose_name='Registros HACCP Não Conformes')),
+                ('ncs_total', models.IntegerField(default=0, verbose_name='NCs')),
+                ('ncs_baixa', models.IntegerField(default=0, verbose_name='NCs Baixas')),
+                ('ncs_media', models.IntegerField(default=0, verbose_name='NCs Médias')),
+                ('ncs_alta', models.IntegerField(default=0, verbose_name='NCs Altas')),
+                ('ncs_criticas', models.IntegerField(default=0, verbose_name='NCs Críticas')),
+                ('ncs_abertas', models.IntegerField(default=0, verbose_name='NCs Abertas')),
+                ('ncs_em_analise', models.IntegerField(default=0, verbose_name='NCs Em Análise')),
+                ('ncs_em_correcao', models.IntegerField(default=0, verbose_name='NCs Em Correção')),
+                ('ncs_fechadas', models.IntegerField(default=0, verbose_name='NCs Fechadas')),
+                ('capas_total', models.IntegerField(default=0, verbose_name='CAPAs')),
+                ('capas_concluidas', models.IntegerField(default=0, verbose_name='CAPAs Concluídas')),
+                ('atualizado_em', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('cervejaria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='kpis_diarios', to='brewery.brewery', verbose_name='Cervejaria')),
+            ],
+            options={
+                'verbose_name': 'KPI Diário',
+                'verbose_name_plural': 'KPIs Diários',
+                'ordering': ['-data'],
+                'unique_together': {('cervejaria', 'data')},
+            },
+        ),
+        migrations.RunPython(preencher_kpis, migrations.RunPython.noop),
+    ]
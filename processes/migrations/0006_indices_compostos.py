@@ -0,0 +1,87 @@
+# Generated by Django 4.2 on 2026-10-18 02:10
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def preencher_cervejaria(apps, schema_editor):
+    """Copia a cervejaria do processo para execuções e registros HACCP existentes"""
+    Processo = apps.get_model('processes', 'Processo')
+    ExecutacaoProcesso = apps.get_model('processes', 'ExecutacaoProcesso')
+    RegistroHACCP = apps.get_model('processes', 'RegistroHACCP')
+
+    ExecutacaoProcesso.objects.update(cervejaria_id=Subquery(
+        Processo.objects.filter(id=OuterRef('processo_id')).values('cervejaria_id')[:1]
+    ))
+    RegistroHACCP.objects.update(cervejaria_id=Subquery(
+        ExecutacaoProcesso.objects.filter(id=OuterRef('execucao_id')).values('cervejaria_id')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('brewery', '0001_initial'),
+        ('processes', '0005_kpi_diario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='executacaoprocesso',
+            name='cervejaria',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='execucoes', to='brewery.brewery', verbose_name='Cervejaria'),
+        ),
+        migrations.AddField(
+            model_name='registrohaccp',
+            name='cervejaria',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='registros_haccp', to='brewery.brewery', verbose_name='Cervejaria'),
+        ),
+        migrations.RunPython(preencher_cervejaria, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='executacaoprocesso',
+            name='cervejaria',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='execucoes', to='brewery.brewery', verbose_name='Cervejaria'),
+        ),
+        migrations.AlterField(
+            model_name='registrohaccp',
+            name='cervejaria',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='registros_haccp', to='brewery.brewery', verbose_name='Cervejaria'),
+        ),
+        migrations.AddIndex(
+            model_name='executacaoprocesso',
+            index=models.Index(fields=['cervejaria', 'status'], name='exec_cervejaria_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='executacaoprocesso',
+            index=models.Index(fields=['cervejaria', 'data_inicio'], name='exec_cervejaria_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='executacaoprocesso',
+            index=models.Index(fields=['processo', 'data_inicio'], name='exec_processo_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historicoexecucao',
+            index=models.Index(fields=['execucao', 'data_hora'], name='hist_execucao_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registrohaccp',
+            index=models.Index(fields=['cervejaria', 'data_hora', 'conforme'], name='haccp_cervejaria_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='naoconformidade',
+            index=models.Index(fields=['cervejaria', 'data_criacao'], name='nc_cervejaria_criacao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='naoconformidade',
+            index=models.Index(fields=['cervejaria', 'status', 'data_criacao'], name='nc_cervejaria_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='naoconformidade',
+            index=models.Index(fields=['cervejaria', 'severidade', 'data_criacao'], name='nc_cervejaria_sev_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='meta',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['cervejaria', 'criado_em'], name='meta_ativas_idx'),
+        ),
+    ]
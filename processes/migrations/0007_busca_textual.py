@@ -0,0 +1,45 @@
+from django.db import migrations
+
+
+TABELA = 'processes_busca'
+
+# Triggers mantidos por processes/busca.py (processes_busca_<tipo>_<ai|au|ad>)
+TRIGGERS = [
+    f'{TABELA}_{tipo}_{sufixo}'
+    for tipo in ('nc', 'capa', 'historico', 'etapa')
+    for sufixo in ('ai', 'au', 'ad')
+]
+
+
+def criar_indice(apps, schema_editor):
+    """
+    Cria a tabela FTS5. Os triggers e a carga dos registros existentes ficam
+    com o post_migrate (ver processes/busca.py), depois de todas as migrações
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    # remove_diacritics: "temperatura alta" encontra "Temperátura ALTA"
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA} USING fts5('
+        'cervejaria_id UNINDEXED, tipo UNINDEXED, destino_id UNINDEXED, data UNINDEXED, titulo, conteudo, '
+        "tokenize = 'unicode61 remove_diacritics 2')"
+    )
+
+
+def remover_indice(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for trigger in TRIGGERS:
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    schema_editor.execute(f'DROP TABLE IF EXISTS {TABELA}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processes', '0006_indices_compostos'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice, remover_indice),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-18 01:15
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processes', '0007_busca_textual'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='registrohaccp',
+            name='data_hora',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Data/Hora do Registro'),
+        ),
+    ]
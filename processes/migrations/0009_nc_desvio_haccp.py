@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-18 01:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processes', '0008_registro_haccp_data_hora_medicao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='naoconformidade',
+            name='leituras_fora_limite',
+            field=models.PositiveIntegerField(default=0, verbose_name='Leituras Fora do Limite'),
+        ),
+        migrations.AddField(
+            model_name='naoconformidade',
+            name='ponto_critico',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='nao_conformidades', to='processes.pontocriticohaccp', verbose_name='Ponto Crítico (desvio HACCP)'),
+        ),
+        migrations.AddField(
+            model_name='naoconformidade',
+            name='ultimo_desvio',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Último Desvio'),
+        ),
+    ]
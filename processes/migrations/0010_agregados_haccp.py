@@ -0,0 +1,58 @@
+# Generated by Django 4.2 on 2026-10-18 01:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def preencher_agregados(apps, schema_editor):
+    """Agrega as leituras já existentes"""
+    from processes.agregados_haccp import reconstruir_agregados
+    reconstruir_agregados(conexao=schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('brewery', '0001_initial'),
+        ('processes', '0009_nc_desvio_haccp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgregadoHACCP',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolucao', models.CharField(choices=[('minuto', 'Minuto'), ('hora', 'Hora'), ('dia', 'Dia')], max_length=10, verbose_name='Resolução')),
+                ('inicio', models.DateTimeField(verbose_name='Início do Intervalo')),
+                ('quantidade', models.PositiveIntegerField(verbose_name='Leituras')),
+                ('soma', models.FloatField(verbose_name='Soma dos Valores')),
+                ('minimo', models.FloatField(verbose_name='Valor Mínimo')),
+                ('maximo', models.FloatField(verbose_name='Valor Máximo')),
+                ('nao_conformes', models.PositiveIntegerField(default=0, verbose_name='Leituras Não Conformes')),
+            ],
+            options={
+                'verbose_name': 'Agregado HACCP',
+                'verbose_name_plural': 'Agregados HACCP',
+                'ordering': ['ponto_critico', 'resolucao', 'inicio'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='registrohaccp',
+            index=models.Index(fields=['ponto_critico', 'data_hora'], name='haccp_ponto_data_idx'),
+        ),
+        migrations.AddField(
+            model_name='agregadohaccp',
+            name='cervejaria',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='agregados_haccp', to='brewery.brewery', verbose_name='Cervejaria'),
+        ),
+        migrations.AddField(
+            model_name='agregadohaccp',
+            name='ponto_critico',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='agregados', to='processes.pontocriticohaccp', verbose_name='Ponto Crítico'),
+        ),
+        migrations.AddConstraint(
+            model_name='agregadohaccp',
+            constraint=models.UniqueConstraint(fields=('ponto_critico', 'resolucao', 'inicio'), name='agregado_haccp_unico'),
+        ),
+        migrations.RunPython(preencher_agregados, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 4.2 on 2026-10-18 01:31
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def recontar(apps, schema_editor):
+    """Preenche os contadores das execuções já existentes (um UPDATE com subconsultas)"""
+    ExecutacaoProcesso = apps.get_model('processes', 'ExecutacaoProcesso')
+    ExecucaoEtapa = apps.get_model('processes', 'ExecucaoEtapa')
+    RegistroHACCP = apps.get_model('processes', 'RegistroHACCP')
+
+    def contagem(modelo, filtro=None):
+        linhas = modelo.objects.filter(execucao=OuterRef('pk')).order_by().values('execucao').annotate(
+            total=Count('id', filter=filtro)
+        ).values('total')
+        return Coalesce(Subquery(linhas, output_field=IntegerField()), 0)
+
+    def ultima(modelo, campo):
+        return modelo.objects.filter(execucao=OuterRef('pk')).order_by().values('execucao').annotate(
+            ultima=Max(campo)
+        ).values('ultima')
+
+    ExecutacaoProcesso.objects.update(
+        total_etapas=contagem(ExecucaoEtapa),
+        etapas_concluidas=contagem(ExecucaoEtapa, Q(concluida=True)),
+        leituras_conformes=contagem(RegistroHACCP, Q(conforme=True)),
+        leituras_nao_conformes=contagem(RegistroHACCP, Q(conforme=False)),
+        # Greatest do SQLite devolve NULL se algum argumento for NULL
+        ultima_atividade=Greatest(
+            'data_inicio',
+            Coalesce('data_conclusao', 'data_inicio'),
+            Coalesce(Subquery(ultima(ExecucaoEtapa, 'data_conclusao')), 'data_inicio'),
+            Coalesce(Subquery(ultima(RegistroHACCP, 'data_hora')), 'data_inicio'),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('processes', '0010_agregados_haccp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='executacaoprocesso',
+            name='etapas_concluidas',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Etapas Concluídas'),
+        ),
+        migrations.AddField(
+            model_name='executacaoprocesso',
+            name='leituras_conformes',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Leituras HACCP Conformes'),
+        ),
+        migrations.AddField(
+            model_name='executacaoprocesso',
+            name='leituras_nao_conformes',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Leituras HACCP Não Conformes'),
+        ),
+        migrations.AddField(
+            model_name='executacaoprocesso',
+            name='total_etapas',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Total de Etapas'),
+        ),
+        migrations.AddField(
+            model_name='executacaoprocesso',
+            name='ultima_atividade',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Última Atividade'),
+        ),
+        migrations.RunPython(recontar, migrations.RunPython.noop),
+    ]
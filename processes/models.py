@@ -1,8 +1,26 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 from brewery.models import Brewery
 
 
+class CervejariaQuerySet(models.QuerySet):
+    """
+    Consultas restritas a uma cervejaria (ou às cervejarias de um usuário).
+    O caminho até a cervejaria vem do atributo campo_cervejaria do modelo
+    (padrão: o FK cervejaria).
+    """
+
+    def _campo(self):
+        return getattr(self.model, 'campo_cervejaria', 'cervejaria')
+
+    def for_brewery(self, cervejaria):
+        return self.filter(**{self._campo(): cervejaria})
+
+    def for_user(self, usuario):
+        return self.filter(**{f'{self._campo()}__owner': usuario})
+
+
 class Processo(models.Model):
     CATEGORIAS = [
         ('producao', 'Produção'),
@@ -18,6 +36,8 @@ class Processo(models.Model):
     criado_em = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
     atualizado_em = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
 
+    objects = CervejariaQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Processo'
         verbose_name_plural = 'Processos'
@@ -36,6 +56,9 @@ class EtapaProcesso(models.Model):
     criado_em = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
     atualizado_em = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
 
+    campo_cervejaria = 'processo__cervejaria'
+    objects = CervejariaQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Etapa do Processo'
         verbose_name_plural = 'Etapas do Processo'
@@ -58,19 +81,47 @@ class ExecutacaoProcesso(models.Model):
     ]
 
     processo = models.ForeignKey(Processo, on_delete=models.CASCADE, related_name='execucoes', verbose_name='Processo')
+    # Cópia de processo.cervejaria, para filtrar por cervejaria sem JOIN
+    cervejaria = models.ForeignKey(Brewery, on_delete=models.CASCADE, related_name='execucoes', editable=False, verbose_name='Cervejaria')
     usuario = models.ForeignKey(User, on_delete=models.PROTECT, verbose_name='Usuário que Iniciou')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='nao_iniciada', verbose_name='Status')
     data_inicio = models.DateTimeField(auto_now_add=True, verbose_name='Data de Início')
     data_conclusao = models.DateTimeField(null=True, blank=True, verbose_name='Data de Conclusão')
     observacoes = models.TextField(blank=True, verbose_name='Observações Gerais')
+    # Contadores mantidos com F() junto da conclusão de etapas e da gravação de leituras
+    # (execucoes.py, ingestao_haccp.py, signals.py); o comando recontar_execucoes corrige desvios
+    total_etapas = models.IntegerField(default=0, editable=False, verbose_name='Total de Etapas')
+    etapas_concluidas = models.IntegerField(default=0, editable=False, verbose_name='Etapas Concluídas')
+    leituras_conformes = models.IntegerField(default=0, editable=False, verbose_name='Leituras HACCP Conformes')
+    leituras_nao_conformes = models.IntegerField(default=0, editable=False, verbose_name='Leituras HACCP Não Conformes')
+    ultima_atividade = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='Última Atividade')
     
+    objects = CervejariaQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Execução de Processo'
         verbose_name_plural = 'Execuções de Processo'
         ordering = ['-data_inicio']
+        indexes = [
+            models.Index(fields=['cervejaria', 'status'], name='exec_cervejaria_status_idx'),
+            models.Index(fields=['cervejaria', 'data_inicio'], name='exec_cervejaria_inicio_idx'),
+            models.Index(fields=['processo', 'data_inicio'], name='exec_processo_inicio_idx'),
+        ]
     
     def __str__(self):
         return f"{self.processo.nome} - {self.get_status_display()} ({self.data_inicio.strftime('%d/%m/%Y %H:%M')})"
+    
+    @property
+    def progresso(self):
+        """Percentual de etapas concluídas"""
+        if not self.total_etapas:
+            return 0
+        return self.etapas_concluidas / self.total_etapas * 100
+    
+    def save(self, *args, **kwargs):
+        if self.cervejaria_id is None:
+            self.cervejaria_id = self.processo.cervejaria_id
+        super().save(*args, **kwargs)
 
 
 class ExecucaoEtapa(models.Model):
@@ -81,6 +132,9 @@ class ExecucaoEtapa(models.Model):
     data_conclusao = models.DateTimeField(null=True, blank=True, verbose_name='Data de Conclusão')
     observacoes = models.TextField(blank=True, verbose_name='Observações da Etapa')
     
+    campo_cervejaria = 'execucao__cervejaria'
+    objects = CervejariaQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Execução de Etapa'
         verbose_name_plural = 'Execuções de Etapasscii'
@@ -101,10 +155,16 @@ class HistoricoExecucao(models.Model):
     descricao = models.TextField(blank=True, verbose_name='Descrição da Mudança')
     data_hora = models.DateTimeField(auto_now_add=True, verbose_name='Data/Hora')
     
+    campo_cervejaria = 'execucao__cervejaria'
+    objects = CervejariaQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Histórico de Execução'
         verbose_name_plural = 'Históricos de Execução'
         ordering = ['-data_hora']
+        indexes = [
+            models.Index(fields=['execucao', 'data_hora'], name='hist_execucao_data_idx'),
+        ]
     
     def __str__(self):
         return f"{self.execucao} - {self.acao} ({self.data_hora.strftime('%d/%m/%Y %H:%M')})"
@@ -135,6 +195,9 @@ class PontoCriticoHACCP(models.Model):
     responsavel = models.ForeignKey(User, on_delete=models.PROTECT, verbose_name='Responsável')
     criado_em = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
     
+    campo_cervejaria = 'processo__cervejaria'
+    objects = CervejariaQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Ponto Crítico HACCP'
         verbose_name_plural = 'Pontos Críticos HACCP'
@@ -148,20 +211,77 @@ class RegistroHACCP(models.Model):
     """Registro de um ponto crítico monitorado durante execução"""
     execucao = models.ForeignKey(ExecutacaoProcesso, on_delete=models.CASCADE, related_name='registros_haccp', verbose_name='Execução')
     ponto_critico = models.ForeignKey(PontoCriticoHACCP, on_delete=models.CASCADE, related_name='registros', verbose_name='Ponto Crítico')
+    # Cópia de execucao.cervejaria, para agregações sem o JOIN execução → processo
+    cervejaria = models.ForeignKey(Brewery, on_delete=models.CASCADE, related_name='registros_haccp', editable=False, verbose_name='Cervejaria')
     valor_medido = models.FloatField(verbose_name='Valor Medido')
     conforme = models.BooleanField(verbose_name='Conforme Limite?')
     usuario = models.ForeignKey(User, on_delete=models.PROTECT, verbose_name='Usuário que Registrou')
-    data_hora = models.DateTimeField(auto_now_add=True, verbose_name='Data/Hora do Registro')
+    # Horário da medição (informado pela sonda na ingestão em lote)
+    data_hora = models.DateTimeField(default=timezone.now, verbose_name='Data/Hora do Registro')
     observacoes = models.TextField(blank=True, verbose_name='Observações')
     
+    objects = CervejariaQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Registro HACCP'
         verbose_name_plural = 'Registros HACCP'
         ordering = ['-data_hora']
+        indexes = [
+            # conforme no fim: as contagens por conformidade são respondidas só pelo índice
+            # (o Django gera "WHERE NOT conforme", que não usa índice como igualdade)
+            models.Index(fields=['cervejaria', 'data_hora', 'conforme'], name='haccp_cervejaria_data_idx'),
+            # Série de um ponto crítico em um intervalo (gráficos)
+            models.Index(fields=['ponto_critico', 'data_hora'], name='haccp_ponto_data_idx'),
+        ]
     
     def __str__(self):
         status = '✓' if self.conforme else '✗'
         return f"{status} {self.ponto_critico.nome}: {self.valor_medido} {self.ponto_critico.unidade}"
+    
+    def save(self, *args, **kwargs):
+        if self.cervejaria_id is None:
+            self.cervejaria_id = self.execucao.cervejaria_id
+        super().save(*args, **kwargs)
+
+
+class AgregadoHACCP(models.Model):
+    """
+    Resumo das leituras de um ponto crítico por minuto, hora ou dia (UTC),
+    mantido a cada gravação (ver agregados_haccp.py) para os gráficos
+    """
+    RESOLUCAO_CHOICES = [
+        ('minuto', 'Minuto'),
+        ('hora', 'Hora'),
+        ('dia', 'Dia'),
+    ]
+
+    ponto_critico = models.ForeignKey(PontoCriticoHACCP, on_delete=models.CASCADE, related_name='agregados', verbose_name='Ponto Crítico')
+    cervejaria = models.ForeignKey(Brewery, on_delete=models.CASCADE, related_name='agregados_haccp', editable=False, verbose_name='Cervejaria')
+    resolucao = models.CharField(max_length=10, choices=RESOLUCAO_CHOICES, verbose_name='Resolução')
+    inicio = models.DateTimeField(verbose_name='Início do Intervalo')
+    quantidade = models.PositiveIntegerField(verbose_name='Leituras')
+    soma = models.FloatField(verbose_name='Soma dos Valores')
+    minimo = models.FloatField(verbose_name='Valor Mínimo')
+    maximo = models.FloatField(verbose_name='Valor Máximo')
+    nao_conformes = models.PositiveIntegerField(default=0, verbose_name='Leituras Não Conformes')
+
+    objects = CervejariaQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Agregado HACCP'
+        verbose_name_plural = 'Agregados HACCP'
+        ordering = ['ponto_critico', 'resolucao', 'inicio']
+        constraints = [
+            # Também é o índice das consultas por intervalo
+            models.UniqueConstraint(fields=['ponto_critico', 'resolucao', 'inicio'], name='agregado_haccp_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.ponto_critico.nome} ({self.resolucao} {self.inicio:%d/%m/%Y %H:%M}): {self.media:.2f}"
+
+    @property
+    def media(self):
+        return self.soma / self.quantidade if self.quantidade else 0
 
 
 # ===== ETAPA 6: NÃO CONFORMIDADES =====
@@ -191,11 +311,22 @@ class NaoConformidade(models.Model):
     usuario_criacao = models.ForeignKey(User, on_delete=models.PROTECT, related_name='ncs_criadas', verbose_name='Usuário que Criou')
     data_criacao = models.DateTimeField(auto_now_add=True, verbose_name='Data de Criação')
     data_fechamento = models.DateTimeField(null=True, blank=True, verbose_name='Data de Fechamento')
+    # Preenchidos nas NCs abertas automaticamente por leituras HACCP fora do limite
+    ponto_critico = models.ForeignKey(PontoCriticoHACCP, null=True, blank=True, on_delete=models.SET_NULL, related_name='nao_conformidades', verbose_name='Ponto Crítico (desvio HACCP)')
+    leituras_fora_limite = models.PositiveIntegerField(default=0, verbose_name='Leituras Fora do Limite')
+    ultimo_desvio = models.DateTimeField(null=True, blank=True, verbose_name='Último Desvio')
     
+    objects = CervejariaQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Não Conformidade'
         verbose_name_plural = 'Não Conformidades'
         ordering = ['-data_criacao', '-severidade']
+        indexes = [
+            models.Index(fields=['cervejaria', 'data_criacao'], name='nc_cervejaria_criacao_idx'),
+            models.Index(fields=['cervejaria', 'status', 'data_criacao'], name='nc_cervejaria_status_idx'),
+            models.Index(fields=['cervejaria', 'severidade', 'data_criacao'], name='nc_cervejaria_sev_idx'),
+        ]
     
     def __str__(self):
         return f"NC-{self.id}: {self.titulo} ({self.get_severidade_display()})"
@@ -222,6 +353,9 @@ class AcaoCorretiva(models.Model):
     resultado = models.TextField(blank=True, verbose_name='Resultado da Implementação')
     data_criacao = models.DateTimeField(auto_now_add=True, verbose_name='Data de Criação')
     
+    campo_cervejaria = 'nc__cervejaria'
+    objects = CervejariaQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Ação Corretiva (CAPA)'
         verbose_name_plural = 'Ações Corretivas (CAPA)'
@@ -267,6 +401,8 @@ class KPIExercicio(models.Model):
     criado_em = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
     atualizado_em = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
     
+    objects = CervejariaQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'KPI do Exercício'
         verbose_name_plural = 'KPIs dos Exercícios'
@@ -275,6 +411,48 @@ class KPIExercicio(models.Model):
         return f"KPI {self.cervejaria.name} ({self.data_inicio.strftime('%d/%m/%Y')} a {self.data_fim.strftime('%d/%m/%Y')})"
 
 
+class KPIDiario(models.Model):
+    """Consolidação diária dos indicadores de uma cervejaria (mantida em kpi_diario.py)"""
+    cervejaria = models.ForeignKey(Brewery, on_delete=models.CASCADE, related_name='kpis_diarios', verbose_name='Cervejaria')
+    data = models.DateField(verbose_name='Data')
+
+    # Execuções iniciadas no dia
+    execucoes = models.IntegerField(default=0, verbose_name='Execuções')
+    execucoes_sem_nc = models.IntegerField(default=0, verbose_name='Execuções sem NC')
+
+    # Registros HACCP do dia
+    haccp_conformes = models.IntegerField(default=0, verbose_name='Registros HACCP Conformes')
+    haccp_nao_conformes = models.IntegerField(default=0, verbose_name='Registros HACCP Não Conformes')
+
+    # NCs criadas no dia (status atual)
+    ncs_total = models.IntegerField(default=0, verbose_name='NCs')
+    ncs_baixa = models.IntegerField(default=0, verbose_name='NCs Baixas')
+    ncs_media = models.IntegerField(default=0, verbose_name='NCs Médias')
+    ncs_alta = models.IntegerField(default=0, verbose_name='NCs Altas')
+    ncs_criticas = models.IntegerField(default=0, verbose_name='NCs Críticas')
+    ncs_abertas = models.IntegerField(default=0, verbose_name='NCs Abertas')
+    ncs_em_analise = models.IntegerField(default=0, verbose_name='NCs Em Análise')
+    ncs_em_correcao = models.IntegerField(default=0, verbose_name='NCs Em Correção')
+    ncs_fechadas = models.IntegerField(default=0, verbose_name='NCs Fechadas')
+
+    # CAPAs criadas no dia
+    capas_total = models.IntegerField(default=0, verbose_name='CAPAs')
+    capas_concluidas = models.IntegerField(default=0, verbose_name='CAPAs Concluídas')
+
+    atualizado_em = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
+
+    objects = CervejariaQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'KPI Diário'
+        verbose_name_plural = 'KPIs Diários'
+        ordering = ['-data']
+        unique_together = ('cervejaria', 'data')
+
+    def __str__(self):
+        return f"KPI {self.cervejaria.name} ({self.data.strftime('%d/%m/%Y')})"
+
+
 # ===== METAS / OBJETIVOS =====
 
 class Meta(models.Model):
@@ -299,10 +477,15 @@ class Meta(models.Model):
     criado_em = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
     atualizado_em = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
 
+    objects = CervejariaQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Meta'
         verbose_name_plural = 'Metas'
         ordering = ['-criado_em']
+        indexes = [
+            models.Index(fields=['cervejaria', 'criado_em'], condition=models.Q(ativo=True), name='meta_ativas_idx'),
+        ]
 
     def __str__(self):
         percentual = (float(self.valor_atual) / float(self.valor_meta) * 100) if self.valor_meta else 0
@@ -0,0 +1,128 @@
+"""
+Paginação por cursor (keyset) para listagens grandes
+
+Em vez de OFFSET (que percorre todas as linhas anteriores), cada página
+filtra a partir da última linha exibida usando a mesma ordenação de um
+índice, ex.: (processo, data_inicio) + id. O custo de uma página não
+depende de quantas linhas existem antes dela.
+
+O cursor é o valor dos campos de ordenação da linha de borda, em JSON
+codificado em base64 (seguro para URL).
+"""
+import base64
+import binascii
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import QueryDict
+
+
+POR_PAGINA_PADRAO = 25
+
+
+def codificar_cursor(valores):
+    texto = json.dumps([valor.isoformat() if hasattr(valor, 'isoformat') else valor for valor in valores])
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor, campos):
+    """Converte o cursor de volta para os tipos dos campos; None se for inválido"""
+    try:
+        preenchimento = '=' * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + preenchimento))
+        if not isinstance(valores, list) or len(valores) != len(campos):
+            return None
+        return [campo.to_python(valor) for campo, valor in zip(campos, valores)]
+    except (binascii.Error, ValueError, ValidationError, TypeError):
+        return None
+
+
+def _filtro_apos(ordenacao, valores, invertido=False):
+    """
+    Q das linhas que vêm depois de `valores` na ordenação. Para (-a, -id):
+    a <= v1 AND (a < v1 OR id < v2), forma que o SQLite resolve pelo índice.
+    """
+    filtro = Q()
+    for posicao in range(len(ordenacao) - 1, -1, -1):
+        nome = ordenacao[posicao].lstrip('-')
+        decrescente = ordenacao[posicao].startswith('-') != invertido
+        valor = valores[posicao]
+        estrito = Q(**{f'{nome}__{"lt" if decrescente else "gt"}': valor})
+        if posicao == len(ordenacao) - 1:
+            filtro = estrito
+        else:
+            amplo = Q(**{f'{nome}__{"lte" if decrescente else "gte"}': valor})
+            filtro = amplo & (estrito | filtro)
+    return filtro
+
+
+class PaginaKeyset:
+    """Uma página de resultados com os cursores para navegar"""
+
+    def __init__(self, itens, ordenacao, tem_proxima, tem_anterior, parametros):
+        self.itens = itens
+        self.tem_proxima = tem_proxima
+        self.tem_anterior = tem_anterior
+
+        campos = [nome.lstrip('-') for nome in ordenacao]
+        self.cursor_proximo = (
+            codificar_cursor([getattr(itens[-1], campo) for campo in campos]) if tem_proxima else None
+        )
+        self.cursor_anterior = (
+            codificar_cursor([getattr(itens[0], campo) for campo in campos]) if tem_anterior else None
+        )
+
+        # Query strings prontas para os links, preservando os filtros atuais
+        self.query_proxima = self._query(parametros, 'depois', self.cursor_proximo)
+        self.query_anterior = self._query(parametros, 'antes', self.cursor_anterior)
+        self.query_primeira = self._query(parametros, None, None)
+
+    @staticmethod
+    def _query(parametros, chave, cursor):
+        parametros = parametros.copy()
+        parametros.pop('depois', None)
+        parametros.pop('antes', None)
+        if chave and cursor:
+            parametros[chave] = cursor
+        return parametros.urlencode()
+
+    def __iter__(self):
+        return iter(self.itens)
+
+    def __len__(self):
+        return len(self.itens)
+
+    def __bool__(self):
+        return bool(self.itens)
+
+
+def paginar_keyset(queryset, ordenacao, parametros=None, por_pagina=POR_PAGINA_PADRAO):
+    """
+    Pagina `queryset` pela `ordenacao` (ex.: ['-data_inicio', '-id'], o último
+    campo deve ser único). `parametros` é o request.GET: os cursores são lidos
+    de 'depois' (próxima página) ou 'antes' (página anterior).
+    """
+    if parametros is None:
+        parametros = QueryDict()
+    modelo = queryset.model
+    campos = [modelo._meta.get_field(nome.lstrip('-')) for nome in ordenacao]
+    invertida = [nome[1:] if nome.startswith('-') else f'-{nome}' for nome in ordenacao]
+
+    depois = decodificar_cursor(parametros['depois'], campos) if parametros.get('depois') else None
+    antes = decodificar_cursor(parametros['antes'], campos) if parametros.get('antes') else None
+
+    if antes is not None:
+        # Página anterior: percorre na ordem inversa e depois desinverte
+        itens = list(queryset.filter(_filtro_apos(ordenacao, antes, invertido=True)).order_by(*invertida)[:por_pagina + 1])
+        tem_anterior = len(itens) > por_pagina
+        itens = itens[:por_pagina][::-1]
+        tem_proxima = True
+    else:
+        if depois is not None:
+            queryset = queryset.filter(_filtro_apos(ordenacao, depois))
+        itens = list(queryset.order_by(*ordenacao)[:por_pagina + 1])
+        tem_proxima = len(itens) > por_pagina
+        itens = itens[:por_pagina]
+        tem_anterior = depois is not None
+
+    return PaginaKeyset(itens, ordenacao, tem_proxima and bool(itens), tem_anterior and bool(itens), parametros)
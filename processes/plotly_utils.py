@@ -1,11 +1,13 @@
 """Utilitários para geração de gráficos Plotly"""
 import json
-from datetime import datetime, timedelta
-import plotly.graph_objects as go
+from datetime import datetime
 from django.db.models import Count, Q
-from django.utils import timezone
+from .figuras import figura_json, barra, pizza, dispersao, indicador
+from .series_temporais import serie_temporal, rotulos_serie
+from .cache_graficos import grafico_em_cache
 
 
+@grafico_em_cache
 def gerar_grafico_metas_comparacao(cervejaria):
     """
     Gera gráfico Plotly comparando Valor Atual vs Meta para todas as metas.
@@ -22,12 +24,13 @@ def gerar_grafico_metas_comparacao(cervejaria):
     valores_atuais = [float(meta.valor_atual) for meta in metas]
     valores_metas = [float(meta.valor_meta) for meta in metas]
     
-    fig = go.Figure(data=[
-        go.Bar(name='Valor Atual', x=nomes, y=valores_atuais, marker_color='#2ecc71'),
-        go.Bar(name='Meta', x=nomes, y=valores_metas, marker_color='#3498db')
-    ])
+    dados = [
+        barra(name='Valor Atual', x=nomes, y=valores_atuais, marker_color='#2ecc71'),
+        barra(name='Meta', x=nomes, y=valores_metas, marker_color='#3498db')
+    ]
     
-    fig.update_layout(
+    return figura_json(
+        dados,
         title='Comparação: Valor Atual vs Meta',
         xaxis_title='Metas',
         yaxis_title='Valor',
@@ -37,10 +40,9 @@ def gerar_grafico_metas_comparacao(cervejaria):
         height=400,
         margin=dict(l=50, r=50, t=60, b=50)
     )
-    
-    return json.dumps(fig.to_dict())
 
 
+@grafico_em_cache
 def gerar_grafico_metas_progresso(cervejaria):
     """
     Gera gráfico de barra horizontal mostrando % de progresso de cada meta.
@@ -56,8 +58,8 @@ def gerar_grafico_metas_progresso(cervejaria):
     percentuais = [meta.percentual_conclusao() for meta in metas]
     cores = ['#2ecc71' if p >= 100 else '#f39c12' if p >= 50 else '#e74c3c' for p in percentuais]
     
-    fig = go.Figure(data=[
-        go.Bar(
+    dados = [
+        barra(
             y=nomes,
             x=percentuais,
             orientation='h',
@@ -65,9 +67,10 @@ def gerar_grafico_metas_progresso(cervejaria):
             text=[f'{p:.1f}%' for p in percentuais],
             textposition='auto',
         )
-    ])
+    ]
     
-    fig.update_layout(
+    return figura_json(
+        dados,
         title='Progresso das Metas (%)',
         xaxis_title='Percentual de Conclusão (%)',
         xaxis=dict(range=[0, 120]),
@@ -77,18 +80,21 @@ def gerar_grafico_metas_progresso(cervejaria):
         height=300 + (len(metas) * 40),
         margin=dict(l=200, r=50, t=60, b=50)
     )
-    
-    return json.dumps(fig.to_dict())
 
 
-def gerar_grafico_nc_por_severidade(cervejaria):
+@grafico_em_cache
+def gerar_grafico_nc_por_severidade(cervejaria, metricas=None):
     """
     Gera gráfico de pizza mostrando distribuição de NCs por severidade.
+    Reaproveita as contagens de `metricas` (MetricasDashboard) quando informado.
     """
-    from .models import NaoConformidade
+    from .metricas_dashboard import calcular_metricas_dashboard
+    
+    if metricas is None:
+        metricas = calcular_metricas_dashboard(cervejaria)
     
     severidades = {
-        'crítica': 'Crítica',
+        'critica': 'Crítica',
         'alta': 'Alta',
         'media': 'Média',
         'baixa': 'Baixa'
@@ -96,17 +102,14 @@ def gerar_grafico_nc_por_severidade(cervejaria):
     
     dados = []
     cores_map = {
-        'crítica': '#dc3545',
+        'critica': '#dc3545',
         'alta': '#ff6b6b',
         'media': '#ffc107',
         'baixa': '#28a745'
     }
     
     for key, label in severidades.items():
-        count = NaoConformidade.objects.filter(
-            cervejaria=cervejaria,
-            severidade=key
-        ).count()
+        count = metricas.ncs_por_severidade[key]
         if count > 0:
             dados.append({
                 'severity': label,
@@ -121,84 +124,120 @@ def gerar_grafico_nc_por_severidade(cervejaria):
     values = [d['count'] for d in dados]
     colors = [d['color'] for d in dados]
     
-    fig = go.Figure(data=[go.Pie(labels=labels, values=values, marker=dict(colors=colors))])
-    
-    fig.update_layout(
+    return figura_json(
+        [pizza(labels=labels, values=values, marker=dict(colors=colors))],
         title='Não Conformidades por Severidade',
         hovermode='closest',
         template='plotly_white',
         height=400,
         margin=dict(l=50, r=50, t=60, b=50)
     )
-    
-    return json.dumps(fig.to_dict())
 
 
-def gerar_grafico_nc_tendencia(cervejaria):
-    """
-    Gera gráfico de linha mostrando tendência de NCs nos últimos 30 dias.
-    """
-    from .models import NaoConformidade
-    
-    hoje = timezone.now()
-    historico = []
-    
-    for i in range(29, -1, -1):
-        data = (hoje - timedelta(days=i)).date()
-        count = NaoConformidade.objects.filter(
-            cervejaria=cervejaria,
-            data_criacao__date=data
-        ).count()
-        historico.append({'data': data, 'count': count})
-    
-    datas = [h['data'].strftime('%d/%m') for h in historico]
-    counts = [h['count'] for h in historico]
-    
-    fig = go.Figure(data=[
-        go.Scatter(
-            x=datas,
-            y=counts,
+def _grafico_tendencia(serie, granularidade, titulo, nome, cor, yaxis_title):
+    """Monta o gráfico de linha padrão para uma série de serie_temporal()"""
+    dados = [
+        dispersao(
+            x=rotulos_serie(serie, granularidade),
+            y=[total for _, total in serie],
             mode='lines+markers',
-            name='NCs por Dia',
-            line=dict(color='#e74c3c', width=2),
+            name=nome,
+            line=dict(color=cor, width=2),
             marker=dict(size=6)
         )
-    ])
+    ]
     
-    fig.update_layout(
-        title='Tendência de Não Conformidades (Últimos 30 dias)',
+    return figura_json(
+        dados,
+        title=titulo,
         xaxis_title='Data',
-        yaxis_title='Quantidade de NCs',
+        yaxis_title=yaxis_title,
         hovermode='x unified',
         template='plotly_white',
         height=350,
         margin=dict(l=50, r=50, t=60, b=50)
     )
+
+
+@grafico_em_cache
+def gerar_grafico_nc_tendencia(cervejaria, dias=30, granularidade='dia'):
+    """
+    Gera gráfico de linha mostrando tendência de NCs nos últimos `dias` dias.
+    """
+    from .models import NaoConformidade
     
-    return json.dumps(fig.to_dict())
+    serie = serie_temporal(
+        NaoConformidade.objects.filter(cervejaria=cervejaria),
+        'data_criacao', dias, granularidade
+    )
+    
+    return _grafico_tendencia(
+        serie, granularidade,
+        titulo=f'Tendência de Não Conformidades (Últimos {dias} dias)',
+        nome='NCs por Período',
+        cor='#e74c3c',
+        yaxis_title='Quantidade de NCs'
+    )
 
 
-def gerar_grafico_haccp_conformidade(cervejaria):
+@grafico_em_cache
+def gerar_grafico_haccp_desvios_tendencia(cervejaria, dias=30, granularidade='dia'):
     """
-    Gera gráfico de gauge mostrando taxa de conformidade HACCP.
+    Gera gráfico de linha com os registros HACCP fora de limite por período.
     """
     from .models import RegistroHACCP
     
-    total = RegistroHACCP.objects.filter(
-        execucao__processo__cervejaria=cervejaria
-    ).count()
+    serie = serie_temporal(
+        RegistroHACCP.objects.filter(cervejaria=cervejaria, conforme=False),
+        'data_hora', dias, granularidade
+    )
     
-    if total == 0:
-        return json.dumps({})
+    return _grafico_tendencia(
+        serie, granularidade,
+        titulo=f'Desvios HACCP (Últimos {dias} dias)',
+        nome='Desvios por Período',
+        cor='#e67e22',
+        yaxis_title='Registros fora de limite'
+    )
+
+
+@grafico_em_cache
+def gerar_grafico_execucoes_tendencia(cervejaria, dias=30, granularidade='dia'):
+    """
+    Gera gráfico de linha com as execuções de processos iniciadas por período.
+    """
+    from .models import ExecutacaoProcesso
+    
+    serie = serie_temporal(
+        ExecutacaoProcesso.objects.filter(cervejaria=cervejaria),
+        'data_inicio', dias, granularidade
+    )
+    
+    return _grafico_tendencia(
+        serie, granularidade,
+        titulo=f'Execuções Iniciadas (Últimos {dias} dias)',
+        nome='Execuções por Período',
+        cor='#3498db',
+        yaxis_title='Quantidade de Execuções'
+    )
+
+
+@grafico_em_cache
+def gerar_grafico_haccp_conformidade(cervejaria, metricas=None):
+    """
+    Gera gráfico de gauge mostrando taxa de conformidade HACCP.
+    """
+    from .metricas_dashboard import calcular_metricas_dashboard
+    
+    if metricas is None:
+        metricas = calcular_metricas_dashboard(cervejaria)
     
-    conformes = RegistroHACCP.objects.filter(
-        execucao__processo__cervejaria=cervejaria,
-        conforme=True
-    ).count()
+    if metricas.total_registros_haccp == 0:
+        return json.dumps({})
     
-    percentual = (conformes / total) * 100
+    percentual = metricas.taxa_conformidade_haccp
     
-    fig = go.Figure(data=[go.Indicator(
+    dados = [indicador(
         mode='gauge+number+delta',
         value=percentual,
         domain={'x': [0, 1], 'y': [0, 1]},
@@ -217,22 +256,25 @@ def gerar_grafico_haccp_conformidade(cervejaria):
                 'value': 80
             }
         }
-    )])
+    )]
     
-    fig.update_layout(
+    return figura_json(
+        dados,
         height=350,
         margin=dict(l=50, r=50, t=60, b=50),
         template='plotly_white'
     )
-    
-    return json.dumps(fig.to_dict())
 
 
-def gerar_grafico_execucoes_status(cervejaria):
+@grafico_em_cache
+def gerar_grafico_execucoes_status(cervejaria, metricas=None):
     """
     Gera gráfico mostrando status das execuções de processos.
     """
-    from .models import ExecutacaoProcesso
+    from .metricas_dashboard import calcular_metricas_dashboard
+    
+    if metricas is None:
+        metricas = calcular_metricas_dashboard(cervejaria)
     
     status_choices = {
         'nao_iniciada': 'Não Iniciada',
@@ -250,15 +292,13 @@ def gerar_grafico_execucoes_status(cervejaria):
     }
     
     for status_key, status_label in status_choices.items():
-        count = ExecutacaoProcesso.objects.filter(
-            processo__cervejaria=cervejaria,
-            status=status_key
-        ).count()
+        count = metricas.execucoes_por_status[status_key]
         if count > 0:
             dados.append({
                 'status': status_label,
                 'count': count,
-                'color': cores_status[status_key]
+                'color': cores_status[status_key],
+                'detalhe': f'{metricas.progresso_em_andamento:.0f}% das etapas concluídas' if status_key == 'em_progresso' else '',
             })
     
     if not dados:
@@ -267,20 +307,19 @@ def gerar_grafico_execucoes_status(cervejaria):
     labels = [d['status'] for d in dados]
     values = [d['count'] for d in dados]
     colors = [d['color'] for d in dados]
+    detalhes = [d['detalhe'] for d in dados]
     
-    fig = go.Figure(data=[go.Pie(labels=labels, values=values, marker=dict(colors=colors))])
-    
-    fig.update_layout(
+    return figura_json(
+        [pizza(labels=labels, values=values, marker=dict(colors=colors), hovertext=detalhes, hoverinfo='label+value+percent+text')],
         title='Status das Execuções de Processos',
         hovermode='closest',
         template='plotly_white',
         height=400,
         margin=dict(l=50, r=50, t=60, b=50)
     )
-    
-    return json.dumps(fig.to_dict())
 
 
+@grafico_em_cache
 def gerar_grafico_dre_receita_custos(cervejaria, periodo_dias=30):
     """
     Gera gráfico para DRE mostrando Receita vs Custos (mock data).
@@ -293,15 +332,16 @@ def gerar_grafico_dre_receita_custos(cervejaria, periodo_dias=30):
     valores = [100000, 45000, 25000, 30000]
     cores = ['#2ecc71', '#e74c3c', '#f39c12', '#3498db']
     
-    fig = go.Figure(data=[go.Bar(
+    dados = [barra(
         x=categorias,
         y=valores,
         marker=dict(color=cores),
         text=[f'R$ {v:,.0f}' for v in valores],
         textposition='auto',
-    )])
+    )]
     
-    fig.update_layout(
+    return figura_json(
+        dados,
         title=f'DRE - Últimos {periodo_dias} dias',
         yaxis_title='Valor (R$)',
         hovermode='x unified',
@@ -309,10 +349,9 @@ def gerar_grafico_dre_receita_custos(cervejaria, periodo_dias=30):
         height=400,
         margin=dict(l=50, r=50, t=60, b=50)
     )
-    
-    return json.dumps(fig.to_dict())
 
 
+@grafico_em_cache
 def gerar_grafico_dre_metas_vs_real(cervejaria):
     """
     Gera gráfico para DRE comparando Metas vs Valores Reais.
@@ -332,12 +371,13 @@ def gerar_grafico_dre_metas_vs_real(cervejaria):
     valores_reais = [float(meta.valor_atual) for meta in metas]
     valores_metas = [float(meta.valor_meta) for meta in metas]
     
-    fig = go.Figure(data=[
-        go.Bar(name='Valor Real (R$)', x=nomes, y=valores_reais, marker_color='#2ecc71'),
-        go.Bar(name='Meta (R$)', x=nomes, y=valores_metas, marker_color='#3498db')
-    ])
+    dados = [
+        barra(name='Valor Real (R$)', x=nomes, y=valores_reais, marker_color='#2ecc71'),
+        barra(name='Meta (R$)', x=nomes, y=valores_metas, marker_color='#3498db')
+    ]
     
-    fig.update_layout(
+    return figura_json(
+        dados,
         title='DRE: Valores Reais vs Metas Orçamentárias',
         xaxis_title='Categorias',
         yaxis_title='Valor (R$)',
@@ -347,76 +387,55 @@ def gerar_grafico_dre_metas_vs_real(cervejaria):
         height=400,
         margin=dict(l=50, r=50, t=60, b=50)
     )
-    
-    return json.dumps(fig.to_dict())
 
 
-def gerar_grafico_kpi_resumo(cervejaria):
+@grafico_em_cache
+def gerar_grafico_kpi_resumo(cervejaria, metricas=None):
     """
     Gera gráfico com KPIs principais em formato de cards (via Plotly Indicator).
     """
-    from .models import ExecutacaoProcesso, NaoConformidade, RegistroHACCP
-    
-    total_exec = ExecutacaoProcesso.objects.filter(
-        processo__cervejaria=cervejaria
-    ).count()
-    
-    exec_concluidas = ExecutacaoProcesso.objects.filter(
-        processo__cervejaria=cervejaria,
-        status='concluida'
-    ).count()
-    
-    ncs_ativas = NaoConformidade.objects.filter(
-        cervejaria=cervejaria,
-        status__in=['aberta', 'em_analise', 'em_correcao']
-    ).count()
-    
-    registros_haccp = RegistroHACCP.objects.filter(
-        execucao__processo__cervejaria=cervejaria
-    ).count()
-    
-    conformes = RegistroHACCP.objects.filter(
-        execucao__processo__cervejaria=cervejaria,
-        conforme=True
-    ).count()
-    
-    taxa_haccp = (conformes / registros_haccp * 100) if registros_haccp > 0 else 0
-    
-    fig = go.Figure()
-    
-    fig.add_trace(go.Indicator(
-        mode='number',
-        value=total_exec,
-        title={'text': 'Total Execuções'},
-        domain={'x': [0, 0.25], 'y': [0.6, 1]}
-    ))
-    
-    fig.add_trace(go.Indicator(
-        mode='number',
-        value=exec_concluidas,
-        title={'text': 'Execuções Concluídas'},
-        domain={'x': [0.25, 0.5], 'y': [0.6, 1]}
-    ))
-    
-    fig.add_trace(go.Indicator(
-        mode='number',
-        value=ncs_ativas,
-        title={'text': 'NCs Ativas'},
-        domain={'x': [0.5, 0.75], 'y': [0.6, 1]}
-    ))
-    
-    fig.add_trace(go.Indicator(
-        mode='number+gauge',
-        value=taxa_haccp,
-        title={'text': 'Taxa HACCP (%)'},
-        gauge={'axis': {'range': [0, 100]}},
-        domain={'x': [0.75, 1], 'y': [0.6, 1]}
-    ))
-    
-    fig.update_layout(
+    from .metricas_dashboard import calcular_metricas_dashboard
+    
+    if metricas is None:
+        metricas = calcular_metricas_dashboard(cervejaria)
+    
+    total_exec = metricas.total_execucoes
+    exec_concluidas = metricas.execucoes_concluidas
+    ncs_ativas = metricas.ncs_ativas
+    taxa_haccp = metricas.taxa_conformidade_haccp
+    
+    dados = [
+        indicador(
+            mode='number',
+            value=total_exec,
+            title={'text': 'Total Execuções'},
+            domain={'x': [0, 0.25], 'y': [0.6, 1]}
+        ),
+        indicador(
+            mode='number',
+            value=exec_concluidas,
+            title={'text': 'Execuções Concluídas'},
+            domain={'x': [0.25, 0.5], 'y': [0.6, 1]}
+        ),
+        indicador(
+            mode='number',
+            value=ncs_ativas,
+            title={'text': 'NCs Ativas'},
+            domain={'x': [0.5, 0.75], 'y': [0.6, 1]}
+        ),
+        indicador(
+            mode='number+gauge',
+            value=taxa_haccp,
+            title={'text': 'Taxa HACCP (%)'},
+            gauge={'axis': {'range': [0, 100]}},
+            domain={'x': [0.75, 1], 'y': [0.6, 1]}
+        ),
+    ]
+    
+    return figura_json(
+        dados,
         height=200,
         margin=dict(l=20, r=20, t=40, b=20),
         template='plotly_white'
     )
-    
-    return json.dumps(fig.to_dict())
+
@@ -0,0 +1,131 @@
+"""
+Exclusão em massa dos dados de cervejarias (modo de dados temporários)
+
+Em vez do cascade do ORM, que carrega cada Processo, Etapa, Execução e
+Registro em memória para emitir sinais, o grafo inteiro de uma ou mais
+cervejarias é removido com DELETEs em SQL, das tabelas folha até
+brewery_brewery, dentro de uma única transação.
+
+Os sinais de post_delete (KPIs e cache de gráficos) não são disparados:
+as cervejarias deixam de existir e seus ids não são reutilizados.
+"""
+from django.db import connection, transaction
+
+from brewery.models import Brewery
+from processes.models import (
+    AcaoCorretiva, AgregadoHACCP, EtapaProcesso, ExecucaoEtapa, ExecutacaoProcesso,
+    HistoricoExecucao, KPIDiario, KPIExercicio, Meta, NaoConformidade,
+    PontoCriticoHACCP, Processo, RegistroHACCP, SessaoTemporaria,
+)
+
+# Limite de parâmetros por comando (o SQLite antigo aceita até 999)
+TAMANHO_LOTE = 500
+
+
+def _tabela(modelo):
+    return connection.ops.quote_name(modelo._meta.db_table)
+
+
+def _plano(ids):
+    """
+    Comandos (modelo, sql) na ordem de exclusão. `ids` é o trecho SQL com a
+    lista de ids das cervejarias, ou None para excluir todas as linhas.
+    """
+    if ids is None:
+        return [(modelo, f'DELETE FROM {_tabela(modelo)}') for modelo in (
+            AcaoCorretiva, NaoConformidade, RegistroHACCP, AgregadoHACCP, HistoricoExecucao,
+            ExecucaoEtapa, ExecutacaoProcesso, PontoCriticoHACCP, EtapaProcesso,
+            Processo, Meta, KPIDiario, KPIExercicio, SessaoTemporaria, Brewery,
+        )]
+
+    processos = f'SELECT id FROM {_tabela(Processo)} WHERE cervejaria_id IN ({ids})'
+    etapas = f'SELECT id FROM {_tabela(EtapaProcesso)} WHERE processo_id IN ({processos})'
+    execucoes = f'SELECT id FROM {_tabela(ExecutacaoProcesso)} WHERE processo_id IN ({processos})'
+    pontos_criticos = f'SELECT id FROM {_tabela(PontoCriticoHACCP)} WHERE processo_id IN ({processos})'
+    ncs = f'SELECT id FROM {_tabela(NaoConformidade)} WHERE cervejaria_id IN ({ids})'
+
+    return [
+        (AcaoCorretiva, f'DELETE FROM {_tabela(AcaoCorretiva)} WHERE nc_id IN ({ncs})'),
+        (NaoConformidade, f'DELETE FROM {_tabela(NaoConformidade)} WHERE cervejaria_id IN ({ids})'),
+        # NCs de outras cervejarias não podem apontar para execuções excluídas (SET_NULL)
+        (None, f'UPDATE {_tabela(NaoConformidade)} SET execucao_id = NULL WHERE execucao_id IN ({execucoes})'),
+        (RegistroHACCP, f'DELETE FROM {_tabela(RegistroHACCP)} '
+                        f'WHERE execucao_id IN ({execucoes}) OR ponto_critico_id IN ({pontos_criticos})'),
+        (AgregadoHACCP, f'DELETE FROM {_tabela(AgregadoHACCP)} '
+                        f'WHERE cervejaria_id IN ({ids}) OR ponto_critico_id IN ({pontos_criticos})'),
+        # Idem para NCs automáticas apontando para pontos críticos excluídos
+        (None, f'UPDATE {_tabela(NaoConformidade)} SET ponto_critico_id = NULL WHERE ponto_critico_id IN ({pontos_criticos})'),
+        (HistoricoExecucao, f'DELETE FROM {_tabela(HistoricoExecucao)} WHERE execucao_id IN ({execucoes})'),
+        (ExecucaoEtapa, f'DELETE FROM {_tabela(ExecucaoEtapa)} '
+                        f'WHERE execucao_id IN ({execucoes}) OR etapa_id IN ({etapas})'),
+        (ExecutacaoProcesso, f'DELETE FROM {_tabela(ExecutacaoProcesso)} WHERE processo_id IN ({processos})'),
+        (PontoCriticoHACCP, f'DELETE FROM {_tabela(PontoCriticoHACCP)} '
+                            f'WHERE processo_id IN ({processos}) OR etapa_id IN ({etapas})'),
+        (EtapaProcesso, f'DELETE FROM {_tabela(EtapaProcesso)} WHERE processo_id IN ({processos})'),
+        (Processo, f'DELETE FROM {_tabela(Processo)} WHERE cervejaria_id IN ({ids})'),
+        (Meta, f'DELETE FROM {_tabela(Meta)} WHERE cervejaria_id IN ({ids})'),
+        (KPIDiario, f'DELETE FROM {_tabela(KPIDiario)} WHERE cervejaria_id IN ({ids})'),
+        (KPIExercicio, f'DELETE FROM {_tabela(KPIExercicio)} WHERE cervejaria_id IN ({ids})'),
+        # A sessão é mantida (para ser marcada como limpa), apenas desvinculada
+        (None, f'UPDATE {_tabela(SessaoTemporaria)} SET cervejaria_id = NULL WHERE cervejaria_id IN ({ids})'),
+        (Brewery, f'DELETE FROM {_tabela(Brewery)} WHERE id IN ({ids})'),
+    ]
+
+
+def _executar(cursor, plano, lote, totais):
+    """Executa o plano; os ids do lote se repetem em cada subconsulta"""
+    for modelo, sql in plano:
+        repeticoes = sql.count('%s') // len(lote) if lote else 0
+        cursor.execute(sql, lote * repeticoes)
+        if modelo is not None:
+            tabela = modelo._meta.db_table
+            totais[tabela] = totais.get(tabela, 0) + max(cursor.rowcount, 0)
+
+
+def purgar_cervejarias(ids_cervejarias):
+    """
+    Exclui as cervejarias e todos os dados ligados a elas.
+    Retorna {tabela: linhas excluídas}, na ordem de exclusão.
+    """
+    ids_cervejarias = list(ids_cervejarias)
+    totais = {}
+    if not ids_cervejarias:
+        return totais
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        for inicio in range(0, len(ids_cervejarias), TAMANHO_LOTE):
+            lote = ids_cervejarias[inicio:inicio + TAMANHO_LOTE]
+            _executar(cursor, _plano(', '.join(['%s'] * len(lote))), lote, totais)
+    return totais
+
+
+def purgar_usuario(usuario):
+    """Exclui as cervejarias de um usuário (o usuário e sua sessão são mantidos)"""
+    ids = Brewery.objects.filter(owner=usuario).values_list('id', flat=True)
+    return purgar_cervejarias(ids)
+
+
+def purgar_tudo(preservar_superusuarios=True):
+    """
+    Limpeza completa em uma única passagem, incluindo todas as sessões
+    temporárias. Sem cervejarias de superusuários a preservar, cada tabela é
+    esvaziada com DELETE sem WHERE (estilo truncate) e o arquivo do banco é
+    compactado com VACUUM, para que a verificação de tamanho não volte a
+    disparar a limpeza.
+    """
+    cervejarias = Brewery.objects.all()
+    if preservar_superusuarios and cervejarias.filter(owner__is_superuser=True).exists():
+        ids = cervejarias.filter(owner__is_superuser=False).values_list('id', flat=True)
+        with transaction.atomic(), connection.cursor() as cursor:
+            totais = purgar_cervejarias(ids)
+            _executar(cursor, [(SessaoTemporaria, f'DELETE FROM {_tabela(SessaoTemporaria)}')], [], totais)
+        return totais
+
+    totais = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        _executar(cursor, _plano(None), [], totais)
+
+    if connection.vendor == 'sqlite' and not connection.in_atomic_block:
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM')
+    return totais
@@ -0,0 +1,39 @@
+"""
+Resumo operacional por cervejaria (lista e detalhe de cervejarias)
+
+NCs ativas, execuções em andamento e pontos críticos de cada cervejaria são
+anotados no próprio queryset de Brewery com subconsultas correlacionadas
+COUNT(*), cobertas pelos índices (cervejaria, status) de NCs e execuções:
+a lista inteira sai em uma única consulta, qualquer que seja o número de
+cervejarias.
+"""
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .metricas_dashboard import STATUS_NC_ATIVAS
+from .models import ExecutacaoProcesso, NaoConformidade, PontoCriticoHACCP
+
+
+def _contagem(linhas, campo):
+    """Subconsulta correlacionada COUNT(*) das `linhas` da cervejaria (via `campo`)"""
+    linhas = (
+        linhas
+        .filter(**{campo: OuterRef('pk')})
+        .order_by()
+        .values(campo)
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    return Coalesce(Subquery(linhas, output_field=IntegerField()), 0)
+
+
+def anotar_resumo(cervejarias):
+    """
+    Anota o queryset de Brewery com ncs_abertas (NCs ativas),
+    execucoes_em_andamento e total_pontos (pontos críticos HACCP)
+    """
+    return cervejarias.annotate(
+        ncs_abertas=_contagem(NaoConformidade.objects.filter(status__in=STATUS_NC_ATIVAS), 'cervejaria'),
+        execucoes_em_andamento=_contagem(ExecutacaoProcesso.objects.filter(status='em_progresso'), 'cervejaria'),
+        total_pontos=_contagem(PontoCriticoHACCP.objects.all(), 'processo__cervejaria'),
+    )
@@ -0,0 +1,85 @@
+"""
+Agrupamento de registros em séries temporais (dia/semana/mês)
+
+Uma única consulta TruncDate/TruncWeek/TruncMonth + GROUP BY, no fuso de
+TIME_ZONE (America/Sao_Paulo), completada com zeros para os períodos sem
+registros. Janelas de 30, 90 ou 365 dias custam a mesma consulta.
+"""
+from datetime import datetime, time, timedelta
+from django.db.models import Count, DateField
+from django.db.models.functions import TruncDate, TruncWeek, TruncMonth
+from django.utils import timezone
+
+
+GRANULARIDADES = {
+    'dia': TruncDate,
+    'semana': TruncWeek,
+    'mes': TruncMonth,
+}
+
+FORMATOS_ROTULO = {
+    'dia': '%d/%m',
+    'semana': '%d/%m',
+    'mes': '%m/%Y',
+}
+
+
+def inicio_do_periodo(data, granularidade):
+    """Retorna a data inicial do período (dia, semana ISO ou mês) que contém `data`"""
+    if granularidade == 'semana':
+        return data - timedelta(days=data.weekday())
+    if granularidade == 'mes':
+        return data.replace(day=1)
+    return data
+
+
+def proximo_periodo(data, granularidade):
+    """Retorna a data inicial do período seguinte"""
+    if granularidade == 'semana':
+        return data + timedelta(days=7)
+    if granularidade == 'mes':
+        if data.month == 12:
+            return data.replace(year=data.year + 1, month=1)
+        return data.replace(month=data.month + 1)
+    return data + timedelta(days=1)
+
+
+def serie_temporal(queryset, campo, dias=30, granularidade='dia', agora=None):
+    """
+    Conta os registros de `queryset` por período do campo de data/hora `campo`.
+
+    Retorna uma lista densa de tuplas (data_inicial_do_periodo, quantidade)
+    cobrindo os últimos `dias` dias (incluindo hoje), em ordem cronológica.
+    """
+    if granularidade not in GRANULARIDADES:
+        raise ValueError(f'Granularidade inválida: {granularidade}')
+
+    fuso = timezone.get_current_timezone()
+    agora = agora or timezone.now()
+    hoje = timezone.localdate(agora, fuso)
+    primeiro_dia = hoje - timedelta(days=dias - 1)
+    inicio = timezone.make_aware(datetime.combine(primeiro_dia, time.min), fuso)
+
+    truncar = GRANULARIDADES[granularidade]
+    contagens = (
+        queryset
+        .filter(**{f'{campo}__gte': inicio})
+        .annotate(periodo=truncar(campo, output_field=DateField(), tzinfo=fuso))
+        .order_by()
+        .values('periodo')
+        .annotate(total=Count('pk'))
+    )
+    por_periodo = {linha['periodo']: linha['total'] for linha in contagens}
+
+    serie = []
+    periodo = inicio_do_periodo(primeiro_dia, granularidade)
+    while periodo <= hoje:
+        serie.append((periodo, por_periodo.get(periodo, 0)))
+        periodo = proximo_periodo(periodo, granularidade)
+    return serie
+
+
+def rotulos_serie(serie, granularidade='dia'):
+    """Formata as datas de uma série para uso no eixo X dos gráficos"""
+    formato = FORMATOS_ROTULO[granularidade]
+    return [periodo.strftime(formato) for periodo, _ in serie]
@@ -0,0 +1,101 @@
+"""
+Sinais que mantêm dados derivados atualizados:
+- consolidação diária de KPIs (KPIDiario)
+- versão dos gráficos em cache por cervejaria
+- catálogo de pontos críticos por cervejaria (páginas HACCP e ingestão)
+- NCs automáticas para leituras HACCP fora do limite
+- agregados por minuto/hora/dia das leituras HACCP
+- contadores de progresso e de leituras da execução
+"""
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .agregados_haccp import atualizar_agregados
+from .cache_graficos import agendar_invalidacao
+from .catalogo_haccp import invalidar_catalogo
+from .desvios_haccp import notificar_desvios
+from .execucoes import recontar_execucoes, somar_contadores
+from .kpi_diario import agendar_recalculo
+from .models import EtapaProcesso, ExecucaoEtapa, ExecutacaoProcesso, PontoCriticoHACCP, Processo, RegistroHACCP, NaoConformidade, AcaoCorretiva, Meta
+
+
+@receiver([post_save, post_delete], sender=ExecutacaoProcesso)
+def execucao_alterada(sender, instance, **kwargs):
+    agendar_recalculo(instance.cervejaria_id, instance.data_inicio)
+    agendar_invalidacao(instance.cervejaria_id)
+
+
+@receiver([post_save, post_delete], sender=RegistroHACCP)
+def registro_haccp_alterado(sender, instance, **kwargs):
+    agendar_recalculo(instance.cervejaria_id, instance.data_hora)
+    agendar_invalidacao(instance.cervejaria_id)
+
+    if kwargs.get('created'):
+        atualizar_agregados([instance])
+        notificar_desvios([instance])
+
+    # Contadores da execução: +1/-1 na criação/exclusão, recontagem se o registro for editado
+    campo = 'leituras_conformes' if instance.conforme else 'leituras_nao_conformes'
+    if kwargs.get('created'):
+        somar_contadores(instance.execucao_id, **{campo: 1})
+    elif kwargs['signal'] is post_delete:
+        somar_contadores(instance.execucao_id, atividade=False, **{campo: -1})
+    else:
+        recontar_execucoes(ExecutacaoProcesso.objects.filter(id=instance.execucao_id), etapas=False)
+
+
+@receiver([post_save, post_delete], sender=ExecucaoEtapa)
+def etapa_execucao_alterada(sender, instance, **kwargs):
+    # Caminhos em lote (execucoes.py) não disparam sinais e somam com F(); aqui, edições avulsas (admin)
+    recontar_execucoes(ExecutacaoProcesso.objects.filter(id=instance.execucao_id), leituras=False)
+
+
+@receiver([post_save, post_delete], sender=PontoCriticoHACCP)
+def ponto_critico_alterado(sender, instance, **kwargs):
+    try:
+        invalidar_catalogo(instance.processo.cervejaria_id)
+    except ObjectDoesNotExist:
+        # Excluído junto com o processo: o sinal do processo já descartou o catálogo
+        pass
+
+
+@receiver([post_save, post_delete], sender=Processo)
+def processo_alterado(sender, instance, **kwargs):
+    invalidar_catalogo(instance.cervejaria_id)
+
+
+@receiver([post_save, post_delete], sender=EtapaProcesso)
+def etapa_alterada(sender, instance, **kwargs):
+    try:
+        invalidar_catalogo(instance.processo.cervejaria_id)
+    except ObjectDoesNotExist:
+        pass
+
+
+@receiver([post_save, post_delete], sender=NaoConformidade)
+def nao_conformidade_alterada(sender, instance, **kwargs):
+    agendar_recalculo(instance.cervejaria_id, instance.data_criacao)
+    agendar_invalidacao(instance.cervejaria_id)
+
+    # A execução associada deixa de contar como "sem NC"
+    if instance.execucao_id:
+        try:
+            agendar_recalculo(instance.cervejaria_id, instance.execucao.data_inicio)
+        except ObjectDoesNotExist:
+            pass
+
+
+@receiver([post_save, post_delete], sender=AcaoCorretiva)
+def acao_corretiva_alterada(sender, instance, **kwargs):
+    try:
+        cervejaria_id = instance.nc.cervejaria_id
+    except ObjectDoesNotExist:
+        return
+    agendar_recalculo(cervejaria_id, instance.data_criacao)
+    agendar_invalidacao(cervejaria_id)
+
+
+@receiver([post_save, post_delete], sender=Meta)
+def meta_alterada(sender, instance, **kwargs):
+    agendar_invalidacao(instance.cervejaria_id)
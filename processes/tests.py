@@ -1,3 +1,709 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from unittest import skipUnless
 
-# Create your tests here.
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from .figuras import figura, barra, pizza, dispersao, indicador
+from .models import ExecutacaoProcesso, Meta, NaoConformidade, RegistroHACCP
+
+
+def _cervejaria_haccp(nome, usuario):
+    """Cervejaria com um processo de duas etapas e um ponto crítico (10 a 20 °C) na primeira"""
+    from brewery.models import Brewery
+    from .models import EtapaProcesso, PontoCriticoHACCP, Processo
+
+    cervejaria = Brewery.objects.create(name=nome, owner=usuario)
+    processo = Processo.objects.create(cervejaria=cervejaria, nome='Fermentação', categoria='producao')
+    etapa = EtapaProcesso.objects.create(processo=processo, nome='Inoculação', ordem=1)
+    EtapaProcesso.objects.create(processo=processo, nome='Maturação', ordem=2)
+    ponto = PontoCriticoHACCP.objects.create(
+        processo=processo, etapa=etapa, tipo='temperatura', nome='Temperatura do fermentador',
+        limite_minimo=10, limite_maximo=20, unidade='°C', acao_preventiva='-', acao_corretiva='-',
+        responsavel=usuario
+    )
+    return cervejaria, processo, ponto
+
+
+class FigurasEquivalenciaPlotlyTest(SimpleTestCase):
+    """O JSON de figuras.py deve ser idêntico ao de go.Figure(...).to_dict()"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        import plotly.graph_objects as go
+        cls.go = go
+
+    def assertEquivalente(self, dados, dados_go, **layout):
+        fig = self.go.Figure(data=dados_go)
+        fig.update_layout(**layout)
+        esperado = json.loads(json.dumps(fig.to_dict()))
+        obtido = json.loads(json.dumps(figura(dados, **layout)))
+        self.assertEqual(obtido, esperado)
+
+    def test_barras_agrupadas(self):
+        props = [
+            dict(name='Valor Atual', x=['A', 'B'], y=[1.0, 2.5], marker_color='#2ecc71'),
+            dict(name='Meta', x=['A', 'B'], y=[3.0, 4.0], marker_color='#3498db'),
+        ]
+        self.assertEquivalente(
+            [barra(**p) for p in props],
+            [self.go.Bar(**p) for p in props],
+            title='Comparação', xaxis_title='Metas', yaxis_title='Valor',
+            barmode='group', hovermode='x unified', template='plotly_white',
+            height=400, margin=dict(l=50, r=50, t=60, b=50)
+        )
+
+    def test_barra_horizontal_com_eixo_mesclado(self):
+        props = dict(
+            y=['A'], x=[55.0], orientation='h', marker=dict(color=['#f39c12']),
+            text=['55.0%'], textposition='auto'
+        )
+        self.assertEquivalente(
+            [barra(**props)], [self.go.Bar(**props)],
+            title='Progresso', xaxis_title='Percentual', xaxis=dict(range=[0, 120]),
+            yaxis_title='Metas', hovermode='y unified', template='plotly_white',
+            height=340, margin=dict(l=200, r=50, t=60, b=50)
+        )
+
+    def test_pizza(self):
+        props = dict(labels=['Crítica', 'Alta'], values=[1, 2], marker=dict(colors=['#dc3545', '#ff6b6b']))
+        self.assertEquivalente(
+            [pizza(**props)], [self.go.Pie(**props)],
+            title='NCs', hovermode='closest', template='plotly_white',
+            height=400, margin=dict(l=50, r=50, t=60, b=50)
+        )
+
+    def test_dispersao(self):
+        props = dict(
+            x=['01/10', '02/10'], y=[0, 3], mode='lines+markers', name='NCs',
+            line=dict(color='#e74c3c', width=2), marker=dict(size=6)
+        )
+        self.assertEquivalente(
+            [dispersao(**props)], [self.go.Scatter(**props)],
+            title='Tendência', xaxis_title='Data', yaxis_title='Quantidade',
+            hovermode='x unified', template='plotly_white', height=350,
+            margin=dict(l=50, r=50, t=60, b=50)
+        )
+
+    def test_indicadores(self):
+        props = [
+            dict(mode='number', value=3, title={'text': 'Total'}, domain={'x': [0, 0.25], 'y': [0.6, 1]}),
+            dict(
+                mode='gauge+number+delta', value=66.7, title={'text': 'HACCP'},
+                domain={'x': [0, 1], 'y': [0, 1]},
+                gauge={
+                    'axis': {'range': [None, 100]},
+                    'bar': {'color': '#2ecc71'},
+                    'steps': [{'range': [0, 50], 'color': '#ffe8d6'}],
+                    'threshold': {'line': {'color': 'red', 'width': 4}, 'thickness': 0.75, 'value': 80},
+                }
+            ),
+        ]
+        self.assertEquivalente(
+            [indicador(**p) for p in props],
+            [self.go.Indicator(**p) for p in props],
+            height=200, margin=dict(l=20, r=20, t=40, b=20), template='plotly_white'
+        )
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Os planos conferidos são os do SQLite')
+class IndicesConsultasTest(TestCase):
+    """As consultas do dashboard/DRE devem usar os índices compostos (EXPLAIN QUERY PLAN)"""
+
+    def assertUsaIndice(self, queryset, indice):
+        plano = queryset.explain()
+        self.assertIn(indice, plano, plano)
+
+    def test_registros_haccp_do_dia_sem_join(self):
+        agora = timezone.now()
+        consulta = RegistroHACCP.objects.filter(
+            cervejaria_id=1, data_hora__gte=agora - timedelta(days=1), data_hora__lt=agora
+        )
+        self.assertUsaIndice(consulta, 'haccp_cervejaria_data_idx')
+        self.assertNotIn('processes_processo', consulta.explain())
+
+    def test_conformidade_haccp_coberta_pelo_indice(self):
+        consulta = RegistroHACCP.objects.filter(cervejaria_id=1).values('conforme').order_by()
+        self.assertUsaIndice(consulta, 'COVERING INDEX haccp_cervejaria_data_idx')
+
+    def test_execucoes_por_status_e_periodo(self):
+        self.assertUsaIndice(
+            ExecutacaoProcesso.objects.filter(cervejaria_id=1).values('status').order_by(),
+            'COVERING INDEX exec_cervejaria_status_idx'
+        )
+        self.assertUsaIndice(
+            ExecutacaoProcesso.objects.filter(cervejaria_id=1, data_inicio__gte=timezone.now()),
+            'exec_cervejaria_inicio_idx'
+        )
+
+    def test_nao_conformidades(self):
+        self.assertUsaIndice(
+            NaoConformidade.objects.filter(cervejaria_id=1).order_by('-data_criacao')[:5],
+            'nc_cervejaria_criacao_idx'
+        )
+        self.assertUsaIndice(
+            NaoConformidade.objects.filter(cervejaria_id=1, status='aberta').order_by('-data_criacao'),
+            'nc_cervejaria_status_idx'
+        )
+        self.assertUsaIndice(
+            NaoConformidade.objects.filter(cervejaria_id=1, severidade='critica').order_by('-data_criacao'),
+            'nc_cervejaria_sev_idx'
+        )
+
+    def test_metas_ativas_usam_indice_parcial(self):
+        self.assertUsaIndice(
+            Meta.objects.filter(cervejaria_id=1, ativo=True).order_by('-criado_em'),
+            'meta_ativas_idx'
+        )
+
+
+@skipUnless(connection.vendor == 'sqlite', 'A busca textual usa FTS5 do SQLite')
+class BuscaTextualTest(TestCase):
+    """O índice FTS5 acompanha inserções, bulk_update e exclusões via triggers"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth.models import User
+        from brewery.models import Brewery
+        from .models import EtapaProcesso, Processo
+
+        cls.usuario = User.objects.create_user('busca', password='senha-teste-123')
+        cls.cervejaria = Brewery.objects.create(name='Cervejaria Busca', owner=cls.usuario)
+        cls.outra = Brewery.objects.create(name='Outra', owner=cls.usuario)
+        cls.processo = Processo.objects.create(cervejaria=cls.cervejaria, nome='Brassagem', categoria='producao')
+        EtapaProcesso.objects.create(processo=cls.processo, nome='Fervura', ordem=1)
+
+    def test_nc_sem_acentos_e_escopo_da_cervejaria(self):
+        from .busca import buscar
+        nc = NaoConformidade.objects.create(
+            cervejaria=self.cervejaria, titulo='Temperatura da mostura', descricao='Termômetro descalibrado',
+            usuario_criacao=self.usuario
+        )
+        resultados = buscar(self.cervejaria.id, 'termometro descal')
+        self.assertEqual([(r['tipo'], r['destino_id']) for r in resultados], [('nc', nc.id)])
+        self.assertIn('<mark>', resultados[0]['trecho'])
+        self.assertEqual(buscar(self.outra.id, 'termometro'), [])
+
+        nc.delete()
+        self.assertEqual(buscar(self.cervejaria.id, 'termometro'), [])
+
+    def test_observacoes_gravadas_em_lote(self):
+        from .busca import buscar
+        from .execucoes import concluir_etapas, iniciar_execucao
+        execucao = iniciar_execucao(self.processo, self.usuario)
+        etapa = execucao.etapas_executadas.get()
+        concluir_etapas(execucao, self.usuario, [{'id': etapa.id, 'observacoes': 'Espuma excessiva'}])
+
+        tipos = {r['tipo'] for r in buscar(self.cervejaria.id, 'espuma')}
+        self.assertEqual(tipos, {'etapa'})
+        self.assertEqual({r['tipo'] for r in buscar(self.cervejaria.id, 'concluida')}, {'historico'})
+
+    def test_expressao_do_usuario_nao_e_interpretada(self):
+        from .busca import buscar, montar_consulta
+        self.assertEqual(montar_consulta('ph "alto'), '"ph" """alto"*')
+        self.assertEqual(buscar(self.cervejaria.id, 'OR NEAR( * -'), [])
+
+
+class DesviosHaccpTest(TestCase):
+    """Uma rajada de leituras fora do limite abre uma única NC por execução e ponto crítico"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth.models import User
+        from brewery.models import Brewery
+        from .models import EtapaProcesso, PontoCriticoHACCP, Processo
+
+        cls.usuario = User.objects.create_user('desvios', password='senha-teste-123')
+        cervejaria = Brewery.objects.create(name='Cervejaria Desvios', owner=cls.usuario)
+        processo = Processo.objects.create(cervejaria=cervejaria, nome='Fermentação', categoria='producao')
+        etapa = EtapaProcesso.objects.create(processo=processo, nome='Fermentação', ordem=1)
+        cls.ponto = PontoCriticoHACCP.objects.create(
+            processo=processo, etapa=etapa, tipo='temperatura', nome='Temperatura do fermentador',
+            limite_minimo=10, limite_maximo=20, unidade='°C', acao_preventiva='-', acao_corretiva='Ajustar glicol',
+            responsavel=cls.usuario
+        )
+        cls.execucao = ExecutacaoProcesso.objects.create(processo=processo, usuario=cls.usuario)
+        # Leituras antes do início da execução são trazidas para o início
+        cls.execucao.data_inicio = timezone.now() - timedelta(days=7)
+        cls.execucao.save(update_fields=['data_inicio'])
+
+    def _registrar(self, valores, **extra):
+        from .ingestao_haccp import registrar_leituras
+        with self.settings(HACCP_DESVIOS_EM_SEGUNDO_PLANO=False), self.captureOnCommitCallbacks(execute=True):
+            registrar_leituras(self.execucao, self.usuario, [
+                {'ponto_critico': self.ponto.id, 'valor': valor, **extra} for valor in valores
+            ])
+        return NaoConformidade.objects.filter(ponto_critico=self.ponto)
+
+    def test_rajada_gera_uma_nc(self):
+        ncs = self._registrar([25] * 1000 + [15])
+        self._registrar([30, 5])
+        nc = ncs.get()
+        self.assertEqual(nc.leituras_fora_limite, 1002)
+        self.assertEqual(nc.execucao, self.execucao)
+
+    def test_nova_nc_apenas_apos_fechamento(self):
+        nc = self._registrar([25]).get()
+        nc.status, nc.data_fechamento = 'fechada', timezone.now()
+        nc.save()
+
+        antiga = (timezone.now() - timedelta(hours=1)).isoformat()
+        self.assertEqual(self._registrar([25], data_hora=antiga).count(), 1)
+        self.assertEqual(self._registrar([25]).exclude(status='fechada').count(), 1)
+
+
+class AgregadosHaccpTest(TestCase):
+    """Agregados incrementais iguais aos reconstruídos e série com no máximo MAX_PONTOS"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth.models import User
+        from brewery.models import Brewery
+        from .models import EtapaProcesso, PontoCriticoHACCP, Processo
+
+        cls.usuario = User.objects.create_user('agregados', password='senha-teste-123')
+        cervejaria = Brewery.objects.create(name='Cervejaria Agregados', owner=cls.usuario)
+        processo = Processo.objects.create(cervejaria=cervejaria, nome='Maturação', categoria='producao')
+        etapa = EtapaProcesso.objects.create(processo=processo, nome='Maturação', ordem=1)
+        cls.ponto = PontoCriticoHACCP.objects.create(
+            processo=processo, etapa=etapa, tipo='temperatura', nome='Temperatura do tanque',
+            limite_minimo=0, limite_maximo=4, unidade='°C', acao_preventiva='-', acao_corretiva='-',
+            responsavel=cls.usuario
+        )
+        cls.execucao = ExecutacaoProcesso.objects.create(processo=processo, usuario=cls.usuario)
+        # Leituras antes do início da execução são trazidas para o início
+        cls.execucao.data_inicio = timezone.now() - timedelta(days=7)
+        cls.execucao.save(update_fields=['data_inicio'])
+
+    def test_incremental_igual_reconstrucao(self):
+        from .agregados_haccp import MAX_PONTOS, reconstruir_agregados, serie_ponto_critico
+        from .ingestao_haccp import registrar_leituras
+        from .models import AgregadoHACCP
+
+        agora = timezone.now()
+        with self.settings(HACCP_DESVIOS_EM_SEGUNDO_PLANO=False):
+            registrar_leituras(self.execucao, self.usuario, [
+                {'ponto_critico': self.ponto.id, 'valor': (i % 7) - 1, 'data_hora': (agora - timedelta(seconds=20 * i)).isoformat()}
+                for i in range(5000)
+            ])
+        campos = ('resolucao', 'inicio', 'quantidade', 'minimo', 'maximo', 'nao_conformes')
+        incrementais = sorted(AgregadoHACCP.objects.values_list(*campos))
+        reconstruir_agregados()
+        self.assertEqual(incrementais, sorted(AgregadoHACCP.objects.values_list(*campos)))
+
+        serie = serie_ponto_critico(self.ponto.id, agora - timedelta(days=2), agora + timedelta(seconds=1))
+        self.assertLessEqual(len(serie['x']), MAX_PONTOS)
+        self.assertEqual(min(serie['minimo']), -1)
+        self.assertEqual(max(serie['maximo']), 5)
+
+
+class PurgaDadosTest(TestCase):
+    """A purga em SQL remove o grafo das cervejarias sem deixar chaves órfãs nem documentos na busca"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth.models import User
+        from .execucoes import concluir_etapas, iniciar_execucao
+        from .ingestao_haccp import registrar_leituras
+        from .models import AcaoCorretiva
+
+        cls.usuario = User.objects.create_user('purga', password='senha-teste-123')
+        cls.cervejarias = []
+        for nome in ('Purgada', 'Mantida'):
+            cervejaria, processo, ponto = _cervejaria_haccp(f'Cervejaria {nome}', cls.usuario)
+            execucao = iniciar_execucao(processo, cls.usuario)
+            etapa = execucao.etapas_executadas.order_by('id').first()
+            concluir_etapas(execucao, cls.usuario, [{'id': etapa.id, 'observacoes': 'Espuma excessiva'}])
+            registrar_leituras(execucao, cls.usuario, [{'ponto_critico': ponto.id, 'valor': 15}])
+            nc = NaoConformidade.objects.create(
+                cervejaria=cervejaria, execucao=execucao, titulo='Espuma', descricao='Espuma excessiva',
+                usuario_criacao=cls.usuario
+            )
+            AcaoCorretiva.objects.create(
+                nc=nc, tipo='correcao', descricao='Antiespumante', responsavel=cls.usuario,
+                data_prevista=timezone.localdate()
+            )
+            cls.cervejarias.append((cervejaria, execucao))
+
+        # NC da cervejaria mantida apontando para uma execução da purgada (SET_NULL)
+        cls.nc_cruzada = NaoConformidade.objects.create(
+            cervejaria=cls.cervejarias[1][0], execucao=cls.cervejarias[0][1], titulo='Cruzada', descricao='-',
+            usuario_criacao=cls.usuario
+        )
+
+    def _documentos_busca(self, cervejaria_id=None):
+        from .busca import TABELA
+        sql = f'SELECT COUNT(*) FROM {TABELA}'
+        parametros = []
+        if cervejaria_id is not None:
+            sql += ' WHERE cervejaria_id = %s'
+            parametros.append(cervejaria_id)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, parametros)
+            return cursor.fetchone()[0]
+
+    def test_purgar_cervejaria(self):
+        from brewery.models import Brewery
+        from .models import AcaoCorretiva, ExecucaoEtapa, HistoricoExecucao, Processo
+        from .purga_dados import purgar_cervejarias
+
+        (purgada, _), (mantida, execucao_mantida) = self.cervejarias
+        self.assertGreater(self._documentos_busca(purgada.id), 0)
+
+        totais = purgar_cervejarias([purgada.id])
+
+        # Folhas antes das tabelas referenciadas; a cervejaria por último
+        ordem = list(totais)
+        for filha, mae in [
+            ('processes_acaocorretiva', 'processes_naoconformidade'),
+            ('processes_registrohaccp', 'processes_executacaoprocesso'),
+            ('processes_execucaoetapa', 'processes_etapaprocesso'),
+            ('processes_executacaoprocesso', 'processes_processo'),
+        ]:
+            self.assertLess(ordem.index(filha), ordem.index(mae))
+        self.assertEqual(ordem[-1], 'brewery_brewery')
+        connection.check_constraints()
+
+        self.assertEqual(list(Brewery.objects.values_list('id', flat=True)), [mantida.id])
+        self.assertFalse(Processo.objects.filter(cervejaria=purgada).exists())
+        self.assertFalse(ExecucaoEtapa.objects.exclude(execucao=execucao_mantida).exists())
+        self.assertFalse(HistoricoExecucao.objects.exclude(execucao=execucao_mantida).exists())
+        self.assertEqual(AcaoCorretiva.objects.count(), 1)
+        self.nc_cruzada.refresh_from_db()
+        self.assertIsNone(self.nc_cruzada.execucao_id)
+
+        self.assertEqual(self._documentos_busca(purgada.id), 0)
+        self.assertGreater(self._documentos_busca(mantida.id), 0)
+
+    def test_purgar_tudo(self):
+        from brewery.models import Brewery
+        from .models import ExecucaoEtapa
+        from .purga_dados import purgar_tudo
+
+        purgar_tudo(preservar_superusuarios=False)
+
+        connection.check_constraints()
+        self.assertFalse(Brewery.objects.exists())
+        self.assertFalse(ExecutacaoProcesso.objects.exists())
+        self.assertFalse(ExecucaoEtapa.objects.exists())
+        self.assertFalse(RegistroHACCP.objects.exists())
+        self.assertFalse(NaoConformidade.objects.exists())
+        self.assertEqual(self._documentos_busca(), 0)
+
+
+class ContadoresExecucaoTest(TestCase):
+    """Contadores da execução mantidos nas gravações iguais aos recontados"""
+
+    CAMPOS = ('total_etapas', 'etapas_concluidas', 'leituras_conformes', 'leituras_nao_conformes')
+
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth.models import User
+        cls.usuario = User.objects.create_user('contadores', password='senha-teste-123')
+        _, cls.processo, cls.ponto = _cervejaria_haccp('Cervejaria Contadores', cls.usuario)
+
+    def _contadores(self, execucao):
+        return ExecutacaoProcesso.objects.values_list(*self.CAMPOS).get(id=execucao.id)
+
+    def _recontados(self, execucao):
+        """Zera os contadores, reconta e devolve os valores recontados"""
+        from .execucoes import recontar_execucoes
+        ExecutacaoProcesso.objects.filter(id=execucao.id).update(**dict.fromkeys(self.CAMPOS, 0))
+        recontar_execucoes(ExecutacaoProcesso.objects.filter(id=execucao.id))
+        return self._contadores(execucao)
+
+    def test_conclusao_e_ingestao_em_lote(self):
+        from .execucoes import concluir_etapas, iniciar_execucao
+        from .ingestao_haccp import registrar_leituras
+
+        execucao = iniciar_execucao(self.processo, self.usuario)
+        self.assertEqual(self._contadores(execucao), (2, 0, 0, 0))
+
+        primeira = execucao.etapas_executadas.get(etapa__ordem=1)
+        concluir_etapas(execucao, self.usuario, [{'id': primeira.id}])
+        # Etapa já concluída é ignorada e não conta duas vezes
+        concluir_etapas(execucao, self.usuario, [{'id': primeira.id}])
+        self.assertEqual(self._contadores(execucao), (2, 1, 0, 0))
+
+        with self.settings(HACCP_DESVIOS_EM_SEGUNDO_PLANO=False):
+            registrar_leituras(execucao, self.usuario, [
+                {'ponto_critico': self.ponto.id, 'valor': valor} for valor in (15, 25, 12)
+            ])
+        self.assertEqual(self._contadores(execucao), (2, 1, 2, 1))
+        self.assertEqual(self._recontados(execucao), (2, 1, 2, 1))
+
+    def test_edicoes_avulsas_pelos_sinais(self):
+        from .execucoes import iniciar_execucao
+
+        execucao = iniciar_execucao(self.processo, self.usuario)
+        registro = RegistroHACCP.objects.create(
+            execucao=execucao, ponto_critico=self.ponto, valor_medido=15, conforme=True, usuario=self.usuario
+        )
+        RegistroHACCP.objects.create(
+            execucao=execucao, ponto_critico=self.ponto, valor_medido=30, conforme=False, usuario=self.usuario
+        )
+        self.assertEqual(self._contadores(execucao), (2, 0, 1, 1))
+
+        # Edição muda a conformidade: recontagem da execução
+        registro.valor_medido, registro.conforme = 8, False
+        registro.save()
+        self.assertEqual(self._contadores(execucao), (2, 0, 0, 2))
+
+        registro.delete()
+        self.assertEqual(self._contadores(execucao), (2, 0, 0, 1))
+
+        # Etapas editadas ou excluídas avulsas (admin)
+        etapa_exec = execucao.etapas_executadas.get(etapa__ordem=2)
+        etapa_exec.concluida = True
+        etapa_exec.save()
+        self.assertEqual(self._contadores(execucao), (2, 1, 0, 1))
+        etapa_exec.delete()
+        self.assertEqual(self._contadores(execucao), (1, 0, 0, 1))
+        self.assertEqual(self._recontados(execucao), (1, 0, 0, 1))
+
+    def test_migracao_0011_preenche_execucoes_existentes(self):
+        import importlib
+        from django.apps import apps
+        from .execucoes import concluir_etapas, iniciar_execucao
+
+        execucao = iniciar_execucao(self.processo, self.usuario)
+        concluir_etapas(execucao, self.usuario, [{'id': execucao.etapas_executadas.get(etapa__ordem=1).id}])
+        RegistroHACCP.objects.create(
+            execucao=execucao, ponto_critico=self.ponto, valor_medido=25, conforme=False, usuario=self.usuario
+        )
+        esperado = self._contadores(execucao)
+        # Como as linhas ficam logo após o AddField da 0011
+        ExecutacaoProcesso.objects.filter(id=execucao.id).update(
+            ultima_atividade=None, **dict.fromkeys(self.CAMPOS, 0)
+        )
+
+        migracao = importlib.import_module('processes.migrations.0011_progresso_execucoes')
+        migracao.recontar(apps, None)
+
+        self.assertEqual(self._contadores(execucao), esperado)
+        ultima_leitura = RegistroHACCP.objects.filter(execucao=execucao).latest('data_hora').data_hora
+        self.assertEqual(ExecutacaoProcesso.objects.get(id=execucao.id).ultima_atividade, ultima_leitura)
+
+
+class PaginacaoKeysetTest(TestCase):
+    """Cursores percorrem todas as linhas uma vez, com empates na ordenação e cursores adulterados"""
+
+    ORDENACAO = ['-data_inicio', '-id']
+
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth.models import User
+        from .execucoes import iniciar_execucoes
+
+        usuario = User.objects.create_user('paginacao', password='senha-teste-123')
+        _, processo, _ = _cervejaria_haccp('Cervejaria Paginação', usuario)
+        execucoes = iniciar_execucoes(processo, usuario, 7)
+        # Cinco execuções com o mesmo data_inicio: o id desempata
+        inicio = timezone.now() - timedelta(days=1)
+        ExecutacaoProcesso.objects.filter(id__in=[e.id for e in execucoes[:5]]).update(data_inicio=inicio)
+        ExecutacaoProcesso.objects.filter(id=execucoes[5].id).update(data_inicio=inicio + timedelta(hours=1))
+        ExecutacaoProcesso.objects.filter(id=execucoes[6].id).update(data_inicio=inicio - timedelta(hours=1))
+        cls.execucoes = ExecutacaoProcesso.objects.filter(processo=processo)
+        cls.esperado = list(cls.execucoes.order_by(*cls.ORDENACAO).values_list('id', flat=True))
+
+    def _pagina(self, **parametros):
+        from django.http import QueryDict
+        from .paginacao import paginar_keyset
+        query = QueryDict(mutable=True)
+        query.update(parametros)
+        return paginar_keyset(self.execucoes, self.ORDENACAO, query, por_pagina=2)
+
+    def test_percorre_para_frente_e_para_tras(self):
+        paginas = [self._pagina()]
+        while paginas[-1].tem_proxima:
+            paginas.append(self._pagina(depois=paginas[-1].cursor_proximo))
+        self.assertEqual([e.id for pagina in paginas for e in pagina], self.esperado)
+
+        # Última página: sem próxima, com anterior
+        ultima = paginas[-1]
+        self.assertEqual(len(ultima), 1)
+        self.assertIsNone(ultima.cursor_proximo)
+        self.assertTrue(ultima.tem_anterior)
+
+        volta = [ultima]
+        while volta[-1].tem_anterior:
+            volta.append(self._pagina(antes=volta[-1].cursor_anterior))
+        self.assertEqual([[e.id for e in pagina] for pagina in reversed(volta)], [[e.id for e in p] for p in paginas])
+        self.assertFalse(volta[-1].tem_anterior)
+
+    def test_cursor_invalido_volta_para_a_primeira_pagina(self):
+        import base64
+        from .paginacao import codificar_cursor, decodificar_cursor
+        campos = [ExecutacaoProcesso._meta.get_field(nome.lstrip('-')) for nome in self.ORDENACAO]
+
+        invalidos = [
+            'não é base64!',
+            base64.urlsafe_b64encode(b'{"data_inicio": 1}').decode(),
+            codificar_cursor(['2026-01-01T00:00:00']),
+            codificar_cursor(['ontem', 1]),
+            codificar_cursor(['2026-01-01T00:00:00', 'x']),
+        ]
+        for cursor in invalidos:
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(decodificar_cursor(cursor, campos))
+                pagina = self._pagina(depois=cursor)
+                self.assertEqual([e.id for e in pagina], self.esperado[:2])
+                self.assertFalse(pagina.tem_anterior)
+
+    def test_query_dos_links_preserva_filtros(self):
+        pagina = self._pagina(status='em_progresso', depois='lixo')
+        self.assertEqual(pagina.query_primeira, 'status=em_progresso')
+        self.assertIn('status=em_progresso', pagina.query_proxima)
+        self.assertIn(f'depois={pagina.cursor_proximo}', pagina.query_proxima)
+
+
+class ListaNaoConformidadesTest(TestCase):
+    """Listagem de NCs paginada por cursor pela view, com filtros e empates em data_criacao"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth.models import User
+        from brewery.models import Brewery
+
+        cls.usuario = User.objects.create_user('lista-nc', password='senha-teste-123')
+        cls.cervejaria = Brewery.objects.create(name='Cervejaria Lista NC', owner=cls.usuario)
+        NaoConformidade.objects.bulk_create([
+            NaoConformidade(
+                cervejaria=cls.cervejaria, titulo=f'NC {i}', descricao='-', usuario_criacao=cls.usuario,
+                severidade='alta', status='aberta' if i % 3 else 'fechada'
+            )
+            for i in range(40)
+        ])
+        # Todas criadas no mesmo instante: só o id desempata
+        NaoConformidade.objects.update(data_criacao=timezone.now() - timedelta(hours=1))
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def _ids(self, **parametros):
+        from django.urls import reverse
+        resposta = self.client.get(
+            reverse('process:nao_conformidades', kwargs={'brewery_id': self.cervejaria.id}), parametros
+        )
+        self.assertEqual(resposta.status_code, 200)
+        pagina = resposta.context['pagina']
+        return [nc.id for nc in pagina], pagina
+
+    def test_paginas_com_filtro_e_empates(self):
+        abertas = list(
+            NaoConformidade.objects.filter(status='aberta').order_by('-data_criacao', '-id').values_list('id', flat=True)
+        )
+        primeira, pagina = self._ids(status='aberta')
+        self.assertEqual(primeira, abertas[:25])
+        self.assertIn('status=aberta', pagina.query_proxima)
+
+        ultima, pagina = self._ids(status='aberta', depois=pagina.cursor_proximo)
+        self.assertEqual(ultima, abertas[25:])
+        self.assertFalse(pagina.tem_proxima)
+        self.assertTrue(pagina.tem_anterior)
+
+        anterior, _ = self._ids(status='aberta', antes=pagina.cursor_anterior)
+        self.assertEqual(anterior, abertas[:25])
+
+    def test_cursor_adulterado_mostra_a_primeira_pagina(self):
+        ids, pagina = self._ids(depois='eyJ4IjogMX0', antes='%%%')
+        self.assertEqual(ids, list(NaoConformidade.objects.order_by('-data_criacao', '-id').values_list('id', flat=True)[:25]))
+        self.assertFalse(pagina.tem_anterior)
+
+
+class IngestaoLeiturasRequisicaoTest(TestCase):
+    """O endpoint de leituras aceita ou recusa o lote inteiro, em JSON e em NDJSON"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth.models import User
+        from .execucoes import iniciar_execucao
+
+        cls.usuario = User.objects.create_user('ingestao', password='senha-teste-123')
+        cls.cervejaria, processo, cls.ponto = _cervejaria_haccp('Cervejaria Ingestão', cls.usuario)
+        cls.execucao = iniciar_execucao(processo, cls.usuario)
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def _enviar(self, corpo, content_type):
+        from django.urls import reverse
+        url = reverse('process:registrar_leituras_haccp', kwargs={
+            'brewery_id': self.cervejaria.id, 'execucao_id': self.execucao.id
+        })
+        with self.settings(HACCP_DESVIOS_EM_SEGUNDO_PLANO=False):
+            return self.client.post(url, corpo, content_type=content_type)
+
+    def _leituras(self, *valores):
+        return [{'ponto_critico': self.ponto.id, 'valor': valor} for valor in valores]
+
+    def _assert_recusado(self, resposta, posicao):
+        self.assertEqual(resposta.status_code, 400)
+        self.assertEqual(resposta.json()['erro'], 'Lote recusado.')
+        self.assertTrue(resposta.json()['detalhes'][0].startswith(f'leitura {posicao}:'))
+        self.assertFalse(RegistroHACCP.objects.exists())
+        execucao = ExecutacaoProcesso.objects.get(id=self.execucao.id)
+        self.assertEqual((execucao.leituras_conformes, execucao.leituras_nao_conformes), (0, 0))
+
+    def test_json_com_uma_leitura_invalida_recusa_o_lote(self):
+        leituras = self._leituras(15, 'quinze', 12)
+        self._assert_recusado(self._enviar(json.dumps({'leituras': leituras}), 'application/json'), 1)
+
+    def test_ndjson_com_uma_leitura_invalida_recusa_o_lote(self):
+        leituras = self._leituras(15, 12)
+        leituras.append({'ponto_critico': self.ponto.id + 1000, 'valor': 15})
+        corpo = '\n'.join(json.dumps(leitura) for leitura in leituras)
+        self._assert_recusado(self._enviar(corpo, 'application/x-ndjson'), 2)
+
+    def test_ndjson_valido_grava_o_lote(self):
+        corpo = '\n'.join(json.dumps(leitura) for leitura in self._leituras(15, 25)) + '\n'
+        resposta = self._enviar(corpo, 'application/x-ndjson')
+        self.assertEqual(resposta.status_code, 201)
+        self.assertEqual(resposta.json(), {'registradas': 2, 'nao_conformes': 1})
+        self.assertEqual(RegistroHACCP.objects.filter(execucao=self.execucao).count(), 2)
+
+
+class ExportacaoHaccpRequisicaoTest(TestCase):
+    """A exportação CSV neutraliza células que o Excel leria como fórmula"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth.models import User
+        from .execucoes import iniciar_execucao
+
+        cls.usuario = User.objects.create_user('exportacao', password='senha-teste-123')
+        cls.cervejaria, processo, ponto = _cervejaria_haccp('Cervejaria Exportação', cls.usuario)
+        ponto.nome = '@SUM(A1:A9)'
+        ponto.save()
+        RegistroHACCP.objects.create(
+            execucao=iniciar_execucao(processo, cls.usuario), ponto_critico=ponto, valor_medido=-3,
+            conforme=False, usuario=cls.usuario, observacoes='=cmd|\' /C calc\'!A0'
+        )
+
+    def _csv(self, **parametros):
+        import csv
+        import io
+        import zlib
+        from django.urls import reverse
+
+        self.client.force_login(self.usuario)
+        resposta = self.client.get(
+            reverse('process:exportar_registros_haccp', kwargs={'brewery_id': self.cervejaria.id}), parametros
+        )
+        self.assertEqual(resposta.status_code, 200)
+        conteudo = b''.join(resposta.streaming_content)
+        if parametros.get('gzip'):
+            conteudo = zlib.decompress(conteudo, 31)
+        return list(csv.reader(io.StringIO(conteudo.decode('utf-8-sig'))))
+
+    def test_celulas_com_formula_recebem_aspa(self):
+        for parametros in ({}, {'gzip': '1'}):
+            with self.subTest(**parametros):
+                cabecalho, linha = self._csv(**parametros)
+                self.assertEqual(linha[cabecalho.index('Observações')], "'=cmd|' /C calc'!A0")
+                self.assertEqual(linha[cabecalho.index('Ponto Crítico')], "'@SUM(A1:A9)")
+                # Números continuam números
+                self.assertEqual(linha[cabecalho.index('Valor Medido')], '-3.0')
@@ -17,12 +17,17 @@ urlpatterns = [
     # ETAPA 3: Execução de Processos
     path('cervejaria/<int:brewery_id>/processo/<int:processo_id>/executar/', views.iniciar_execucao_processo, name='iniciar_execucao'),
     path('cervejaria/<int:brewery_id>/execucao/<int:execucao_id>/checklist/', views.checklist_execucao, name='checklist_execucao'),
+    path('cervejaria/<int:brewery_id>/execucao/<int:execucao_id>/etapas/concluir/', views.concluir_etapas_execucao, name='concluir_etapas'),
     path('cervejaria/<int:brewery_id>/processo/<int:processo_id>/historico/', views.historico_execucoes, name='historico_execucoes'),
     
     # ETAPA 5: Pontos Críticos HACCP
     path('cervejaria/<int:brewery_id>/pontos-criticos/', views.listar_pontos_criticos_cervejaria, name='pontos_criticos_cervejaria'),
     path('cervejaria/<int:brewery_id>/processo/<int:processo_id>/pontos-criticos/', views.listar_pontos_criticos, name='ponto_critico_list'),
     path('cervejaria/<int:brewery_id>/processo/<int:processo_id>/etapa/<int:etapa_id>/ponto-critico/', views.criar_ponto_critico, name='criar_ponto_critico'),
+    path('cervejaria/<int:brewery_id>/execucao/<int:execucao_id>/haccp/leituras/', views.registrar_leituras_haccp, name='registrar_leituras_haccp'),
+    path('cervejaria/<int:brewery_id>/haccp/exportar/', views.exportar_registros_haccp, name='exportar_registros_haccp'),
+    path('cervejaria/<int:brewery_id>/ponto-critico/<int:ponto_id>/grafico/', views.grafico_ponto_critico, name='grafico_ponto_critico'),
+    path('cervejaria/<int:brewery_id>/ponto-critico/<int:ponto_id>/grafico/dados/', views.dados_grafico_ponto_critico, name='dados_grafico_ponto_critico'),
     
     # ETAPA 6: Não Conformidades
     path('cervejaria/<int:brewery_id>/nao-conformidades/', views.listar_nao_conformidades, name='nao_conformidades'),
@@ -31,9 +36,13 @@ urlpatterns = [
     
     # ETAPA 7: Ações Corretivas (CAPA)
     path('cervejaria/<int:brewery_id>/nc/<int:nc_id>/acao-corretiva/', views.criar_acao_corretiva, name='criar_capa'),
+
+    # Busca textual
+    path('cervejaria/<int:brewery_id>/busca/', views.buscar_cervejaria, name='busca'),
     
     # ETAPA 8: Dashboard e Relatórios
     path('cervejaria/<int:brewery_id>/dashboard/', views.dashboard_cervejaria, name='dashboard'),
+    path('cervejaria/<int:brewery_id>/dashboard/grafico/<slug:nome>/', views.grafico_dashboard, name='dashboard_grafico'),
     path('cervejaria/<int:brewery_id>/dre/', views.relatorio_dre, name='dre'),
     
     # Metas / Objetivos
@@ -1,12 +1,15 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseForbidden
+from django.http import HttpResponse, HttpResponseForbidden, Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import condition, require_GET, require_POST
 from django.contrib import messages
 from django.utils import timezone
 from django.db import models
-from datetime import datetime
+from django.db.models.functions import Coalesce
+from django.utils.dateparse import parse_date
+from datetime import datetime, timedelta
 import json
-from brewery.models import Brewery
+from brewery.acesso import cervejaria_do_usuario
 from .models import (
     Processo, EtapaProcesso, ExecutacaoProcesso, ExecucaoEtapa, 
     HistoricoExecucao, PontoCriticoHACCP, RegistroHACCP, NaoConformidade, 
@@ -17,30 +20,37 @@ from .plotly_utils import (
     gerar_grafico_metas_progresso,
     gerar_grafico_nc_por_severidade,
     gerar_grafico_nc_tendencia,
+    gerar_grafico_haccp_desvios_tendencia,
+    gerar_grafico_execucoes_tendencia,
     gerar_grafico_haccp_conformidade,
     gerar_grafico_execucoes_status,
     gerar_grafico_dre_receita_custos,
     gerar_grafico_dre_metas_vs_real,
     gerar_grafico_kpi_resumo
 )
-
-
-def verifica_propriedade_cervejaria(user, cervejaria):
-    """Verifica se o usuário é proprietário da cervejaria."""
-    if cervejaria.owner != user:
-        return False
-    return True
+from .metricas_dashboard import calcular_metricas_dashboard
+from .kpi_diario import somar_kpis
+from .cache_graficos import etag_grafico, ultima_modificacao
+from .execucoes import (
+    MAX_EXECUCOES_POR_LOTE, MAX_ETAPAS_POR_REQUISICAO,
+    concluir_etapas, estado_checklist, etapas_checklist, iniciar_execucoes
+)
+from .paginacao import paginar_keyset
+from .busca import ROTULOS as ROTULOS_BUSCA, buscar
+from .ingestao_haccp import LoteInvalido, leituras_do_formulario, registrar_leituras
+from .exportacao_haccp import bytes_csv, consulta_registros, nome_arquivo
+from .agregados_haccp import serie_ponto_critico
+from .catalogo_haccp import agrupar_por_processo, catalogo_pontos
+from .figuras import dispersao, figura_json
 
 
 @login_required(login_url='login')
+@cervejaria_do_usuario
 def lista_processos(request, brewery_id):
     """Lista todos os processos de uma cervejaria."""
-    cervejaria = get_object_or_404(Brewery, id=brewery_id)
-    
-    if not verifica_propriedade_cervejaria(request.user, cervejaria):
-        return HttpResponseForbidden('Você não tem permissão para acessar esta cervejaria.')
+    cervejaria = request.cervejaria
     
-    processos = Processo.objects.filter(cervejaria=cervejaria)
+    processos = Processo.objects.for_brewery(cervejaria)
     return render(request, 'processes/processo_list.html', {
         'cervejaria': cervejaria,
         'processos': processos
@@ -48,14 +58,12 @@ def lista_processos(request, brewery_id):
 
 
 @login_required(login_url='login')
+@cervejaria_do_usuario
 def detalhe_processo(request, brewery_id, processo_id):
     """Exibe detalhes de um processo e suas etapas."""
-    cervejaria = get_object_or_404(Brewery, id=brewery_id)
+    cervejaria = request.cervejaria
     
-    if not verifica_propriedade_cervejaria(request.user, cervejaria):
-        return HttpResponseForbidden('Você não tem permissão para acessar esta cervejaria.')
-    
-    processo = get_object_or_404(Processo, id=processo_id, cervejaria=cervejaria)
+    processo = get_object_or_404(Processo.objects.for_brewery(cervejaria), id=processo_id)
     etapas = processo.etapas.all()
     
     return render(request, 'processes/processo_detail.html', {
@@ -66,12 +74,10 @@ def detalhe_processo(request, brewery_id, processo_id):
 
 
 @login_required(login_url='login')
+@cervejaria_do_usuario
 def criar_processo(request, brewery_id):
     """Cria um novo processo."""
-    cervejaria = get_object_or_404(Brewery, id=brewery_id)
-    
-    if not verifica_propriedade_cervejaria(request.user, cervejaria):
-        return HttpResponseForbidden('Você não tem permissão para acessar esta cervejaria.')
+    cervejaria = request.cervejaria
     
     if request.method == 'POST':
         nome = request.POST.get('nome', '').strip()
@@ -92,7 +98,7 @@ def criar_processo(request, brewery_id):
                 'categorias': Processo.CATEGORIAS
             })
         
-        if Processo.objects.filter(cervejaria=cervejaria, nome=nome).exists():
+        if Processo.objects.for_brewery(cervejaria).filter(nome=nome).exists():
             messages.error(request, f'Já existe um processo chamado "{nome}" nesta cervejaria.')
             return render(request, 'processes/processo_form.html', {
                 'cervejaria': cervejaria,
@@ -115,14 +121,12 @@ def criar_processo(request, brewery_id):
 
 
 @login_required(login_url='login')
+@cervejaria_do_usuario
 def editar_processo(request, brewery_id, processo_id):
     """Edita um processo existente."""
-    cervejaria = get_object_or_404(Brewery, id=brewery_id)
-    
-    if not verifica_propriedade_cervejaria(request.user, cervejaria):
-        return HttpResponseForbidden('Você não tem permissão para acessar esta cervejaria.')
+    cervejaria = request.cervejaria
     
-    processo = get_object_or_404(Processo, id=processo_id, cervejaria=cervejaria)
+    processo = get_object_or_404(Processo.objects.for_brewery(cervejaria), id=processo_id)
     
     if request.method == 'POST':
         nome = request.POST.get('nome', '').strip()
@@ -145,7 +149,7 @@ def editar_processo(request, brewery_id, processo_id):
                 'categorias': Processo.CATEGORIAS
             })
         
-        if Processo.objects.filter(cervejaria=cervejaria, nome=nome).exclude(id=processo.id).exists():
+        if Processo.objects.for_brewery(cervejaria).filter(nome=nome).exclude(id=processo.id).exists():
             messages.error(request, f'Já existe outro processo chamado "{nome}" nesta cervejaria.')
             return render(request, 'processes/processo_form.html', {
                 'cervejaria': cervejaria,
@@ -168,14 +172,12 @@ def editar_processo(request, brewery_id, processo_id):
 
 
 @login_required(login_url='login')
+@cervejaria_do_usuario
 def deletar_processo(request, brewery_id, processo_id):
     """Deleta um processo."""
-    cervejaria = get_object_or_404(Brewery, id=brewery_id)
+    cervejaria = request.cervejaria
     
-    if not verifica_propriedade_cervejaria(request.user, cervejaria):
-        return HttpResponseForbidden('Você não tem permissão para acessar esta cervejaria.')
-    
-    processo = get_object_or_404(Processo, id=processo_id, cervejaria=cervejaria)
+    processo = get_object_or_404(Processo.objects.for_brewery(cervejaria), id=processo_id)
     
     if request.method == 'POST':
         nome_processo = processo.nome
@@ -190,14 +192,12 @@ def deletar_processo(request, brewery_id, processo_id):
 
 
 @login_required(login_url='login')
+@cervejaria_do_usuario
 def criar_etapa(request, brewery_id, processo_id):
     """Cria uma nova etapa de processo."""
-    cervejaria = get_object_or_404(Brewery, id=brewery_id)
-    
-    if not verifica_propriedade_cervejaria(request.user, cervejaria):
-        return HttpResponseForbidden('Você não tem permissão para acessar esta cervejaria.')
+    cervejaria = request.cervejaria
     
-    processo = get_object_or_404(Processo, id=processo_id, cervejaria=cervejaria)
+    processo = get_object_or_404(Processo.objects.for_brewery(cervejaria), id=processo_id)
     
     if request.method == 'POST':
         nome = request.POST.get('nome', '').strip()
@@ -254,78 +254,88 @@ def criar_etapa(request, brewery_id, processo_id):
 # ===== ETAPA 3: EXECUÇÃO DE PROCESSOS =====
 
 @login_required(login_url='login')
+@cervejaria_do_usuario
 def iniciar_execucao_processo(request, brewery_id, processo_id):
     """Inicia a execução de um processo."""
-    cervejaria = get_object_or_404(Brewery, id=brewery_id)
+    cervejaria = request.cervejaria
     
-    if not verifica_propriedade_cervejaria(request.user, cervejaria):
-        return HttpResponseForbidden('Você não tem permissão para acessar esta cervejaria.')
+    processo = get_object_or_404(Processo.objects.for_brewery(cervejaria), id=processo_id)
     
-    processo = get_object_or_404(Processo, id=processo_id, cervejaria=cervejaria)
-    
-    # Cria nova execução
-    execucao = ExecutacaoProcesso.objects.create(
-        processo=processo,
-        usuario=request.user,
-        status='em_progresso'
-    )
+    # Quantidade de execuções (lote de bateladas), só por POST (com CSRF);
+    # o link simples (GET) inicia uma única execução
+    quantidade = 1
+    if request.method == 'POST':
+        try:
+            quantidade = int(request.POST.get('quantidade') or 1)
+        except ValueError:
+            quantidade = 0
+    if not 1 <= quantidade <= MAX_EXECUCOES_POR_LOTE:
+        messages.error(request, f'Informe uma quantidade entre 1 e {MAX_EXECUCOES_POR_LOTE} execuções.')
+        return redirect('process:detail', brewery_id=cervejaria.id, processo_id=processo.id)
     
-    # Cria etapas de execução baseadas nas etapas do processo
-    for etapa in processo.etapas.all():
-        ExecucaoEtapa.objects.create(
-            execucao=execucao,
-            etapa=etapa
-        )
+    # Cria as execuções com o checklist de etapas e o histórico inicial
+    execucoes = iniciar_execucoes(processo, request.user, quantidade)
     
-    # Registra no histórico
-    HistoricoExecucao.objects.create(
-        execucao=execucao,
-        usuario=request.user,
-        acao='Execução Iniciada',
-        descricao=f'Usuário {request.user.username} iniciou a execução do processo'
-    )
+    if quantidade > 1:
+        messages.success(request, f'{quantidade} execuções de "{processo.nome}" iniciadas com sucesso.')
+        return redirect('process:historico_execucoes', brewery_id=cervejaria.id, processo_id=processo.id)
     
     messages.success(request, f'Execução de "{processo.nome}" iniciada com sucesso.')
-    return redirect('process:checklist_execucao', brewery_id=cervejaria.id, execucao_id=execucao.id)
+    return redirect('process:checklist_execucao', brewery_id=cervejaria.id, execucao_id=execucoes[0].id)
 
 
 @login_required(login_url='login')
+@cervejaria_do_usuario
 def checklist_execucao(request, brewery_id, execucao_id):
     """Exibe checklist de execução do processo com etapas."""
-    cervejaria = get_object_or_404(Brewery, id=brewery_id)
-    
-    if not verifica_propriedade_cervejaria(request.user, cervejaria):
-        return HttpResponseForbidden('Você não tem permissão para acessar esta cervejaria.')
+    cervejaria = request.cervejaria
     
-    execucao = get_object_or_404(ExecutacaoProcesso, id=execucao_id, processo__cervejaria=cervejaria)
-    etapas_execucao = execucao.etapas_executadas.all()
+    execucao = get_object_or_404(ExecutacaoProcesso.objects.for_brewery(cervejaria).select_related('processo'), id=execucao_id)
     
     if request.method == 'POST':
         action = request.POST.get('action')
         
         if action == 'marcar_etapa':
             etapa_exec_id = request.POST.get('etapa_id')
-            etapa_exec = get_object_or_404(ExecucaoEtapa, id=etapa_exec_id, execucao=execucao)
+            etapa_exec = get_object_or_404(ExecucaoEtapa.objects.select_related('etapa'), id=etapa_exec_id, execucao=execucao)
             
-            etapa_exec.concluida = True
-            etapa_exec.data_conclusao = timezone.now()
-            etapa_exec.observacoes = request.POST.get('observacoes', '')
-            etapa_exec.save()
-            
-            HistoricoExecucao.objects.create(
-                execucao=execucao,
-                usuario=request.user,
-                acao='Etapa Concluída',
-                descricao=f'Etapa "{etapa_exec.etapa.nome}" (ordem {etapa_exec.etapa.ordem}) foi marcada como concluída'
-            )
-            messages.success(request, f'Etapa "{etapa_exec.etapa.nome}" marcada como concluída.')
+            # Mesmo caminho do endpoint JSON: histórico e contador da execução na mesma transação
+            atualizadas, _ = concluir_etapas(execucao, request.user, [
+                {'id': etapa_exec.id, 'observacoes': request.POST.get('observacoes', '')}
+            ])
+            if atualizadas:
+                messages.success(request, f'Etapa "{etapa_exec.etapa.nome}" marcada como concluída.')
+            else:
+                messages.info(request, f'Etapa "{etapa_exec.etapa.nome}" já estava concluída.')
+        
+        elif action == 'registrar_leituras':
+            # Todas as leituras preenchidas no checklist, validadas e gravadas em um lote
+            try:
+                if execucao.status in ('concluida', 'cancelada'):
+                    raise LoteInvalido(['a execução já foi encerrada'])
+                leituras = leituras_do_formulario(request.POST)
+                registros = registrar_leituras(execucao, request.user, leituras) if leituras else []
+            except LoteInvalido as e:
+                messages.error(request, f'Leituras não registradas: {e}.')
+            else:
+                if not registros:
+                    messages.warning(request, 'Nenhuma leitura preenchida.')
+                else:
+                    nao_conformes = sum(1 for registro in registros if not registro.conforme)
+                    mensagem = f'{len(registros)} leitura(s) HACCP registrada(s).'
+                    if nao_conformes:
+                        messages.warning(request, f'{mensagem} {nao_conformes} fora do limite.')
+                    else:
+                        messages.success(request, mensagem)
         
         elif action == 'finalizar_execucao':
             observacoes_gerais = request.POST.get('observacoes_gerais', '')
             execucao.status = 'concluida'
             execucao.data_conclusao = timezone.now()
+            execucao.ultima_atividade = execucao.data_conclusao
             execucao.observacoes = observacoes_gerais
-            execucao.save()
+            # update_fields: não sobrescreve os contadores somados com F() por outras requisições
+            execucao.save(update_fields=['status', 'data_conclusao', 'ultima_atividade', 'observacoes'])
             
             HistoricoExecucao.objects.create(
                 execucao=execucao,
@@ -338,97 +348,116 @@ def checklist_execucao(request, brewery_id, execucao_id):
         
         return redirect('process:checklist_execucao', brewery_id=cervejaria.id, execucao_id=execucao.id)
     
+    etapas_execucao = etapas_checklist(execucao)
     return render(request, 'processes/execucao_checklist.html', {
         'cervejaria': cervejaria,
         'execucao': execucao,
-        'etapas_execucao': etapas_execucao
+        'etapas_execucao': etapas_execucao,
+        'tem_pontos_criticos': any(etapa_exec.etapa.pontos for etapa_exec in etapas_execucao),
+        'execucao_aberta': execucao.status not in ('concluida', 'cancelada'),
     })
 
 
 @login_required(login_url='login')
+@cervejaria_do_usuario
+@require_POST
+def concluir_etapas_execucao(request, brewery_id, execucao_id):
+    """
+    Conclui várias etapas do checklist em uma requisição JSON:
+    {"etapas": [{"id": 1, "observacoes": "...", "concluida_em": "<ISO 8601>"}, ...]}
+    Retorna o estado atualizado do checklist.
+    """
+    cervejaria = request.cervejaria
+    
+    execucao = get_object_or_404(ExecutacaoProcesso.objects.for_brewery(cervejaria), id=execucao_id)
+    if execucao.status in ('concluida', 'cancelada'):
+        return JsonResponse({'erro': 'A execução já foi encerrada.'}, status=409)
+    
+    try:
+        itens = json.loads(request.body)['etapas']
+        if not isinstance(itens, list) or len(itens) > MAX_ETAPAS_POR_REQUISICAO:
+            raise ValueError
+        for item in itens:
+            int(item['id'])
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse(
+            {'erro': f'Envie {{"etapas": [...]}} com até {MAX_ETAPAS_POR_REQUISICAO} itens contendo "id".'},
+            status=400
+        )
+    
+    atualizadas, ignoradas = concluir_etapas(execucao, request.user, itens)
+    
+    return JsonResponse({
+        **estado_checklist(execucao),
+        'atualizadas': atualizadas,
+        'ignoradas': ignoradas,
+    })
+
+
+@login_required(login_url='login')
+@cervejaria_do_usuario
 def historico_execucoes(request, brewery_id, processo_id):
     """Exibe histórico de todas as execuções de um processo."""
-    cervejaria = get_object_or_404(Brewery, id=brewery_id)
-    
-    if not verifica_propriedade_cervejaria(request.user, cervejaria):
-        return HttpResponseForbidden('Você não tem permissão para acessar esta cervejaria.')
-    
-    processo = get_object_or_404(Processo, id=processo_id, cervejaria=cervejaria)
-    execucoes = ExecutacaoProcesso.objects.filter(processo=processo)
-    
-    # Calcula métricas para cada execução
-    execucoes_com_metricas = []
-    for execucao in execucoes:
-        total_etapas = execucao.etapas_executadas.count()
-        etapas_concluidas = execucao.etapas_executadas.filter(concluida=True).count()
-        execucoes_com_metricas.append({
-            'execucao': execucao,
-            'total_etapas': total_etapas,
-            'etapas_concluidas': etapas_concluidas
-        })
+    cervejaria = request.cervejaria
     
+    processo = get_object_or_404(Processo.objects.for_brewery(cervejaria), id=processo_id)
+
+    # Uma consulta por página: progresso nos contadores da própria linha,
+    # usuário/processo no JOIN e cursor em (data_inicio, id), que segue o
+    # índice (processo, data_inicio)
+    execucoes = ExecutacaoProcesso.objects.filter(processo=processo).select_related('usuario', 'processo')
+    pagina = paginar_keyset(execucoes, ['-data_inicio', '-id'], request.GET)
+
     return render(request, 'processes/execucao_historico.html', {
         'cervejaria': cervejaria,
         'processo': processo,
-        'execucoes': execucoes_com_metricas
+        'execucoes': pagina.itens,
+        'pagina': pagina,
     })
 
 
 # ===== ETAPA 5: PONTOS CRÍTICOS HACCP =====
 
 @login_required(login_url='login')
+@cervejaria_do_usuario
 def listar_pontos_criticos_cervejaria(request, brewery_id):
     """Lista todos os pontos críticos HACCP de uma cervejaria."""
-    cervejaria = get_object_or_404(Brewery, id=brewery_id)
-    
-    if not verifica_propriedade_cervejaria(request.user, cervejaria):
-        return HttpResponseForbidden('Você não tem permissão para acessar esta cervejaria.')
+    cervejaria = request.cervejaria
     
-    # Obter todos os pontos críticos de todos os processos da cervejaria
-    pontos_criticos = PontoCriticoHACCP.objects.filter(processo__cervejaria=cervejaria).select_related('processo', 'etapa')
-    
-    # Agrupar por processo
-    processos = Processo.objects.filter(cervejaria=cervejaria)
-    processos_com_pontos = {}
-    for processo in processos:
-        pontos = pontos_criticos.filter(processo=processo)
-        if pontos.exists():
-            processos_com_pontos[processo] = pontos
+    # Catálogo da cervejaria (uma consulta, ordenada por processo) agrupado aqui
+    pontos_criticos = catalogo_pontos(cervejaria.id)
     
     return render(request, 'processes/pontos_criticos_cervejaria.html', {
         'cervejaria': cervejaria,
-        'processos_com_pontos': processos_com_pontos,
-        'total_pontos': pontos_criticos.count()
+        'processos_com_pontos': agrupar_por_processo(pontos_criticos),
+        'total_pontos': len(pontos_criticos)
     })
 
 
 @login_required(login_url='login')
+@cervejaria_do_usuario
 def listar_pontos_criticos(request, brewery_id, processo_id):
     """Lista pontos críticos HACCP de um processo."""
-    cervejaria = get_object_or_404(Brewery, id=brewery_id)
-    
-    if not verifica_propriedade_cervejaria(request.user, cervejaria):
-        return HttpResponseForbidden('Você não tem permissão para acessar esta cervejaria.')
+    cervejaria = request.cervejaria
     
-    processo = get_object_or_404(Processo, id=processo_id, cervejaria=cervejaria)
-    pontos_criticos = PontoCriticoHACCP.objects.filter(processo=processo)
+    processo = get_object_or_404(Processo.objects.for_brewery(cervejaria), id=processo_id)
+    pontos_criticos = PontoCriticoHACCP.objects.filter(processo=processo).select_related('etapa', 'responsavel')
     
     return render(request, 'processes/ponto_critico_list.html', {
         'cervejaria': cervejaria,
         'processo': processo,
+        'etapas': list(processo.etapas.all()),
         'pontos_criticos': pontos_criticos
     })
 
 
 @login_required(login_url='login')
+@cervejaria_do_usuario
 def criar_ponto_critico(request, brewery_id, processo_id, etapa_id):
     """Cria um novo ponto crítico HACCP."""
-    cervejaria = get_object_or_404(Brewery, id=brewery_id)
+    cervejaria = request.cervejaria
     
-    if not verifica_propriedade_cervejaria(request.user, cervejaria):
-        return HttpResponseForbidden('Você não tem permissão para acessar esta cervejaria.')
-    
-    processo = get_object_or_404(Processo, id=processo_id, cervejaria=cervejaria)
+    processo = get_object_or_404(Processo.objects.for_brewery(cervejaria), id=processo_id)
     etapa = get_object_or_404(EtapaProcesso, id=etapa_id, processo=processo)
     
     if request.method == 'POST':
@@ -493,31 +522,217 @@ def criar_ponto_critico(request, brewery_id, processo_id, etapa_id):
     })
 
 
-# ===== ETAPA 6: NÃO CONFORMIDADES =====
+@login_required(login_url='login')
+@cervejaria_do_usuario
+@require_POST
+def registrar_leituras_haccp(request, brewery_id, execucao_id):
+    """
+    Recebe um lote de leituras HACCP de uma execução, em JSON
+    ({"leituras": [...]} ou a lista direto) ou NDJSON (uma leitura por linha):
+    {"ponto_critico": 1, "valor": 18.5, "data_hora": "<ISO 8601>", "observacoes": "..."}
+    """
+    cervejaria = request.cervejaria
+    
+    execucao = get_object_or_404(ExecutacaoProcesso.objects.for_brewery(cervejaria), id=execucao_id)
+    if execucao.status in ('concluida', 'cancelada'):
+        return JsonResponse({'erro': 'A execução já foi encerrada.'}, status=409)
+    
+    try:
+        if request.content_type in ('application/x-ndjson', 'application/jsonl'):
+            leituras = [json.loads(linha) for linha in request.body.splitlines() if linha.strip()]
+        else:
+            leituras = json.loads(request.body)
+            if isinstance(leituras, dict):
+                leituras = leituras.get('leituras')
+        registros = registrar_leituras(execucao, request.user, leituras)
+    except LoteInvalido as e:
+        return JsonResponse({'erro': 'Lote recusado.', 'detalhes': e.erros}, status=400)
+    except ValueError:
+        return JsonResponse({'erro': 'Corpo da requisição não é JSON/NDJSON válido.'}, status=400)
+    
+    return JsonResponse({
+        'registradas': len(registros),
+        'nao_conformes': sum(1 for registro in registros if not registro.conforme),
+    }, status=201)
+
 
 @login_required(login_url='login')
-def listar_nao_conformidades(request, brewery_id):
-    """Lista todas as não conformidades da cervejaria."""
-    cervejaria = get_object_or_404(Brewery, id=brewery_id)
+@cervejaria_do_usuario
+@require_GET
+def exportar_registros_haccp(request, brewery_id):
+    """
+    Exporta os registros HACCP do período (?de=AAAA-MM-DD&ate=AAAA-MM-DD) em
+    CSV, ou CSV compactado com ?gzip=1, gerado em fluxo.
+    """
+    cervejaria = request.cervejaria
+    
+    data_inicio = _data_ou_none(request.GET.get('de'))
+    data_fim = _data_ou_none(request.GET.get('ate'))
+    compactar = request.GET.get('gzip') in ('1', 'true', 'on')
+    
+    resposta = StreamingHttpResponse(
+        bytes_csv(consulta_registros(cervejaria.id, data_inicio, data_fim), compactar),
+        content_type='application/gzip' if compactar else 'text/csv; charset=utf-8',
+    )
+    arquivo = nome_arquivo(cervejaria.id, data_inicio, data_fim, compactar)
+    resposta['Content-Disposition'] = f'attachment; filename="{arquivo}"'
+    return resposta
+
+
+# Janelas do gráfico de um ponto crítico
+PERIODOS_GRAFICO_PONTO = {
+    '1h': timedelta(hours=1),
+    '24h': timedelta(days=1),
+    '7d': timedelta(days=7),
+    '30d': timedelta(days=30),
+    '365d': timedelta(days=365),
+}
+
+
+@login_required(login_url='login')
+@cervejaria_do_usuario
+def grafico_ponto_critico(request, brewery_id, ponto_id):
+    """Página com o gráfico das leituras de um ponto crítico."""
+    cervejaria = request.cervejaria
     
-    if not verifica_propriedade_cervejaria(request.user, cervejaria):
-        return HttpResponseForbidden('Você não tem permissão para acessar esta cervejaria.')
+    ponto = get_object_or_404(PontoCriticoHACCP.objects.for_brewery(cervejaria).select_related('processo', 'etapa'), id=ponto_id)
     
-    nao_conformidades = NaoConformidade.objects.filter(cervejaria=cervejaria)
+    return render(request, 'processes/ponto_critico_grafico.html', {
+        'cervejaria': cervejaria,
+        'ponto': ponto,
+        'periodos': list(PERIODOS_GRAFICO_PONTO),
+    })
+
+
+@login_required(login_url='login')
+@cervejaria_do_usuario
+@require_GET
+def dados_grafico_ponto_critico(request, brewery_id, ponto_id):
+    """
+    JSON Plotly da série do ponto crítico na janela ?periodo= (1h, 24h, 7d,
+    30d, 365d), na resolução adequada (leituras, minuto, hora ou dia).
+    """
+    cervejaria = request.cervejaria
+    
+    ponto = get_object_or_404(PontoCriticoHACCP.objects.for_brewery(cervejaria), id=ponto_id)
+    janela = PERIODOS_GRAFICO_PONTO.get(request.GET.get('periodo'), PERIODOS_GRAFICO_PONTO['24h'])
+    fim = timezone.now()
+    serie = serie_ponto_critico(ponto.id, fim - janela, fim)
+    
+    fuso = timezone.get_current_timezone()
+    x = [momento.astimezone(fuso).isoformat() for momento in serie['x']]
+    dados = []
+    if serie['minimo'] is not None:
+        # Faixa mínimo-máximo de cada intervalo, atrás da linha das médias
+        dados.append(dispersao(x=x, y=serie['maximo'], mode='lines', line_width=0, showlegend=False, hoverinfo='skip'))
+        dados.append(dispersao(
+            x=x, y=serie['minimo'], mode='lines', line_width=0, fill='tonexty',
+            fillcolor='rgba(52, 152, 219, 0.2)', name='Mín/Máx'
+        ))
+    dados.append(dispersao(
+        x=x, y=serie['y'], mode='lines', line_color='#3498db',
+        name='Leitura' if serie['resolucao'] == 'bruta' else f"Média por {serie['resolucao']}"
+    ))
+    
+    limites = [
+        {'type': 'line', 'xref': 'paper', 'x0': 0, 'x1': 1, 'y0': valor, 'y1': valor,
+         'line': {'color': '#dc3545', 'dash': 'dash', 'width': 1}}
+        for valor in (ponto.limite_minimo, ponto.limite_maximo)
+    ]
+    resolucao = 'leituras' if serie['resolucao'] == 'bruta' else f"agregado por {serie['resolucao']}"
+    response = HttpResponse(figura_json(
+        dados,
+        title=f'{ponto.nome} ({ponto.unidade}) - {resolucao}, {len(x)} pontos',
+        shapes=limites,
+        xaxis_title='Data/Hora',
+        yaxis_title=ponto.unidade,
+        height=450,
+        margin=dict(l=50, r=20, t=50, b=50),
+        template='plotly_white',
+    ), content_type='application/json')
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+# ===== ETAPA 6: NÃO CONFORMIDADES =====
+
+@login_required(login_url='login')
+@cervejaria_do_usuario
+def listar_nao_conformidades(request, brewery_id):
+    """Lista as não conformidades da cervejaria, com filtros e paginação por cursor."""
+    cervejaria = request.cervejaria
+    
+    filtros = _filtros_nc(request.GET)
+    nao_conformidades = NaoConformidade.objects.for_brewery(cervejaria)
+    if filtros['status']:
+        nao_conformidades = nao_conformidades.filter(status=filtros['status'])
+    if filtros['severidade']:
+        nao_conformidades = nao_conformidades.filter(severidade=filtros['severidade'])
+    # Limites do período como datetimes (data_criacao__date não usaria o índice)
+    if filtros['de']:
+        nao_conformidades = nao_conformidades.filter(
+            data_criacao__gte=timezone.make_aware(datetime.combine(filtros['de'], datetime.min.time()))
+        )
+    if filtros['ate']:
+        nao_conformidades = nao_conformidades.filter(
+            data_criacao__lt=timezone.make_aware(datetime.combine(filtros['ate'] + timedelta(days=1), datetime.min.time()))
+        )
+    if filtros['busca']:
+        termo = filtros['busca']
+        numero = termo.upper().removeprefix('NC-')
+        busca = models.Q(titulo__icontains=termo)
+        if numero.isdigit():
+            busca |= models.Q(id=int(numero))
+        nao_conformidades = nao_conformidades.filter(busca)
+    
+    # Subconsulta correlacionada: só é calculada para as NCs da página
+    acoes = (
+        AcaoCorretiva.objects.filter(nc=models.OuterRef('pk'))
+        .order_by().values('nc').annotate(total=models.Count('id')).values('total')
+    )
+    nao_conformidades = nao_conformidades.select_related('usuario_criacao', 'execucao').annotate(
+        total_acoes=Coalesce(models.Subquery(acoes, output_field=models.IntegerField()), 0)
+    )
+    # (data_criacao, id) segue os índices nc_cervejaria_{criacao,status,sev}_idx
+    pagina = paginar_keyset(nao_conformidades, ['-data_criacao', '-id'], request.GET)
     
     return render(request, 'processes/nc_list.html', {
         'cervejaria': cervejaria,
-        'nao_conformidades': nao_conformidades
+        'nao_conformidades': pagina.itens,
+        'pagina': pagina,
+        'filtros': filtros,
+        'status_choices': NaoConformidade.STATUS_CHOICES,
+        'severidade_choices': NaoConformidade.SEVERIDADE_CHOICES,
     })
 
 
+def _filtros_nc(parametros):
+    """Lê os filtros da listagem de NCs; valores inválidos são ignorados"""
+    status = parametros.get('status', '')
+    severidade = parametros.get('severidade', '')
+    return {
+        'status': status if status in dict(NaoConformidade.STATUS_CHOICES) else '',
+        'severidade': severidade if severidade in dict(NaoConformidade.SEVERIDADE_CHOICES) else '',
+        'de': _data_ou_none(parametros.get('de')),
+        'ate': _data_ou_none(parametros.get('ate')),
+        'busca': parametros.get('q', '').strip()[:100],
+    }
+
+
+def _data_ou_none(valor):
+    try:
+        data = parse_date(valor) if valor else None
+    except ValueError:
+        return None
+    # date.max não tem dia seguinte para o limite superior do período
+    return data if data and data < data.max else None
+
+
 @login_required(login_url='login')
+@cervejaria_do_usuario
 def criar_nao_conformidade(request, brewery_id):
     """Cria uma nova não conformidade."""
-    cervejaria = get_object_or_404(Brewery, id=brewery_id)
-    
-    if not verifica_propriedade_cervejaria(request.user, cervejaria):
-        return HttpResponseForbidden('Você não tem permissão para acessar esta cervejaria.')
+    cervejaria = request.cervejaria
     
     if request.method == 'POST':
         titulo = request.POST.get('titulo', '').strip()
@@ -549,14 +764,12 @@ def criar_nao_conformidade(request, brewery_id):
 
 
 @login_required(login_url='login')
+@cervejaria_do_usuario
 def detalhe_nao_conformidade(request, brewery_id, nc_id):
     """Exibe detalhes de uma não conformidade."""
-    cervejaria = get_object_or_404(Brewery, id=brewery_id)
+    cervejaria = request.cervejaria
     
-    if not verifica_propriedade_cervejaria(request.user, cervejaria):
-        return HttpResponseForbidden('Você não tem permissão para acessar esta cervejaria.')
-    
-    nc = get_object_or_404(NaoConformidade, id=nc_id, cervejaria=cervejaria)
+    nc = get_object_or_404(NaoConformidade.objects.for_brewery(cervejaria), id=nc_id)
     acoes_corretivas = nc.acoes_corretivas.all()
     
     return render(request, 'processes/nc_detalhe.html', {
@@ -569,14 +782,12 @@ def detalhe_nao_conformidade(request, brewery_id, nc_id):
 # ===== ETAPA 7: AÇÕES CORRETIVAS (CAPA) =====
 
 @login_required(login_url='login')
+@cervejaria_do_usuario
 def criar_acao_corretiva(request, brewery_id, nc_id):
     """Cria uma ação corretiva para uma não conformidade."""
-    cervejaria = get_object_or_404(Brewery, id=brewery_id)
-    
-    if not verifica_propriedade_cervejaria(request.user, cervejaria):
-        return HttpResponseForbidden('Você não tem permissão para acessar esta cervejaria.')
+    cervejaria = request.cervejaria
     
-    nc = get_object_or_404(NaoConformidade, id=nc_id, cervejaria=cervejaria)
+    nc = get_object_or_404(NaoConformidade.objects.for_brewery(cervejaria), id=nc_id)
     
     if request.method == 'POST':
         tipo = request.POST.get('tipo', '').strip()
@@ -623,278 +834,131 @@ def criar_acao_corretiva(request, brewery_id, nc_id):
     })
 
 
+# ===== BUSCA TEXTUAL =====
+
+@login_required(login_url='login')
+@cervejaria_do_usuario
+def buscar_cervejaria(request, brewery_id):
+    """Busca textual em NCs, ações corretivas, histórico e observações de etapas."""
+    cervejaria = request.cervejaria
+    
+    termo = request.GET.get('q', '').strip()[:200]
+    tipos = [tipo for tipo in request.GET.getlist('tipo') if tipo in ROTULOS_BUSCA]
+    resultados = buscar(cervejaria.id, termo, tipos) if termo else []
+    
+    return render(request, 'processes/busca.html', {
+        'cervejaria': cervejaria,
+        'termo': termo,
+        'tipos': tipos,
+        'rotulos': ROTULOS_BUSCA,
+        'resultados': resultados,
+    })
+
+
 # ===== ETAPA 8: DASHBOARD E RELATÓRIOS =====
 
+# Gráficos do dashboard carregados sob demanda (nome na URL -> gerador)
+GRAFICOS_DASHBOARD = {
+    'metas-comparacao': gerar_grafico_metas_comparacao,
+    'metas-progresso': gerar_grafico_metas_progresso,
+    'nc-severidade': gerar_grafico_nc_por_severidade,
+    'nc-tendencia': gerar_grafico_nc_tendencia,
+    'haccp-conformidade': gerar_grafico_haccp_conformidade,
+    'execucoes-status': gerar_grafico_execucoes_status,
+    'haccp-tendencia': gerar_grafico_haccp_desvios_tendencia,
+    'execucoes-tendencia': gerar_grafico_execucoes_tendencia,
+    'kpi-resumo': gerar_grafico_kpi_resumo,
+}
+
+
+# ETag/Last-Modified só para gráficos existentes: um nome inválido segue para o 404
+# (a propriedade da cervejaria já foi verificada por cervejaria_do_usuario)
+def _etag_grafico_dashboard(request, brewery_id, nome):
+    if nome not in GRAFICOS_DASHBOARD:
+        return None
+    return etag_grafico(brewery_id, nome)
+
+
+def _ultima_modificacao_grafico_dashboard(request, brewery_id, nome):
+    if nome not in GRAFICOS_DASHBOARD:
+        return None
+    return ultima_modificacao(brewery_id)
+
+
 @login_required(login_url='login')
+@cervejaria_do_usuario
 def dashboard_cervejaria(request, brewery_id):
     """Dashboard com KPIs, indicadores e análise de tendências da cervejaria."""
-    from datetime import timedelta
-    cervejaria = get_object_or_404(Brewery, id=brewery_id)
-    
-    if not verifica_propriedade_cervejaria(request.user, cervejaria):
-        return HttpResponseForbidden('Você não tem permissão para acessar esta cervejaria.')
-    
-    # Métricas de Processos
-    processos = Processo.objects.filter(cervejaria=cervejaria)
-    total_processos = processos.count()
-    total_execucoes = ExecutacaoProcesso.objects.filter(processo__cervejaria=cervejaria).count()
-    execucoes_concluidas = ExecutacaoProcesso.objects.filter(
-        processo__cervejaria=cervejaria,
-        status='concluida'
-    ).count()
-    
-    # Métrica de Conformidade (quanto % de execuções sem NC)
-    processos_com_nc = NaoConformidade.objects.filter(
-        cervejaria=cervejaria,
-        status__in=['aberta', 'em_analise', 'em_correcao']
-    ).count()
-    
-    # Métricas de HACCP
-    total_registros_haccp = RegistroHACCP.objects.filter(
-        execucao__processo__cervejaria=cervejaria
-    ).count()
-    registros_nao_conformes = RegistroHACCP.objects.filter(
-        execucao__processo__cervejaria=cervejaria,
-        conforme=False
-    ).count()
-    
-    # Não Conformidades
-    ncs_ativas = NaoConformidade.objects.filter(
-        cervejaria=cervejaria,
-        status__in=['aberta', 'em_analise', 'em_correcao']
-    ).count()
-    ncs_criticas_ativas = NaoConformidade.objects.filter(
-        cervejaria=cervejaria,
-        severidade='critica',
-        status__in=['aberta', 'em_analise', 'em_correcao']
-    ).count()
-    
-    # Ações Corretivas
-    capas_pendentes = AcaoCorretiva.objects.filter(
-        nc__cervejaria=cervejaria,
-        status__in=['planejada', 'em_execucao']
-    ).count()
-    capas_concluidas = AcaoCorretiva.objects.filter(
-        nc__cervejaria=cervejaria,
-        status='concluida'
-    ).count()
+    cervejaria = request.cervejaria
+    
+    # Métricas agregadas (compartilhadas com os gráficos)
+    metricas = calcular_metricas_dashboard(cervejaria)
     
     # Últimas não conformidades
-    ultimas_ncs = NaoConformidade.objects.filter(
-        cervejaria=cervejaria
-    ).order_by('-data_criacao')[:5]
-    
-    # ===== ANÁLISE DE TENDÊNCIAS =====
-    hoje = timezone.now()
-    
-    # Períodos para análise
-    periodo_7 = hoje - timedelta(days=7)
-    periodo_14 = hoje - timedelta(days=14)
-    periodo_30 = hoje - timedelta(days=30)
-    
-    # Tendência de NC: últimos 7, 14 e 30 dias
-    ncs_7_dias = NaoConformidade.objects.filter(
-        cervejaria=cervejaria,
-        data_criacao__gte=periodo_7
-    ).count()
-    
-    ncs_14_dias = NaoConformidade.objects.filter(
-        cervejaria=cervejaria,
-        data_criacao__gte=periodo_14,
-        data_criacao__lt=periodo_7
-    ).count()
-    
-    ncs_30_dias = NaoConformidade.objects.filter(
-        cervejaria=cervejaria,
-        data_criacao__gte=periodo_30,
-        data_criacao__lt=periodo_14
-    ).count()
-    
-    # Calcular tendência (crescente/decrescente)
-    tendencia_nc = 'estável'
-    if ncs_7_dias > ncs_14_dias:
-        tendencia_nc = 'crescente'
-    elif ncs_7_dias < ncs_14_dias:
-        tendencia_nc = 'decrescente'
-    
-    # NC por severidade
-    ncs_critica = NaoConformidade.objects.filter(
-        cervejaria=cervejaria, severidade='critica'
-    ).count()
-    ncs_alta = NaoConformidade.objects.filter(
-        cervejaria=cervejaria, severidade='alta'
-    ).count()
-    ncs_media = NaoConformidade.objects.filter(
-        cervejaria=cervejaria, severidade='media'
-    ).count()
-    ncs_baixa = NaoConformidade.objects.filter(
-        cervejaria=cervejaria, severidade='baixa'
-    ).count()
-    
-    # Tendência HACCP: desvios nos últimos 7, 14 e 30 dias
-    desvios_7_dias = RegistroHACCP.objects.filter(
-        execucao__processo__cervejaria=cervejaria,
-        data_hora__gte=periodo_7,
-        conforme=False
-    ).count()
-    
-    desvios_14_dias = RegistroHACCP.objects.filter(
-        execucao__processo__cervejaria=cervejaria,
-        data_hora__gte=periodo_14,
-        data_hora__lt=periodo_7,
-        conforme=False
-    ).count()
-    
-    desvios_30_dias = RegistroHACCP.objects.filter(
-        execucao__processo__cervejaria=cervejaria,
-        data_hora__gte=periodo_30,
-        data_hora__lt=periodo_14,
-        conforme=False
-    ).count()
-    
-    # Calcular tendência HACCP
-    tendencia_haccp = 'estável'
-    if desvios_7_dias > desvios_14_dias:
-        tendencia_haccp = 'piorando'
-    elif desvios_7_dias < desvios_14_dias:
-        tendencia_haccp = 'melhorando'
-    
-    # Taxa de conformidade HACCP
-    taxa_conformidade_haccp = 0
-    if total_registros_haccp > 0:
-        taxa_conformidade_haccp = ((total_registros_haccp - registros_nao_conformes) / total_registros_haccp) * 100
-    
-    # Taxa de conformidade geral (execuções sem NC)
-    taxa_conformidade_geral = 0
-    if total_execucoes > 0:
-        taxa_conformidade_geral = ((total_execucoes - processos_com_nc) / total_execucoes) * 100
+    ultimas_ncs = NaoConformidade.objects.for_brewery(cervejaria).order_by('-data_criacao')[:5]
     
     # NCs em aberto há mais tempo (não resolvidas)
-    ncs_antigas = NaoConformidade.objects.filter(
-        cervejaria=cervejaria,
+    ncs_antigas = NaoConformidade.objects.for_brewery(cervejaria).filter(
         status__in=['aberta', 'em_analise', 'em_correcao']
     ).order_by('data_criacao')[:3]
     
     # Metas ativas
-    metas_ativas = Meta.objects.filter(cervejaria=cervejaria, ativo=True).order_by('-criado_em')
+    metas_ativas = Meta.objects.for_brewery(cervejaria).filter(ativo=True).order_by('-criado_em')
     
     # Calcular percentual para cada meta
     for meta in metas_ativas:
         meta.percentual = meta.percentual_conclusao()
     
-    # ===== GRÁFICOS PLOTLY =====
-    grafico_metas_comparacao = gerar_grafico_metas_comparacao(cervejaria)
-    grafico_metas_progresso = gerar_grafico_metas_progresso(cervejaria)
-    grafico_nc_severidade = gerar_grafico_nc_por_severidade(cervejaria)
-    grafico_nc_tendencia = gerar_grafico_nc_tendencia(cervejaria)
-    grafico_haccp = gerar_grafico_haccp_conformidade(cervejaria)
-    grafico_execucoes = gerar_grafico_execucoes_status(cervejaria)
-    grafico_kpi = gerar_grafico_kpi_resumo(cervejaria)
-    
     return render(request, 'processes/dashboard.html', {
         'cervejaria': cervejaria,
-        'total_processos': total_processos,
-        'total_execucoes': total_execucoes,
-        'execucoes_concluidas': execucoes_concluidas,
-        'processos_com_nc': processos_com_nc,
-        'total_registros_haccp': total_registros_haccp,
-        'registros_nao_conformes': registros_nao_conformes,
-        'ncs_ativas': ncs_ativas,
-        'ncs_criticas_ativas': ncs_criticas_ativas,
-        'capas_pendentes': capas_pendentes,
-        'capas_concluidas': capas_concluidas,
+        **metricas.como_contexto(),
         'ultimas_ncs': ultimas_ncs,
-        # Tendências
-        'ncs_7_dias': ncs_7_dias,
-        'ncs_14_dias': ncs_14_dias,
-        'ncs_30_dias': ncs_30_dias,
-        'tendencia_nc': tendencia_nc,
-        'ncs_critica': ncs_critica,
-        'ncs_alta': ncs_alta,
-        'ncs_media': ncs_media,
-        'ncs_baixa': ncs_baixa,
-        'desvios_7_dias': desvios_7_dias,
-        'desvios_14_dias': desvios_14_dias,
-        'desvios_30_dias': desvios_30_dias,
-        'tendencia_haccp': tendencia_haccp,
-        'taxa_conformidade_haccp': taxa_conformidade_haccp,
-        'taxa_conformidade_geral': taxa_conformidade_geral,
         'ncs_antigas': ncs_antigas,
         'metas': metas_ativas,
-        # Gráficos Plotly
-        'grafico_metas_comparacao': grafico_metas_comparacao,
-        'grafico_metas_progresso': grafico_metas_progresso,
-        'grafico_nc_severidade': grafico_nc_severidade,
-        'grafico_nc_tendencia': grafico_nc_tendencia,
-        'grafico_haccp': grafico_haccp,
-        'grafico_execucoes': grafico_execucoes,
-        'grafico_kpi': grafico_kpi,
     })
 
 
 @login_required(login_url='login')
+@cervejaria_do_usuario
+@require_GET
+@condition(etag_func=_etag_grafico_dashboard, last_modified_func=_ultima_modificacao_grafico_dashboard)
+def grafico_dashboard(request, brewery_id, nome):
+    """Retorna o JSON de um gráfico do dashboard (com suporte a ETag/304)."""
+    cervejaria = request.cervejaria
+    
+    gerar_grafico = GRAFICOS_DASHBOARD.get(nome)
+    if gerar_grafico is None:
+        raise Http404('Gráfico não encontrado.')
+    
+    response = HttpResponse(gerar_grafico(cervejaria), content_type='application/json')
+    # Força o navegador a revalidar (If-None-Match) em vez de usar cópia expirada
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required(login_url='login')
+@cervejaria_do_usuario
 def relatorio_dre(request, brewery_id):
     """Demonstração de Resultado do Exercício (DRE)."""
-    cervejaria = get_object_or_404(Brewery, id=brewery_id)
-    
-    if not verifica_propriedade_cervejaria(request.user, cervejaria):
-        return HttpResponseForbidden('Você não tem permissão para acessar esta cervejaria.')
-    
-    # Buscar ou criar KPI do exercício
-    from datetime import date, timedelta
+    cervejaria = request.cervejaria
     
     # Definir período: últimos 30, 90, 180 ou 365 dias
     periodo = request.GET.get('periodo', '30')
-    hoje = date.today()
-    
-    if periodo == '30':
-        data_inicio = hoje - timedelta(days=30)
-    elif periodo == '90':
-        data_inicio = hoje - timedelta(days=90)
-    elif periodo == '180':
-        data_inicio = hoje - timedelta(days=180)
-    else:  # 365
-        data_inicio = hoje - timedelta(days=365)
-    
-    # Calcular métricas para o período
-    execucoes_periodo = ExecutacaoProcesso.objects.filter(
-        processo__cervejaria=cervejaria,
-        data_inicio__date__gte=data_inicio
-    )
+    if periodo not in ('30', '90', '180', '365'):
+        periodo = '365'
+    hoje = timezone.localdate()
+    data_inicio = hoje - timedelta(days=int(periodo))
+    
+    # Métricas do período somadas a partir da consolidação diária (KPIDiario)
+    kpis = somar_kpis(cervejaria, data_inicio, hoje)
     
-    total_processos_executados = execucoes_periodo.count()
-    processos_sem_nc = execucoes_periodo.exclude(
-        nc_geradas__isnull=False
-    ).count()
+    total_processos_executados = kpis['execucoes']
+    processos_sem_nc = kpis['execucoes_sem_nc']
     
     taxa_conformidade = 0
     if total_processos_executados > 0:
         taxa_conformidade = (processos_sem_nc / total_processos_executados) * 100
     
-    # HACCP
-    registros_haccp = RegistroHACCP.objects.filter(
-        execucao__processo__cervejaria=cervejaria,
-        data_hora__date__gte=data_inicio
-    )
-    registros_haccp_conformes = registros_haccp.filter(conforme=True).count()
-    registros_haccp_nao_conformes = registros_haccp.filter(conforme=False).count()
-    
-    # NCs
-    ncs_total = NaoConformidade.objects.filter(
-        cervejaria=cervejaria,
-        data_criacao__date__gte=data_inicio
-    )
-    ncs_abertas = ncs_total.filter(status='aberta').count()
-    ncs_fechadas = ncs_total.filter(status='fechada').count()
-    ncs_criticas = ncs_total.filter(severidade='critica').count()
-    
-    # CAPAs
-    capas = AcaoCorretiva.objects.filter(
-        nc__cervejaria=cervejaria,
-        data_criacao__date__gte=data_inicio
-    )
-    capas_concluidas = capas.filter(status='concluida').count()
-    
     # ===== GRÁFICOS PLOTLY PARA DRE =====
     grafico_dre_receita_custos = gerar_grafico_dre_receita_custos(cervejaria, int(periodo))
     grafico_dre_metas_vs_real = gerar_grafico_dre_metas_vs_real(cervejaria)
@@ -907,14 +971,14 @@ def relatorio_dre(request, brewery_id):
         'total_processos_executados': total_processos_executados,
         'processos_sem_nc': processos_sem_nc,
         'taxa_conformidade': round(taxa_conformidade, 2),
-        'registros_haccp_conformes': registros_haccp_conformes,
-        'registros_haccp_nao_conformes': registros_haccp_nao_conformes,
-        'total_ncs': ncs_total.count(),
-        'ncs_abertas': ncs_abertas,
-        'ncs_fechadas': ncs_fechadas,
-        'ncs_criticas': ncs_criticas,
-        'total_capas': capas.count(),
-        'capas_concluidas': capas_concluidas,
+        'registros_haccp_conformes': kpis['haccp_conformes'],
+        'registros_haccp_nao_conformes': kpis['haccp_nao_conformes'],
+        'total_ncs': kpis['ncs_total'],
+        'ncs_abertas': kpis['ncs_abertas'],
+        'ncs_fechadas': kpis['ncs_fechadas'],
+        'ncs_criticas': kpis['ncs_criticas'],
+        'total_capas': kpis['capas_total'],
+        'capas_concluidas': kpis['capas_concluidas'],
         # Gráficos Plotly
         'grafico_dre_receita_custos': grafico_dre_receita_custos,
         'grafico_dre_metas_vs_real': grafico_dre_metas_vs_real,
@@ -923,14 +987,12 @@ def relatorio_dre(request, brewery_id):
 # ===== METAS / OBJETIVOS =====
 
 @login_required(login_url='login')
+@cervejaria_do_usuario
 def listar_metas(request, brewery_id):
     """Lista todas as metas de uma cervejaria."""
-    cervejaria = get_object_or_404(Brewery, id=brewery_id)
-    
-    if not verifica_propriedade_cervejaria(request.user, cervejaria):
-        return HttpResponseForbidden('Você não tem permissão para acessar esta cervejaria.')
+    cervejaria = request.cervejaria
     
-    metas = Meta.objects.filter(cervejaria=cervejaria, ativo=True).order_by('-criado_em')
+    metas = Meta.objects.for_brewery(cervejaria).filter(ativo=True).order_by('-criado_em')
     
     # Adiciona percentual de conclusão a cada meta
     for meta in metas:
@@ -944,12 +1006,10 @@ def listar_metas(request, brewery_id):
 
 
 @login_required(login_url='login')
+@cervejaria_do_usuario
 def criar_meta(request, brewery_id):
     """Cria uma nova meta para a cervejaria."""
-    cervejaria = get_object_or_404(Brewery, id=brewery_id)
-    
-    if not verifica_propriedade_cervejaria(request.user, cervejaria):
-        return HttpResponseForbidden('Você não tem permissão para acessar esta cervejaria.')
+    cervejaria = request.cervejaria
     
     if request.method == 'POST':
         nome = request.POST.get('nome', '').strip()
@@ -1003,13 +1063,11 @@ def criar_meta(request, brewery_id):
 
 
 @login_required(login_url='login')
+@cervejaria_do_usuario
 def editar_meta(request, brewery_id, meta_id):
     """Edita uma meta existente."""
-    cervejaria = get_object_or_404(Brewery, id=brewery_id)
-    meta = get_object_or_404(Meta, id=meta_id, cervejaria=cervejaria)
-    
-    if not verifica_propriedade_cervejaria(request.user, cervejaria):
-        return HttpResponseForbidden('Você não tem permissão para acessar esta cervejaria.')
+    cervejaria = request.cervejaria
+    meta = get_object_or_404(Meta.objects.for_brewery(cervejaria), id=meta_id)
     
     if request.method == 'POST':
         nome = request.POST.get('nome', '').strip()
@@ -1068,13 +1126,11 @@ def editar_meta(request, brewery_id, meta_id):
 
 
 @login_required(login_url='login')
+@cervejaria_do_usuario
 def deletar_meta(request, brewery_id, meta_id):
     """Marca uma meta como inativa (soft delete)."""
-    cervejaria = get_object_or_404(Brewery, id=brewery_id)
-    meta = get_object_or_404(Meta, id=meta_id, cervejaria=cervejaria)
-    
-    if not verifica_propriedade_cervejaria(request.user, cervejaria):
-        return HttpResponseForbidden('Você não tem permissão para acessar esta cervejaria.')
+    cervejaria = request.cervejaria
+    meta = get_object_or_404(Meta.objects.for_brewery(cervejaria), id=meta_id)
     
     if request.method == 'POST':
         nome_meta = meta.nome